@@ -1,60 +1,643 @@
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import JSONResponse
-from app.models.request_models import ChatRequest, SuggestQuestionsRequest
-from app.models.response_models import SuggestQuestionsResponse
-from app.services.gemini_service import get_gemini_response, generate_question_suggestions
-from app.services.token_estimator import estimate_tokens
-from app.core.security import validate_api_key
+import asyncio
+import logging
+import math
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from app.models.request_models import (
+    BatchChatItem,
+    BatchChatRequest,
+    ChatRequest,
+    CreateSessionRequest,
+    PageContentRequest,
+    RegisterPageRequest,
+    SuggestQuestionsRequest,
+)
+from app.models.response_models import CreateSessionResponse, RegisterPageResponse, SuggestQuestionsResponse
+from app.services.gemini_service import (
+    cached_question_suggestions,
+    gemini_single_flight,
+    generate_question_suggestions,
+    get_gemini_answer_with_suggestions,
+    get_gemini_response,
+    get_gemini_response_stream,
+    suggestion_cache,
+)
+from app.services.cache_backend import shared_backend
+from app.services.client_pool import client_pool
+from app.services.content_compactor import compact_content_async, compaction_stats
+from app.services.gemini_errors import GeminiError
+from app.services.context_cache import context_cache
+from app.services.model_router import TASK_CHAT, TASK_SUGGESTIONS, model_router
+from app.services.page_store import PageEntry, compute_page_id, page_store, utf8_size
+from app.services.prefetch import prefetcher
+from app.services.rate_limiter import Permit, RateLimitExceeded, rate_limiter
+from app.services.retrieval import retrieval_index_cache, retrieve_relevant_content
+from app.services.session_store import Session, session_store
+from app.services.token_estimator import estimate_tokens, estimate_tokens_async
+from app.services.warmup import startup_warmup
+from app.core.deadline import deadline_stats, run_with_deadline, start_deadline
+from app.core.drain import stream_tracker
+from app.core.fast_json import FastJSONResponse, FastJSONRoute, dumps
+from app.core.tracing import set_attributes, traced
+from app.core.security import get_api_key, validate_api_key
 from app.core.config import settings
 
-router = APIRouter()
+logger = logging.getLogger(__name__)
+
+# Request bodies are parsed with orjson
+router = APIRouter(route_class=FastJSONRoute)
+
+# Response header reporting the approximate tokens removed by content compaction
+TOKENS_SAVED_HEADER = "X-Tokens-Saved"
+
+def _format_sse(event: str, data: Dict[str, Any]) -> bytes:
+    """
+    Format a Server-Sent Event frame.
+
+    Args:
+        event: The event name.
+        data: The JSON-serializable event payload.
+
+    Returns:
+        bytes: The SSE frame, terminated by a blank line.
+    """
+    return b"event: " + event.encode() + b"\ndata: " + dumps(data) + b"\n\n"
+
+def _get_session(request: PageContentRequest, api_key: str) -> Optional[Session]:
+    """
+    Get the conversation session a request refers to, if any.
+
+    Args:
+        request: A request optionally carrying a session_id.
+        api_key: The API key the session must belong to.
+
+    Returns:
+        Optional[Session]: The session, or None if the request has no session_id.
+
+    Raises:
+        HTTPException: If the session is unknown, expired or owned by another key.
+    """
+    if request.session_id is None:
+        return None
+    session = session_store.get(request.session_id, api_key)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Unknown session_id. Create a new session.")
+    return session
+
+async def _compact(content: str) -> Tuple[str, int]:
+    """
+    Compact webpage content if compaction is enabled.
+
+    Args:
+        content: The webpage content as sent by the client.
+
+    Returns:
+        Tuple[str, int]: The content to prompt with and the tokens saved.
+    """
+    if not settings.CONTENT_COMPACTION_ENABLED:
+        return content, 0
+    result = await compact_content_async(content)
+    return result.content, result.tokens_saved
+
+async def _resolve_page(request: PageContentRequest, session: Optional[Session] = None) -> PageEntry:
+    """
+    Get the webpage and its token count for a request.
+
+    Registered pages reuse their precomputed token count; inline content is
+    compacted and counted in full like a registered page, since the count
+    is also compared against the retrieval budget and the context cache
+    minimum, not only the token limit. Without
+    inline content or a page_id, the page of the session is used.
+
+    Args:
+        request: A request carrying webpage_content, page_id or session_id.
+        session: The session of the request (optional).
+
+    Returns:
+        PageEntry: The webpage with its estimated token count.
+
+    Raises:
+        HTTPException: If the page_id is unknown or has been evicted, or the
+        session has no page.
+    """
+    page_id = request.page_id
+    if request.webpage_content is None and page_id is None:
+        if session is None or session.page_id is None:
+            raise HTTPException(status_code=400, detail="The session has no page. Send webpage_content or page_id.")
+        page_id = session.page_id
+    elif session is not None and page_id is not None and session.page_id != page_id:
+        # Later requests of the session may omit the page
+        session.page_id = page_id
+        session_store.save(session)
+
+    if page_id is not None:
+        entry = await page_store.get(page_id)
+        if entry is None:
+            raise HTTPException(status_code=404, detail="Unknown page_id. Register the page again.")
+        return entry
+
+    content, tokens_saved = await _compact(request.webpage_content)
+    token_count = await estimate_tokens_async(content)
+    return PageEntry(None, content, token_count, utf8_size(content), tokens_saved)
+
+async def _resolve_batch_page(webpage_content: Optional[str], page_id: Optional[str]) -> PageEntry:
+    """
+    Resolve one page of a batch, with its digest computed once for all its items.
+    """
+    page = await _resolve_page(PageContentRequest(webpage_content=webpage_content, page_id=page_id))
+    if page.page_id is None:
+        page.page_id = compute_page_id(page.content)
+    return page
+
+async def _prepend(first: Any, rest: AsyncIterator[Any]) -> AsyncIterator[Any]:
+    """
+    Iterate over an already received first item, then the rest.
+    """
+    yield first
+    async for item in rest:
+        yield item
+
+# Error kinds of per-item failures that weren't Gemini errors (e.g. an unknown page_id)
+_HTTP_ERROR_KINDS = {400: "invalid_request", 404: "not_found", 429: "rate_limited", 504: "timeout"}
+
+def _item_error(error: Exception) -> Dict[str, Any]:
+    """
+    Describe why one item of a batch failed.
+
+    Args:
+        error: The exception the item's work raised.
+
+    Returns:
+        dict: The "status", "kind" and "detail" of the failure, plus
+        "retry_after" in seconds when known.
+    """
+    if isinstance(error, GeminiError):
+        result = {"status": error.status_code, "kind": error.kind, "detail": error.message}
+        if error.retry_after is not None:
+            result["retry_after"] = max(1, math.ceil(error.retry_after))
+        return result
+    if isinstance(error, HTTPException):
+        result = {"status": error.status_code, "kind": _HTTP_ERROR_KINDS.get(error.status_code, "error"), "detail": error.detail}
+        retry_after = (error.headers or {}).get("Retry-After")
+        if retry_after is not None:
+            result["retry_after"] = int(retry_after)
+        return result
+    logger.error(f"Batch item failed: {type(error).__name__}: {error}")
+    return {"status": 500, "kind": "internal", "detail": "Internal error"}
+
+async def gemini_error_handler(request: Request, exc: GeminiError) -> FastJSONResponse:
+    """
+    Answer a failed Gemini call with the HTTP status of its kind.
+
+    Args:
+        request: The request that failed.
+        exc: The classified Gemini failure.
+
+    Returns:
+        FastJSONResponse: {"detail": ..., "kind": ...}, with Retry-After when known.
+    """
+    headers = {}
+    if exc.retry_after is not None:
+        headers["Retry-After"] = str(max(1, math.ceil(exc.retry_after)))
+    return FastJSONResponse(
+        status_code=exc.status_code,
+        content={"detail": exc.message, "kind": exc.kind},
+        headers=headers,
+    )
+
+def _too_many_requests(e: RateLimitExceeded) -> HTTPException:
+    """
+    Answer a request that got no upstream slot with 429 and Retry-After.
+    """
+    return HTTPException(
+        status_code=429,
+        detail=f"Too many requests ({e.reason}). Retry later.",
+        headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))},
+    )
+
+async def _acquire_upstream(api_key: str) -> Permit:
+    """
+    Wait for the key's rate limit and an upstream Gemini slot.
+
+    Streams hold the slot for as long as they run. Non-streaming calls take
+    theirs in the service, once per upstream call, so requests coalesced
+    into one call share its slot.
+
+    Args:
+        api_key: The user's Gemini API key.
+
+    Returns:
+        Permit: The slot; release it once the Gemini call is done.
+
+    Raises:
+        HTTPException: 429 with Retry-After if no slot is free within the allowed wait.
+    """
+    try:
+        return await rate_limiter.acquire(api_key)
+    except RateLimitExceeded as e:
+        raise _too_many_requests(e)
+
+@router.post("/pages", response_model=RegisterPageResponse)
+async def register_page(request: RegisterPageRequest):
+    """
+    Register webpage content so later requests can reference it by digest.
+
+    With PREFETCH_ENABLED, the page's summary and suggestions are then
+    generated in the background, within the key's prefetch budget.
+
+    Args:
+        request: The request containing the API key and webpage content.
+
+    Returns:
+        RegisterPageResponse: The page digest and its estimated token count.
+    """
+    # Validate API key
+    if not validate_api_key(request.api_key):
+        raise HTTPException(status_code=401, detail="Invalid API key")
+
+    content, tokens_saved = await _compact(request.webpage_content)
+    entry = await page_store.register(content, tokens_saved)
+    prefetcher.prefetch_page(request.api_key, entry)
+    return RegisterPageResponse(
+        page_id=entry.page_id, token_count=entry.token_count, size=entry.size, tokens_saved=entry.tokens_saved
+    )
+
+@router.post("/sessions", response_model=CreateSessionResponse)
+async def create_session(request: CreateSessionRequest):
+    """
+    Start a server-side conversation session.
+
+    Chat requests sending the session_id get the earlier turns of the
+    session as context, so clients don't need to resend the history.
+
+    Args:
+        request: The request containing the API key and an optional page_id.
+
+    Returns:
+        CreateSessionResponse: The id of the new session.
+    """
+    # Validate API key
+    if not validate_api_key(request.api_key):
+        raise HTTPException(status_code=401, detail="Invalid API key")
+
+    session = session_store.create(request.api_key, request.page_id)
+    return CreateSessionResponse(session_id=session.session_id)
+
+@router.delete("/sessions/{session_id}")
+async def delete_session(session_id: str, api_key: str = Depends(get_api_key)):
+    """
+    Delete a conversation session.
+
+    Args:
+        session_id: The id of the session.
+        api_key: The API key from the X-API-Key header.
+
+    Returns:
+        dict: A dictionary confirming the deletion.
+    """
+    if not session_store.delete(session_id, api_key):
+        raise HTTPException(status_code=404, detail="Unknown session_id")
+    return {"deleted": True}
 
 @router.post("/chat")
-async def chat(request: ChatRequest):
+@traced("routes.chat")
+async def chat(request: ChatRequest, http_request: Request):
     """
     Process a chat request and return a non-streaming response from Gemini API.
 
+    The upstream call is cancelled when the request deadline passes (504)
+    or the client disconnects.
+
     Args:
-        request: The chat request containing the API key, webpage content, and user query.
+        request: The chat request containing the API key, webpage content (or page_id), and user query.
+        http_request: The raw HTTP request, used for the deadline and to detect client disconnects.
 
     Returns:
-        JSONResponse: A JSON response containing the complete text from the Gemini API.
+        FastJSONResponse: A JSON response containing the complete text from the Gemini API,
+        plus follow-up "suggestions" when suggestion_count is set.
     """
     # Validate API key
     if not validate_api_key(request.api_key):
         raise HTTPException(status_code=401, detail="Invalid API key")
+    start_deadline(http_request)
+
+    session = _get_session(request, request.api_key)
+    page = await _resolve_page(request, session)
+    tokens_saved = page.tokens_saved
+    history = session.to_contents() if session is not None else None
 
-    # Combine webpage content and user query
-    input_text_parts = [
-        f"WEBPAGE CONTENT:\n{request.webpage_content}\n\nUSER QUERY: {request.query}"
-    ]
+    # Optionally narrow large pages down to the sections relevant to the query
+    if request.use_retrieval:
+        page = await retrieve_relevant_content(page, request.query)
+
+    # The webpage content is added by the service, inline or from a context cache
+    input_text_parts = [f"USER QUERY: {request.query}"]
 
     # Estimate token count to determine which model to use
-    token_count = estimate_tokens(request.webpage_content + request.query)
+    token_count = page.token_count + estimate_tokens(request.query)
+    if session is not None:
+        token_count += session.token_count
 
-    # Select model based on token count
-    # If token count exceeds the configured token limit, use the fallback model
-    if token_count > settings.TOKEN_LIMIT:
-        model_name = settings.FALLBACK_MODEL
-    else:
-        model_name = settings.PRIMARY_MODEL
+    # Select the model (and failover models) based on token count, task and model health
+    route = model_router.route(TASK_CHAT, token_count, request.api_key)
+    set_attributes(model=route.model, token_count=token_count)
+
+    # A plain summary request may already have been answered by the prefetch
+    prefetchable = session is None and not request.use_retrieval and not request.suggestion_count
 
-    # Get complete response (non-streaming)
-    response_text = await get_gemini_response(request.api_key, model_name, input_text_parts)
+    # Get complete response (non-streaming), with follow-up questions from the same call if requested
+    async def answer() -> Dict[str, Any]:
+        if prefetchable:
+            text = await prefetcher.get_summary(request.api_key, route.model, page, request.query)
+            if text is not None:
+                return {"text": text}
+        # The upstream slot is taken by the call itself, and shared with identical requests joining it
+        try:
+            if request.suggestion_count:
+                return await get_gemini_answer_with_suggestions(
+                    request.api_key, route.model, input_text_parts, page, request.suggestion_count, history, route.fallbacks
+                )
+            return {
+                "text": await get_gemini_response(
+                    request.api_key, route.model, input_text_parts, page, history, route.fallbacks
+                )
+            }
+        except RateLimitExceeded as e:
+            raise _too_many_requests(e)
+
+    content = await run_with_deadline(http_request, answer())
+
+    # Remember the exchange for the next turn of the session
+    if session is not None:
+        session.add_exchange(request.query, content["text"])
+        session_store.save(session)
 
     # Return JSON response
-    return JSONResponse(
-        content={"text": response_text},
-        media_type="application/json",
+    return FastJSONResponse(
+        content=content,
+        headers={TOKENS_SAVED_HEADER: str(tokens_saved)},
+    )
+
+@router.post("/chat/stream")
+@traced("routes.chat_stream")
+async def chat_stream(request: ChatRequest, http_request: Request):
+    """
+    Process a chat request and stream the Gemini response as Server-Sent Events.
+
+    Emits "delta" events with text chunks, a trailing "suggestions" event
+    when suggestion_count is set, a "usage" event with token counts, and a
+    final "done" or "error" event. Failures before the first event are
+    answered with the HTTP status of the error instead. The upstream call
+    is cancelled when the request deadline passes (an "error" event of kind
+    "timeout" once streaming) or the client disconnects.
+
+    Args:
+        request: The chat request containing the API key, webpage content (or page_id), and user query.
+        http_request: The raw HTTP request, used for the deadline and to detect client disconnects.
+
+    Returns:
+        StreamingResponse: A text/event-stream response.
+    """
+    # Validate API key
+    if not validate_api_key(request.api_key):
+        raise HTTPException(status_code=401, detail="Invalid API key")
+    deadline = start_deadline(http_request)
+
+    session = _get_session(request, request.api_key)
+    page = await _resolve_page(request, session)
+    tokens_saved = page.tokens_saved
+    history = session.to_contents() if session is not None else None
+
+    # Optionally narrow large pages down to the sections relevant to the query
+    if request.use_retrieval:
+        page = await retrieve_relevant_content(page, request.query)
+
+    # The webpage content is added by the service, inline or from a context cache
+    input_text_parts = [f"USER QUERY: {request.query}"]
+
+    # Estimate token count to determine which model to use
+    token_count = page.token_count + estimate_tokens(request.query)
+    if session is not None:
+        token_count += session.token_count
+
+    # Select the model (and failover models) based on token count, task and model health
+    route = model_router.route(TASK_CHAT, token_count, request.api_key)
+    set_attributes(model=route.model, token_count=token_count)
+
+    # Take the upstream slot before responding, so an over-limit request still gets a proper 429
+    permit = await run_with_deadline(http_request, _acquire_upstream(request.api_key))
+
+    events = get_gemini_response_stream(
+        request.api_key, route.model, input_text_parts, page, request.suggestion_count, history, route.fallbacks
+    )
+    try:
+        # Wait for the first event, so failures before any output get a proper HTTP status
+        first_event = await run_with_deadline(http_request, events.__anext__())
+    except BaseException:
+        await events.aclose()
+        permit.release()
+        raise
+
+    stream_tracker.start()
+    closed = False
+
+    async def close_stream():
+        nonlocal closed
+        if closed:
+            return
+        closed = True
+        # Closing the service generator cancels the upstream stream
+        await events.aclose()
+        permit.release()
+        stream_tracker.finish()
+
+    async def event_stream():
+        answer = []
+        stream = _prepend(first_event, events)
+        try:
+            while True:
+                try:
+                    # Only the wait for the next event is bounded, never a pending write
+                    async with asyncio.timeout_at(deadline):
+                        event = await stream.__anext__()
+                except StopAsyncIteration:
+                    deadline_stats.completed += 1
+                    break
+                except TimeoutError:
+                    deadline_stats.timeouts += 1
+                    yield _format_sse("error", {"message": "Request deadline exceeded", "kind": "timeout"})
+                    break
+                if await http_request.is_disconnected():
+                    deadline_stats.cancellations += 1
+                    break
+                if event["event"] == "delta":
+                    answer.append(event["data"]["text"])
+                elif event["event"] == "done" and session is not None:
+                    # Only complete answers become part of the session history
+                    session.add_exchange(request.query, "".join(answer))
+                    session_store.save(session)
+                yield _format_sse(event["event"], event["data"])
+        except asyncio.CancelledError:
+            # The server cancels the response when the client disconnects
+            deadline_stats.cancellations += 1
+            raise
+        finally:
+            await close_stream()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", TOKENS_SAVED_HEADER: str(tokens_saved)},
+        # Also closes the stream if the client disconnects before the body is sent
+        background=BackgroundTask(close_stream),
+    )
+
+@router.post("/chat/batch")
+@traced("routes.chat_batch")
+async def chat_batch(request: BatchChatRequest, http_request: Request):
+    """
+    Answer several questions (about one page or several) in one request, as NDJSON.
+
+    Each distinct page is compacted, tokenized and hashed once and shared
+    by its items, so items about the same page also share the prompt prefix
+    (and its context cache). Up to BATCH_CONCURRENCY items call Gemini at
+    once, each under the key's rate limit. A line is written per item as
+    soon as it finishes, in completion order:
+    {"index", "id", "model", "text"} (plus "suggestions" when
+    suggestion_count is set), or {"index", "id", "error": {"status",
+    "kind", "detail"}} if that item failed. A final
+    {"done": true, "succeeded", "failed"} line ends the batch. Items still
+    running when the deadline passes fail with kind "timeout".
+
+    Args:
+        request: The batch, with defaults for the page and query of its items.
+        http_request: The raw HTTP request, used for the deadline.
+
+    Returns:
+        StreamingResponse: An application/x-ndjson response.
+    """
+    # Validate API key
+    if not validate_api_key(request.api_key):
+        raise HTTPException(status_code=401, detail="Invalid API key")
+    deadline = start_deadline(http_request)
+
+    # Each distinct page is resolved once, by the first item that needs it
+    pages: Dict[Tuple[Optional[str], Optional[str]], asyncio.Future] = {}
+
+    def page_of(item: BatchChatItem) -> asyncio.Future:
+        if item.webpage_content is not None or item.page_id is not None:
+            reference = (item.webpage_content, item.page_id)
+        else:
+            reference = (request.webpage_content, request.page_id)
+        if reference not in pages:
+            pages[reference] = asyncio.ensure_future(_resolve_batch_page(*reference))
+        return pages[reference]
+
+    fan_out = asyncio.Semaphore(max(1, settings.BATCH_CONCURRENCY))
+
+    async def answer(item: BatchChatItem, page_future: asyncio.Future) -> Dict[str, Any]:
+        async with fan_out:
+            page = await asyncio.shield(page_future)
+            query = item.query if item.query is not None else request.query
+            if request.use_retrieval:
+                page = await retrieve_relevant_content(page, query)
+            input_text_parts = [f"USER QUERY: {query}"]
+
+            # Select the model per item, as the pages (and so token counts) may differ
+            route = model_router.route(TASK_CHAT, page.token_count + estimate_tokens(query), request.api_key)
+            try:
+                if request.suggestion_count:
+                    content = await get_gemini_answer_with_suggestions(
+                        request.api_key, route.model, input_text_parts, page, request.suggestion_count, None, route.fallbacks
+                    )
+                else:
+                    content = {
+                        "text": await get_gemini_response(
+                            request.api_key, route.model, input_text_parts, page, None, route.fallbacks
+                        )
+                    }
+            except RateLimitExceeded as e:
+                raise _too_many_requests(e)
+            return {"model": route.model, **content}
+
+    # Start the items now, in this request's context (deadline, trace)
+    tasks = {
+        asyncio.ensure_future(answer(item, page_of(item))): (index, item.id)
+        for index, item in enumerate(request.items)
+    }
+
+    stream_tracker.start()
+    closed = False
+
+    async def cancel_items():
+        nonlocal closed
+        if closed:
+            return
+        closed = True
+        # Stop the items (and their upstream calls) that are still running
+        for task in [*tasks, *pages.values()]:
+            task.cancel()
+        await asyncio.gather(*tasks, *pages.values(), return_exceptions=True)
+        stream_tracker.finish()
+
+    async def results():
+        pending = set(tasks)
+        failed = 0
+        try:
+            while pending:
+                try:
+                    async with asyncio.timeout_at(deadline):
+                        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                except TimeoutError:
+                    break
+                for task in sorted(done, key=lambda task: tasks[task][0]):
+                    index, item_id = tasks[task]
+                    line = {"index": index, "id": item_id}
+                    if task.exception() is None:
+                        line.update(task.result())
+                    else:
+                        failed += 1
+                        line["error"] = _item_error(task.exception())
+                    yield dumps(line) + b"\n"
+
+            # Whatever is left ran out of time
+            for task in sorted(pending, key=lambda task: tasks[task][0]):
+                index, item_id = tasks[task]
+                failed += 1
+                error = {"status": 504, "kind": "timeout", "detail": "Request deadline exceeded"}
+                yield dumps({"index": index, "id": item_id, "error": error}) + b"\n"
+            if pending:
+                deadline_stats.timeouts += 1
+            else:
+                deadline_stats.completed += 1
+            yield dumps({"done": True, "succeeded": len(tasks) - failed, "failed": failed}) + b"\n"
+        except asyncio.CancelledError:
+            # The server cancels the response when the client disconnects
+            deadline_stats.cancellations += 1
+            raise
+        finally:
+            await cancel_items()
+
+    return StreamingResponse(
+        results(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        # Also cancels the items if the client disconnects before the body is sent
+        background=BackgroundTask(cancel_items),
     )
 
 @router.post("/suggest-questions", response_model=SuggestQuestionsResponse)
-async def suggest_questions(request: SuggestQuestionsRequest):
+@traced("routes.suggest_questions")
+async def suggest_questions(request: SuggestQuestionsRequest, response: Response, http_request: Request):
     """
     Generate suggested questions based on webpage content.
 
     Args:
         request: The request containing the API key, webpage content, and count.
+        response: The outgoing response, used to report the tokens saved by compaction.
+        http_request: The raw HTTP request, used for the deadline and to detect client disconnects.
 
     Returns:
         SuggestQuestionsResponse: A response containing a list of suggested questions.
@@ -62,26 +645,55 @@ async def suggest_questions(request: SuggestQuestionsRequest):
     # Validate API key
     if not validate_api_key(request.api_key):
         raise HTTPException(status_code=401, detail="Invalid API key")
+    start_deadline(http_request)
 
     # Estimate token count to determine which model to use
-    token_count = estimate_tokens(request.webpage_content)
+    session = _get_session(request, request.api_key)
+    page = await _resolve_page(request, session)
+    response.headers[TOKENS_SAVED_HEADER] = str(page.tokens_saved)
+    token_count = page.token_count
+
+    # Select the model (and failover models) based on token count, task and model health
+    route = model_router.route(TASK_SUGGESTIONS, token_count, request.api_key)
+    set_attributes(model=route.model, token_count=token_count)
 
-    # Select model based on token count
-    # If token count exceeds the configured token limit, use the fallback model
-    if token_count > settings.TOKEN_LIMIT:
-        model_name = settings.FALLBACK_MODEL
+    # A session's history replaces the client-side conversation history
+    if session is not None:
+        conversation_history = session.to_messages()
     else:
-        model_name = settings.PRIMARY_MODEL
+        conversation_history = [message.model_dump() for message in request.conversation_history]
 
     # Generate question suggestions
-    questions = await generate_question_suggestions(
+    async def suggest() -> List[str]:
+        try:
+            return await generate_question_suggestions(
+                request.api_key,
+                route.model,
+                page.content,
+                request.count,
+                conversation_history,
+                request.use_conversation_context,
+                route.fallbacks
+            )
+        except RateLimitExceeded as e:
+            raise _too_many_requests(e)
+
+    # Suggestions already cached (or prefetched) are served before the rate limit is consulted
+    if page.page_id is None:
+        page.page_id = compute_page_id(page.content)
+    questions = cached_question_suggestions(
         request.api_key,
-        model_name,
-        request.webpage_content,
+        route.model,
+        page.page_id,
         request.count,
-        request.conversation_history,
-        request.use_conversation_context
+        conversation_history,
+        request.use_conversation_context,
     )
+    if questions is None:
+        questions = await run_with_deadline(http_request, suggest())
+
+    # The summary is usually asked next
+    prefetcher.prefetch_page(request.api_key, page, suggestions=False)
 
     # Return JSON response
     return SuggestQuestionsResponse(questions=questions)
@@ -95,3 +707,33 @@ async def health_check():
         dict: A dictionary containing the status of the API.
     """
     return {"status": "healthy"}
+
+# Components whose counters are reported by /stats (and exported on /metrics)
+STATS_SOURCES = {
+    "client_pool": client_pool.stats,
+    "content_compaction": compaction_stats.stats,
+    "deadlines": deadline_stats.stats,
+    "page_store": page_store.stats,
+    "prefetch": prefetcher.stats,
+    "rate_limiter": rate_limiter.stats,
+    "context_cache": context_cache.stats,
+    "model_router": model_router.stats,
+    "retrieval_index_cache": retrieval_index_cache.stats,
+    "single_flight": gemini_single_flight.stats,
+    "suggestion_cache": suggestion_cache.stats,
+    "sessions": session_store.stats,
+    "streams": stream_tracker.stats,
+    "warmup": startup_warmup.stats,
+}
+if shared_backend is not None:
+    STATS_SOURCES["cache_backend"] = shared_backend.stats
+
+@router.get("/stats")
+async def stats():
+    """
+    Internal counters for sizing caches and pools.
+
+    Returns:
+        dict: A dictionary of counters per component.
+    """
+    return {name: stats_fn() for name, stats_fn in STATS_SOURCES.items()}
@@ -17,11 +17,134 @@ class Settings(BaseModel):
     # Server settings
     HOST: str = os.getenv("HOST", "0.0.0.0")
     PORT: int = int(os.getenv("PORT", "8000"))
+    WORKERS: int = int(os.getenv("WORKERS", "1"))  # Worker processes when not in DEBUG (reload) mode
+    SHUTDOWN_TIMEOUT: float = float(os.getenv("SHUTDOWN_TIMEOUT", "30"))  # Seconds to let in-flight requests and streams finish on shutdown
+    # Startup warmup (tokenizer, deferred imports, client pool): "blocking" (ready once warm),
+    # "background" (serve at once and warm up meanwhile) or "off"
+    STARTUP_WARMUP: str = os.getenv("STARTUP_WARMUP", "blocking")
+
+    # Cache backend for the suggestion cache, context cache handles, rate limits, registered pages and sessions:
+    # "memory" (per worker) or "sqlite" (a file shared by all workers of the host)
+    CACHE_BACKEND: str = os.getenv("CACHE_BACKEND", "memory")
+    CACHE_SQLITE_PATH: str = os.getenv("CACHE_SQLITE_PATH", "")  # Empty uses a file in the temp directory
+    CACHE_SQLITE_MAX_ENTRIES: int = int(os.getenv("CACHE_SQLITE_MAX_ENTRIES", "100000"))
+    CACHE_SQLITE_BUSY_TIMEOUT: float = float(os.getenv("CACHE_SQLITE_BUSY_TIMEOUT", "0.05"))  # Seconds a write waits for another worker's lock before failing open
 
     # Gemini API settings
     PRIMARY_MODEL: str = os.getenv("PRIMARY_MODEL", "gemini-2.5-flash-preview-04-17")
     FALLBACK_MODEL: str = os.getenv("FALLBACK_MODEL", "gemini-2.0-flash-lite")
     TOKEN_LIMIT: int = int(os.getenv("TOKEN_LIMIT", "200000"))  # Token limit for primary model
+    GEMINI_BASE_URL: str = os.getenv("GEMINI_BASE_URL", "")  # Alternative API endpoint, e.g. the benchmarks' fake server
+
+    # Model routing settings
+    SUGGESTIONS_MODEL: str = os.getenv("SUGGESTIONS_MODEL", "")  # Preferred model for suggested questions (empty uses the chat models)
+    ROUTER_POLICY: str = os.getenv("ROUTER_POLICY", "preference")  # "preference" (configured order) or "latency"
+    ROUTER_MAX_ERROR_RATE: float = float(os.getenv("ROUTER_MAX_ERROR_RATE", "0.5"))  # Latency policy avoids models above this error rate
+    ROUTER_EWMA_ALPHA: float = float(os.getenv("ROUTER_EWMA_ALPHA", "0.2"))  # Weight of the newest call in latency/error averages
+    ROUTER_QUOTA_COOLDOWN: float = float(os.getenv("ROUTER_QUOTA_COOLDOWN", "60"))  # Seconds a key avoids a model after a 429
+    ROUTER_MAX_KEYS: int = int(os.getenv("ROUTER_MAX_KEYS", "10000"))  # Keys whose quota cooldowns are kept
+    ROUTER_FAILOVER: bool = os.getenv("ROUTER_FAILOVER", "True").lower() == "true"
+
+    # Gemini retry settings (only timeouts, network errors and 5xx responses are retried)
+    GEMINI_MAX_ATTEMPTS: int = int(os.getenv("GEMINI_MAX_ATTEMPTS", "3"))
+    GEMINI_RETRY_BUDGET: float = float(os.getenv("GEMINI_RETRY_BUDGET", "15"))  # Seconds after which no further attempt is started
+    GEMINI_RETRY_MAX_WAIT: float = float(os.getenv("GEMINI_RETRY_MAX_WAIT", "8"))  # Cap of the jittered backoff between attempts
+
+    # Token estimation settings
+    TOKEN_ESTIMATE_MAX_CHARS_PER_TOKEN: float = float(os.getenv("TOKEN_ESTIMATE_MAX_CHARS_PER_TOKEN", "10"))  # Above this many chars per limit token, skip encoding
+    TOKEN_ESTIMATE_THREAD_THRESHOLD: int = int(os.getenv("TOKEN_ESTIMATE_THREAD_THRESHOLD", "65536"))  # Texts longer than this are encoded off the event loop
+    TOKEN_ESTIMATE_WORKERS: int = int(os.getenv("TOKEN_ESTIMATE_WORKERS", "2"))
+    TOKENIZER_CACHE_DIR: str = os.getenv("TOKENIZER_CACHE_DIR", "")  # Directory with the tiktoken BPE file (empty uses tiktoken's own cache)
+
+    # Request body settings (applies to the decompressed size of compressed bodies too)
+    MAX_REQUEST_BODY_BYTES: int = int(os.getenv("MAX_REQUEST_BODY_BYTES", str(64 * 1024 * 1024)))
+
+    # Request field limits, checked before anything else looks at the request
+    MAX_PAGE_CHARS: int = int(os.getenv("MAX_PAGE_CHARS", str(64 * 1024 * 1024)))  # Characters of webpage_content
+    MAX_QUERY_CHARS: int = int(os.getenv("MAX_QUERY_CHARS", "8000"))
+    MAX_HISTORY_MESSAGES: int = int(os.getenv("MAX_HISTORY_MESSAGES", "100"))  # Most recent messages of conversation_history kept
+    MAX_MESSAGE_CHARS: int = int(os.getenv("MAX_MESSAGE_CHARS", "100000"))  # Characters per conversation_history message
+
+    # Prometheus metrics (GET /metrics)
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "True").lower() == "true"
+
+    # OpenTelemetry tracing (needs the optional opentelemetry-sdk package; OTLP also needs
+    # opentelemetry-exporter-otlp-proto-http, configured with the OTEL_EXPORTER_OTLP_* variables)
+    TRACING_ENABLED: bool = os.getenv("TRACING_ENABLED", "False").lower() == "true"
+    TRACING_EXPORTER: str = os.getenv("TRACING_EXPORTER", "console")  # "console" or "otlp"
+    TRACING_SERVICE_NAME: str = os.getenv("TRACING_SERVICE_NAME", "webpage-chatter-backend")
+
+    # Request deadline settings (clients can ask for another timeout with the X-Request-Timeout header)
+    REQUEST_TIMEOUT: float = float(os.getenv("REQUEST_TIMEOUT", "60"))  # Seconds before a request is cancelled with 504
+    REQUEST_TIMEOUT_MAX: float = float(os.getenv("REQUEST_TIMEOUT_MAX", "300"))  # Upper bound for client-requested timeouts
+
+    # Content compaction settings (whitespace, duplicate and boilerplate removal before prompting)
+    CONTENT_COMPACTION_ENABLED: bool = os.getenv("CONTENT_COMPACTION_ENABLED", "True").lower() == "true"
+    CONTENT_COMPACTION_THREAD_THRESHOLD: int = int(os.getenv("CONTENT_COMPACTION_THREAD_THRESHOLD", "65536"))  # Characters above which compaction runs in a thread
+
+    # Page store settings
+    PAGE_STORE_MAX_BYTES: int = int(os.getenv("PAGE_STORE_MAX_BYTES", str(256 * 1024 * 1024)))  # In-memory bound for registered pages, in UTF-8 bytes
+    PAGE_STORE_SPILL_DIR: str = os.getenv("PAGE_STORE_SPILL_DIR", "")  # Directory for evicted pages (empty disables spilling)
+    PAGE_STORE_SPILL_MAX_BYTES: int = int(os.getenv("PAGE_STORE_SPILL_MAX_BYTES", str(1024 * 1024 * 1024)))
+    PAGE_STORE_SHARED_TTL: float = float(os.getenv("PAGE_STORE_SHARED_TTL", "3600"))  # Seconds pages stay in a shared cache backend
+
+    # Gemini context cache settings (reuse an uploaded page across follow-up questions)
+    CONTEXT_CACHE_ENABLED: bool = os.getenv("CONTEXT_CACHE_ENABLED", "True").lower() == "true"
+    CONTEXT_CACHE_MIN_TOKENS: int = int(os.getenv("CONTEXT_CACHE_MIN_TOKENS", "32768"))  # Smaller pages are always sent inline
+    CONTEXT_CACHE_TTL: int = int(os.getenv("CONTEXT_CACHE_TTL", "600"))  # Seconds an upstream cache lives
+
+    # Retrieval settings (opt-in per request with use_retrieval)
+    RETRIEVAL_TOKEN_BUDGET: int = int(os.getenv("RETRIEVAL_TOKEN_BUDGET", "32000"))  # Max page tokens sent in retrieval mode
+    RETRIEVAL_TOP_K: int = int(os.getenv("RETRIEVAL_TOP_K", "40"))  # Max chunks sent in retrieval mode
+    RETRIEVAL_CHUNK_CHARS: int = int(os.getenv("RETRIEVAL_CHUNK_CHARS", "2000"))
+    RETRIEVAL_CHUNK_OVERLAP: int = int(os.getenv("RETRIEVAL_CHUNK_OVERLAP", "200"))
+    RETRIEVAL_INDEX_CACHE_SIZE: int = int(os.getenv("RETRIEVAL_INDEX_CACHE_SIZE", "32"))  # Pages whose index is kept
+
+    # Share one upstream call between identical concurrent chat/suggestion requests
+    COALESCE_REQUESTS: bool = os.getenv("COALESCE_REQUESTS", "True").lower() == "true"
+
+    # Suggested questions cache (a stale TTL above zero enables stale-while-revalidate)
+    SUGGESTION_CACHE_SIZE: int = int(os.getenv("SUGGESTION_CACHE_SIZE", "1024"))
+    SUGGESTION_CACHE_TTL: float = float(os.getenv("SUGGESTION_CACHE_TTL", "600"))  # Seconds a result is fresh
+    SUGGESTION_CACHE_STALE_TTL: float = float(os.getenv("SUGGESTION_CACHE_STALE_TTL", "0"))  # Seconds a stale result is served while refreshing
+
+    # Speculative prefetch of a registered page's summary and suggestions (spends the user's Gemini quota)
+    PREFETCH_ENABLED: bool = os.getenv("PREFETCH_ENABLED", "False").lower() == "true"
+    PREFETCH_QUERY: str = os.getenv("PREFETCH_QUERY", "Summarize this page")  # Chat query answered ahead of time
+    PREFETCH_SUGGESTION_COUNT: int = int(os.getenv("PREFETCH_SUGGESTION_COUNT", "3"))  # 0 to prefetch only the summary
+    PREFETCH_CACHE_SIZE: int = int(os.getenv("PREFETCH_CACHE_SIZE", "256"))
+    PREFETCH_TTL: float = float(os.getenv("PREFETCH_TTL", "120"))  # Seconds a prefetched summary is served
+    PREFETCH_BUDGET: float = float(os.getenv("PREFETCH_BUDGET", "20"))  # Prefetch calls per key per window
+    PREFETCH_BUDGET_WINDOW: float = float(os.getenv("PREFETCH_BUDGET_WINDOW", "3600"))  # Seconds
+    PREFETCH_CONCURRENCY: int = int(os.getenv("PREFETCH_CONCURRENCY", "4"))  # Prefetch calls in flight per worker
+
+    # Batch chat settings (POST /api/chat/batch)
+    BATCH_MAX_ITEMS: int = int(os.getenv("BATCH_MAX_ITEMS", "20"))  # Questions per batch request
+    BATCH_CONCURRENCY: int = int(os.getenv("BATCH_CONCURRENCY", "4"))  # Items of one batch calling Gemini at once
+
+    # Conversation session settings
+    SESSION_MAX_SESSIONS: int = int(os.getenv("SESSION_MAX_SESSIONS", "10000"))
+    SESSION_IDLE_TTL: float = float(os.getenv("SESSION_IDLE_TTL", "3600"))  # Seconds before an idle session is dropped
+    SESSION_TOKEN_BUDGET: int = int(os.getenv("SESSION_TOKEN_BUDGET", "8000"))  # History tokens kept before old turns are summarized
+    SESSION_SUMMARY_MAX_CHARS: int = int(os.getenv("SESSION_SUMMARY_MAX_CHARS", "2000"))
+
+    # Per-API-key rate limiting (per worker); requests queue up to RATE_LIMIT_MAX_WAIT, then get a 429
+    RATE_LIMIT_ENABLED: bool = os.getenv("RATE_LIMIT_ENABLED", "True").lower() == "true"
+    RATE_LIMIT_RPS: float = float(os.getenv("RATE_LIMIT_RPS", "5"))  # Sustained requests per second per key
+    RATE_LIMIT_BURST: float = float(os.getenv("RATE_LIMIT_BURST", "20"))
+    RATE_LIMIT_MAX_WAIT: float = float(os.getenv("RATE_LIMIT_MAX_WAIT", "10"))  # Seconds a request may queue
+    RATE_LIMIT_MAX_KEYS: int = int(os.getenv("RATE_LIMIT_MAX_KEYS", "10000"))
+    KEY_CONCURRENCY_INITIAL: float = float(os.getenv("KEY_CONCURRENCY_INITIAL", "8"))  # Adapted to upstream 429s (AIMD)
+    KEY_CONCURRENCY_MIN: float = float(os.getenv("KEY_CONCURRENCY_MIN", "1"))
+    KEY_CONCURRENCY_MAX: float = float(os.getenv("KEY_CONCURRENCY_MAX", "32"))
+    GLOBAL_UPSTREAM_CONCURRENCY: int = int(os.getenv("GLOBAL_UPSTREAM_CONCURRENCY", "128"))  # Upstream calls across all keys
+
+    # Gemini client pool settings
+    GEMINI_CLIENT_POOL_SIZE: int = int(os.getenv("GEMINI_CLIENT_POOL_SIZE", "256"))  # Max cached clients (one per API key)
+    GEMINI_CLIENT_IDLE_TTL: float = float(os.getenv("GEMINI_CLIENT_IDLE_TTL", "600"))  # Seconds before an idle client is evicted
+    GEMINI_MAX_CONNECTIONS: int = int(os.getenv("GEMINI_MAX_CONNECTIONS", "200"))
+    GEMINI_MAX_KEEPALIVE_CONNECTIONS: int = int(os.getenv("GEMINI_MAX_KEEPALIVE_CONNECTIONS", "50"))
+    GEMINI_KEEPALIVE_EXPIRY: float = float(os.getenv("GEMINI_KEEPALIVE_EXPIRY", "60"))
 
     # CORS settings
     CORS_ORIGINS: List[str] = os.getenv("CORS_ORIGINS", "*").split(",")
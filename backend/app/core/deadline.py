@@ -0,0 +1,140 @@
+import asyncio
+import math
+from contextvars import ContextVar
+from typing import Awaitable, Dict, Optional, TypeVar
+from fastapi import HTTPException, Request
+from app.core.config import settings
+
+T = TypeVar("T")
+
+# Request header with the seconds the client is willing to wait for a response
+REQUEST_TIMEOUT_HEADER = "X-Request-Timeout"
+
+# Event loop time by which the current request must be answered
+_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+class DeadlineStats:
+    """
+    Process-wide counters of how deadline-bounded requests ended.
+    """
+
+    def __init__(self):
+        self.completed = 0
+        self.timeouts = 0
+        self.cancellations = 0
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get the deadline counters.
+
+        Returns:
+            dict: Requests completed in time, timed out, and cancelled
+            because the client disconnected.
+        """
+        return {
+            "completed": self.completed,
+            "timeouts": self.timeouts,
+            "cancellations": self.cancellations,
+        }
+
+deadline_stats = DeadlineStats()
+
+def start_deadline(request: Request) -> float:
+    """
+    Start the deadline of a request.
+
+    The client can ask for a shorter or longer timeout with the
+    X-Request-Timeout header (seconds), up to REQUEST_TIMEOUT_MAX; without
+    it REQUEST_TIMEOUT applies. The deadline is kept in a context variable,
+    so the work of the request (including tasks it starts) can see it.
+
+    Args:
+        request: The incoming request.
+
+    Returns:
+        float: The deadline, in event loop time.
+
+    Raises:
+        HTTPException: If the header is not a positive number of seconds.
+    """
+    timeout = settings.REQUEST_TIMEOUT
+    header = request.headers.get(REQUEST_TIMEOUT_HEADER)
+    if header is not None:
+        try:
+            timeout = float(header)
+        except ValueError:
+            timeout = math.nan
+        if not timeout > 0:
+            raise HTTPException(status_code=400, detail=f"{REQUEST_TIMEOUT_HEADER} must be a positive number of seconds")
+    return set_deadline(min(timeout, settings.REQUEST_TIMEOUT_MAX))
+
+def set_deadline(timeout: float) -> float:
+    """
+    Set the deadline of the current context to `timeout` seconds from now.
+
+    Returns:
+        float: The deadline, in event loop time.
+    """
+    deadline = asyncio.get_running_loop().time() + timeout
+    _deadline.set(deadline)
+    return deadline
+
+def remaining_time() -> Optional[float]:
+    """
+    Seconds left until the current request's deadline.
+
+    Returns:
+        Optional[float]: The time left (negative once passed), or None
+        outside a request with a deadline.
+    """
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - asyncio.get_running_loop().time()
+
+async def _wait_for_disconnect(request: Request) -> None:
+    # Once the body has been read, the next message the server sends is the disconnect
+    while (await request.receive())["type"] != "http.disconnect":
+        pass
+
+async def run_with_deadline(request: Request, work: Awaitable[T]) -> T:
+    """
+    Run the work of a request until it finishes, its deadline passes, or
+    the client disconnects.
+
+    In the latter two cases the work is cancelled, which cancels the
+    upstream Gemini call it is waiting on.
+
+    Args:
+        request: The request; its body must have been read already.
+        work: The work to run (the deadline must have been started).
+
+    Returns:
+        The result of the work.
+
+    Raises:
+        HTTPException: 504 when the deadline passes, 499 when the client
+        disconnected (the response is never seen).
+    """
+    task = asyncio.ensure_future(work)
+    disconnect = asyncio.ensure_future(_wait_for_disconnect(request))
+    try:
+        remaining = remaining_time()
+        done, _ = await asyncio.wait(
+            {task, disconnect},
+            timeout=max(0.0, remaining) if remaining is not None else None,
+            return_when=asyncio.FIRST_COMPLETED,
+        )
+        if task in done:
+            deadline_stats.completed += 1
+            return task.result()
+        if disconnect in done:
+            deadline_stats.cancellations += 1
+            raise HTTPException(status_code=499, detail="Client closed request")
+        deadline_stats.timeouts += 1
+        raise HTTPException(status_code=504, detail="Request deadline exceeded")
+    finally:
+        for pending in (task, disconnect):
+            pending.cancel()
+        # Let the work unwind (closing upstream calls) before answering
+        await asyncio.gather(task, disconnect, return_exceptions=True)
@@ -0,0 +1,42 @@
+from typing import Dict
+
+class StreamTracker:
+    """
+    Counts the streaming responses in flight.
+
+    Shutdown doesn't wait here: on SIGTERM the server stops accepting
+    connections and waits up to SHUTDOWN_TIMEOUT (timeout_graceful_shutdown)
+    for open requests and streams, and only then runs the app's shutdown,
+    when no stream is left to wait for.
+    """
+
+    def __init__(self):
+        self.in_flight = 0
+        self.started = 0
+
+    def start(self) -> None:
+        """
+        Count a stream that started.
+        """
+        self.in_flight += 1
+        self.started += 1
+
+    def finish(self) -> None:
+        """
+        Count a stream that ended (call exactly once per start).
+        """
+        self.in_flight -= 1
+
+    def stats(self) -> Dict[str, object]:
+        """
+        Get the stream counters.
+
+        Returns:
+            dict: Streams in flight and started.
+        """
+        return {
+            "in_flight": self.in_flight,
+            "started": self.started,
+        }
+
+stream_tracker = StreamTracker()
@@ -0,0 +1,62 @@
+from typing import Any, Callable, Coroutine
+import orjson
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+
+# Dict keys that aren't strings (e.g. ints in stats) are written as strings, like json.dumps does
+_DUMPS_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+def dumps(obj: Any) -> bytes:
+    """
+    Serialize to compact UTF-8 JSON with orjson.
+
+    Args:
+        obj: JSON-compatible data.
+
+    Returns:
+        bytes: The JSON document.
+    """
+    return orjson.dumps(obj, option=_DUMPS_OPTIONS)
+
+def loads(data: Any) -> Any:
+    """
+    Parse JSON with orjson.
+
+    Raises:
+        json.JSONDecodeError: If the data isn't valid JSON (orjson's error
+        subclasses it, so callers handling the stdlib error keep working).
+    """
+    return orjson.loads(data)
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON response rendered with orjson, for endpoints that return a dict
+    instead of a response model (those are serialized by pydantic directly).
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+class FastJSONRequest(Request):
+    """
+    Request whose JSON body is parsed with orjson.
+    """
+
+    async def json(self) -> Any:
+        if not hasattr(self, "_json"):
+            self._json = loads(await self.body())
+        return self._json
+
+class FastJSONRoute(APIRoute):
+    """
+    Route that parses request bodies with orjson before pydantic validates them.
+    """
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        handler = super().get_route_handler()
+
+        async def route_handler(request: Request) -> Response:
+            return await handler(FastJSONRequest(request.scope, request.receive))
+
+        return route_handler
@@ -0,0 +1,83 @@
+import importlib
+import threading
+import time
+from types import ModuleType
+from typing import Any, Dict
+
+_lazy_modules: Dict[str, "LazyModule"] = {}
+
+class LazyModule(ModuleType):
+    """
+    Stand-in for a module that is imported on first attribute access.
+
+    Heavy dependencies (the Gemini SDK, tenacity, numpy) take most of the
+    import time of the app, which autoscaled and serverless deployments pay
+    on every cold start. Modules bind them through `lazy_module` instead, so
+    the cost moves to the first request that needs them, or to the startup
+    warmup (see `load_lazy_modules`).
+
+    Annotations naming the module's types must not be evaluated at import
+    time, so the modules using it enable postponed annotations.
+    """
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self._module = None
+        self._load_time = None
+        self._lock = threading.Lock()
+
+    def _load(self) -> ModuleType:
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    start = time.perf_counter()
+                    module = importlib.import_module(self.__name__)
+                    self._load_time = time.perf_counter() - start
+                    self._module = module
+        return self._module
+
+    def __getattr__(self, attr: str) -> Any:
+        # Only called for attributes not set on the stand-in itself
+        return getattr(self._load(), attr)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module {self.__name__!r} ({state})>"
+
+def lazy_module(name: str) -> Any:
+    """
+    Get a stand-in for a module that imports it on first use.
+
+    Args:
+        name: Absolute module name, e.g. "google.genai.types".
+
+    Returns:
+        LazyModule: The stand-in, shared by all callers asking for the name.
+    """
+    module = _lazy_modules.get(name)
+    if module is None:
+        module = _lazy_modules.setdefault(name, LazyModule(name))
+    return module
+
+def load_lazy_modules() -> Dict[str, float]:
+    """
+    Import every module bound through `lazy_module` that isn't loaded yet.
+
+    Returns:
+        dict: Seconds each module took to import, by module name.
+    """
+    loaded = {}
+    for name, module in list(_lazy_modules.items()):
+        if module._module is None:
+            module._load()
+            loaded[name] = module._load_time
+    return loaded
+
+def lazy_module_stats() -> Dict[str, Any]:
+    """
+    Get which deferred modules are loaded.
+
+    Returns:
+        dict: Import seconds of each loaded module (None if still deferred).
+    """
+    return {name: module._load_time for name, module in _lazy_modules.items()}
@@ -0,0 +1,211 @@
+import time
+from typing import Any, Callable, Dict, Iterator, Optional
+from prometheus_client import CollectorRegistry, Counter, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Labels are limited to small, fixed sets (endpoint names, model names,
+# error kinds); nothing derived from API keys, paths, pages or queries.
+
+registry = CollectorRegistry()
+
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+FAST_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+TOKEN_BUCKETS = (100, 500, 1000, 4000, 16000, 32000, 64000, 128000, 256000, 1000000)
+
+# Other request methods are counted as "OTHER"
+_METHODS = {"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"}
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Time to serve an HTTP request, including streaming the response.",
+    ["method", "handler", "status"],
+    buckets=LATENCY_BUCKETS,
+    registry=registry,
+)
+TIME_TO_FIRST_TOKEN = Histogram(
+    "gemini_time_to_first_token_seconds",
+    "Time from starting a streaming Gemini call to its first text.",
+    ["model"],
+    buckets=LATENCY_BUCKETS,
+    registry=registry,
+)
+UPSTREAM_LATENCY = Histogram(
+    "gemini_request_duration_seconds",
+    "Duration of Gemini calls (whole stream for streaming calls).",
+    ["model", "outcome"],
+    buckets=LATENCY_BUCKETS,
+    registry=registry,
+)
+TOKEN_ESTIMATION_LATENCY = Histogram(
+    "token_estimation_duration_seconds",
+    "Time to estimate the token count of a text.",
+    ["method"],
+    buckets=FAST_BUCKETS,
+    registry=registry,
+)
+PROMPT_TOKENS = Histogram(
+    "gemini_prompt_tokens",
+    "Prompt tokens reported by Gemini per call.",
+    ["model"],
+    buckets=TOKEN_BUCKETS,
+    registry=registry,
+)
+RESPONSE_TOKENS = Histogram(
+    "gemini_response_tokens",
+    "Response tokens reported by Gemini per call.",
+    ["model"],
+    buckets=TOKEN_BUCKETS,
+    registry=registry,
+)
+ROUTING_TOKENS = Histogram(
+    "router_decision_tokens",
+    "Estimated prompt tokens of routed requests, by task, chosen model and reason.",
+    ["task", "model", "reason"],
+    buckets=TOKEN_BUCKETS,
+    registry=registry,
+)
+RETRIES = Counter(
+    "gemini_retries_total",
+    "Gemini calls retried after a retryable error.",
+    registry=registry,
+)
+ERRORS = Counter(
+    "gemini_errors_total",
+    "Failed Gemini calls by error kind.",
+    ["model", "kind"],
+    registry=registry,
+)
+
+def observe_upstream_call(model: str, latency: float, error_kind: Optional[str] = None) -> None:
+    """
+    Record the duration and outcome of one Gemini call.
+
+    Args:
+        model: The model that was called.
+        latency: Seconds the call took.
+        error_kind: The GeminiError kind if the call failed.
+    """
+    UPSTREAM_LATENCY.labels(model, "ok" if error_kind is None else "error").observe(latency)
+    if error_kind is not None:
+        ERRORS.labels(model, error_kind).inc()
+
+def observe_usage(model: str, usage: Any) -> None:
+    """
+    Record the token counts from a Gemini response's usage metadata.
+    """
+    if usage is None:
+        return
+    if usage.prompt_token_count is not None:
+        PROMPT_TOKENS.labels(model).observe(usage.prompt_token_count)
+    if usage.candidates_token_count is not None:
+        RESPONSE_TOKENS.labels(model).observe(usage.candidates_token_count)
+
+# Component stats that are lists of {label: value, ..., "count": n}, exported as labelled counters
+COUNTED_LISTS = {
+    ("model_router", "decisions"): (
+        "router_decisions", "Model routing decisions by task, chosen model and reason.", ["task", "model", "reason"]
+    ),
+    ("model_router", "failovers"): (
+        "router_failovers", "Failovers from one model to the next after an error.", ["from", "to"]
+    ),
+}
+
+class StatsCollector:
+    """
+    Exports the counters of the components' stats() as Prometheus metrics.
+
+    The components already count cache hits and misses and routing
+    decisions on their hot paths, so these are read at scrape time instead
+    of being counted twice.
+    """
+
+    def __init__(self, sources: Dict[str, Callable[[], Dict[str, Any]]]):
+        self.sources = sources
+
+    def collect(self) -> Iterator:
+        hits = CounterMetricFamily("cache_hits", "Cache hits per cache.", labels=["cache"])
+        misses = CounterMetricFamily("cache_misses", "Cache misses per cache.", labels=["cache"])
+        values = GaugeMetricFamily(
+            "component_stat", "Other numeric component counters from /api/stats.", labels=["component", "stat"]
+        )
+        counted = {
+            source: CounterMetricFamily(name, documentation, labels=labels)
+            for source, (name, documentation, labels) in COUNTED_LISTS.items()
+        }
+        for component, stats_fn in self.sources.items():
+            stats = stats_fn()
+            for (counted_component, stat), family in counted.items():
+                if counted_component != component:
+                    continue
+                labels = COUNTED_LISTS[(component, stat)][2]
+                for row in stats.get(stat, []):
+                    family.add_metric([str(row[label]) for label in labels], row["count"])
+            for stat, value in _flatten(stats):
+                if stat == "hits":
+                    hits.add_metric([component], value)
+                elif stat == "misses":
+                    misses.add_metric([component], value)
+                else:
+                    values.add_metric([component, stat], value)
+        yield hits
+        yield misses
+        yield values
+        yield from counted.values()
+
+def _flatten(stats: Dict[str, Any], prefix: str = "") -> Iterator:
+    """
+    Iterate over the numeric values of a stats dict, nested dicts included.
+    """
+    for name, value in stats.items():
+        if isinstance(value, bool):
+            value = int(value)
+        if isinstance(value, (int, float)):
+            yield prefix + name, value
+        elif isinstance(value, dict):
+            yield from _flatten(value, f"{prefix}{name}_")
+
+def register_stats(sources: Dict[str, Callable[[], Dict[str, Any]]]) -> None:
+    """
+    Export component stats (e.g. {"page_store": page_store.stats}) on /metrics.
+    """
+    registry.register(StatsCollector(sources))
+
+def render_metrics() -> bytes:
+    """
+    Render the metrics in the Prometheus text format.
+    """
+    return generate_latest(registry)
+
+class MetricsMiddleware:
+    """
+    Time each HTTP request and count it by endpoint and status.
+
+    The endpoint function names the route (path parameters would make the
+    raw path unbounded); requests that match no route are labelled
+    "unmatched", so scanners can't create new label values.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            method = scope["method"] if scope["method"] in _METHODS else "OTHER"
+            handler = getattr(scope.get("endpoint"), "__name__", "unmatched")
+            REQUEST_LATENCY.labels(method, handler, str(status)).observe(time.perf_counter() - start)
@@ -0,0 +1,186 @@
+import zlib
+from fastapi import HTTPException
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Brotli is optional; without it "br" bodies are rejected as unsupported
+try:
+    import brotli
+except ImportError:
+    try:
+        import brotlicffi as brotli
+    except ImportError:
+        brotli = None
+
+# Bindings without an output bound (brotli < 1.2) could expand a few KB into gigabytes in one call
+if brotli is not None and not hasattr(brotli.Decompressor, "can_accept_more_data"):
+    brotli = None
+
+# Largest slice of output produced per decompression step
+DECOMPRESS_STEP_BYTES = 1024 * 1024
+
+class _GzipDecoder:
+    """
+    Incremental gzip/deflate decoder that never produces more than asked for.
+    """
+
+    def __init__(self, encoding: str):
+        # gzip needs the gzip header, deflate accepts zlib-wrapped data
+        self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS if encoding == "gzip" else zlib.MAX_WBITS)
+
+    def decode(self, data: bytes, max_length: int) -> bytes:
+        return self._decompressor.decompress(data, max_length)
+
+    @property
+    def pending(self) -> bytes:
+        return self._decompressor.unconsumed_tail
+
+    @property
+    def has_output(self) -> bool:
+        # Output beyond max_length stays in the input, as the unconsumed tail
+        return False
+
+    def flush(self) -> bytes:
+        return self._decompressor.flush()
+
+class _BrotliDecoder:
+    """
+    Incremental brotli decoder with bounded output per step.
+
+    The bindings stop growing the output buffer once it reaches the limit,
+    so a step may return up to about twice the limit, never more.
+    """
+
+    def __init__(self):
+        self._decompressor = brotli.Decompressor()
+        self._pending = b""
+        self._has_output = False
+
+    def decode(self, data: bytes, max_length: int) -> bytes:
+        if self._decompressor.can_accept_more_data():
+            self._pending = b""
+        else:
+            # Output held back by the last call must be drained before more input is fed
+            self._pending, data = data, b""
+        output = self._decompressor.process(data, output_buffer_limit=max_length)
+        # Input already taken in may still hold output; ask again until a step yields nothing
+        self._has_output = bool(output) and not self._decompressor.is_finished()
+        return output
+
+    @property
+    def pending(self) -> bytes:
+        return self._pending
+
+    @property
+    def has_output(self) -> bool:
+        return self._has_output or not self._decompressor.can_accept_more_data()
+
+    def flush(self) -> bytes:
+        return b""
+
+def _make_decoder(encoding: str):
+    if encoding in ("gzip", "deflate"):
+        return _GzipDecoder(encoding)
+    if encoding == "br" and brotli is not None:
+        return _BrotliDecoder()
+    return None
+
+def _error_response(status_code: int, detail: str) -> JSONResponse:
+    return JSONResponse({"detail": detail}, status_code=status_code)
+
+class RequestBodyMiddleware:
+    """
+    Bound the size of request bodies and decode compressed ones.
+
+    A Content-Length above `max_body_bytes` is rejected with 413 before any
+    of the body is read; bodies without one (chunked) are counted as they
+    stream in. Bodies sent with `Content-Encoding: gzip`, `deflate` or `br`
+    are decompressed chunk by chunk as the app reads them, and the
+    decompressed size is held to the same limit, so a small compressed body
+    can't expand into an unbounded one.
+    """
+
+    def __init__(self, app: ASGIApp, max_body_bytes: int):
+        self.app = app
+        self.max_body_bytes = max_body_bytes
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        encoding = headers.get(b"content-encoding", b"identity").decode("latin-1").strip().lower()
+        content_length = headers.get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > self.max_body_bytes:
+            await _error_response(413, "Request body too large")(scope, receive, send)
+            return
+
+        decoder = None
+        if encoding != "identity":
+            decoder = _make_decoder(encoding)
+            if decoder is None:
+                await _error_response(415, f"Unsupported Content-Encoding: {encoding}")(scope, receive, send)
+                return
+            # The app sees the decoded body, whose length isn't known up front
+            scope = dict(scope)
+            scope["headers"] = [
+                (name, value) for name, value in scope["headers"]
+                if name not in (b"content-encoding", b"content-length")
+            ]
+
+        await self.app(scope, self._limited_receive(receive, decoder), send)
+
+    def _limited_receive(self, receive: Receive, decoder) -> Receive:
+        limit = self.max_body_bytes
+        received = 0
+        decoded = 0
+        # Compressed input still to be decoded, and the state of the request stream
+        backlog = b""
+        finished = False
+        delivered = False
+
+        def too_large() -> HTTPException:
+            # FastAPI re-raises HTTPExceptions from reading the body as responses
+            return HTTPException(status_code=413, detail="Request body too large")
+
+        async def receive_limited() -> Message:
+            nonlocal received, decoded, backlog, finished, delivered
+            if decoder is None or delivered:
+                message = await receive()
+                if decoder is None and message["type"] == "http.request":
+                    received += len(message.get("body", b""))
+                    if received > limit:
+                        raise too_large()
+                return message
+
+            while True:
+                if not backlog and not finished:
+                    message = await receive()
+                    if message["type"] != "http.request":
+                        return message
+                    backlog = message.get("body", b"")
+                    received += len(backlog)
+                    if received > limit:
+                        raise too_large()
+                    finished = not message.get("more_body", False)
+
+                try:
+                    chunk = decoder.decode(backlog, DECOMPRESS_STEP_BYTES) if backlog or decoder.has_output else b""
+                    backlog = decoder.pending
+                    done = finished and not backlog and not decoder.has_output
+                    if done:
+                        chunk += decoder.flush()
+                except Exception as e:
+                    raise HTTPException(status_code=400, detail="Invalid compressed request body") from e
+
+                decoded += len(chunk)
+                if decoded > limit:
+                    raise too_large()
+                if done:
+                    delivered = True
+                    return {"type": "http.request", "body": chunk, "more_body": False}
+                if chunk:
+                    return {"type": "http.request", "body": chunk, "more_body": True}
+
+        return receive_limited
@@ -1,3 +1,4 @@
+import hashlib
 import re
 from fastapi import HTTPException, Security
 from fastapi.security import APIKeyHeader
@@ -25,6 +26,18 @@ def validate_api_key(api_key: str) -> bool:
     pattern = r'^[A-Za-z0-9_-]{20,}$'
     return bool(re.match(pattern, api_key))
 
+def hash_api_key(api_key: str) -> str:
+    """
+    Hash an API key so it can be used as a cache key or log field.
+
+    Args:
+        api_key: The API key to hash.
+
+    Returns:
+        str: The hex SHA-256 digest of the API key.
+    """
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+
 async def get_api_key(api_key_header: str = Security(api_key_header)) -> str:
     """
     Get and validate the API key from the request header.
@@ -0,0 +1,160 @@
+import functools
+import inspect
+import logging
+from typing import Any, Callable, Optional, TypeVar
+from app.core.config import settings
+
+# OpenTelemetry is optional; without it (or with TRACING_ENABLED off) every
+# helper here is a no-op
+try:
+    from opentelemetry import trace
+except ImportError:
+    trace = None
+
+logger = logging.getLogger(__name__)
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+# Set by setup_tracing; None means tracing is off
+_tracer = None
+_provider = None
+
+class _NoSpan:
+    """
+    Stand-in for a span while tracing is off. One shared instance, so a
+    disabled span costs no allocation.
+    """
+
+    def __enter__(self) -> "_NoSpan":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        return None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def add_event(self, name: str, attributes: Optional[dict] = None) -> None:
+        pass
+
+    def end(self) -> None:
+        pass
+
+NO_SPAN = _NoSpan()
+
+def setup_tracing(exporter: Optional[Any] = None) -> bool:
+    """
+    Start exporting spans if tracing is enabled and OpenTelemetry is installed.
+
+    Spans go to the console (TRACING_EXPORTER=console) or to an OTLP/HTTP
+    collector (TRACING_EXPORTER=otlp, configured with the standard
+    OTEL_EXPORTER_OTLP_* variables).
+
+    Args:
+        exporter: Span exporter to use instead of the configured one (tests).
+
+    Returns:
+        bool: True if spans are being recorded.
+    """
+    global _tracer, _provider
+    if not settings.TRACING_ENABLED and exporter is None:
+        return False
+    if trace is None:
+        logger.warning("TRACING_ENABLED is set but opentelemetry is not installed; tracing is off")
+        return False
+
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor, SimpleSpanProcessor
+
+    provider = TracerProvider(resource=Resource.create({"service.name": settings.TRACING_SERVICE_NAME}))
+    if exporter is not None:
+        provider.add_span_processor(SimpleSpanProcessor(exporter))
+    else:
+        if settings.TRACING_EXPORTER == "otlp":
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+            exporter = OTLPSpanExporter()
+        else:
+            from opentelemetry.sdk.trace.export import ConsoleSpanExporter
+            exporter = ConsoleSpanExporter()
+        # Export from a background thread, off the request path
+        provider.add_span_processor(BatchSpanProcessor(exporter))
+
+    _provider = provider
+    _tracer = provider.get_tracer("webpage-chatter")
+    return True
+
+def shutdown_tracing() -> None:
+    """
+    Flush pending spans and stop tracing.
+    """
+    global _tracer, _provider
+    if _provider is not None:
+        _provider.shutdown()
+    _tracer = None
+    _provider = None
+
+def span(name: str, **attributes: Any):
+    """
+    Start a span for a `with` block, as the current span.
+
+    Returns:
+        A context manager yielding the span (or NO_SPAN when tracing is off).
+    """
+    if _tracer is None:
+        return NO_SPAN
+    return _tracer.start_as_current_span(name, attributes=attributes)
+
+def start_span(name: str, **attributes: Any):
+    """
+    Start a span that the caller ends, e.g. one that spans the yields of
+    an async generator, where a current-span context can't be kept.
+
+    Returns:
+        The span (or NO_SPAN when tracing is off); call .end() when done.
+    """
+    if _tracer is None:
+        return NO_SPAN
+    return _tracer.start_span(name, attributes=attributes)
+
+def set_attributes(**attributes: Any) -> None:
+    """
+    Set attributes on the current span.
+    """
+    if _tracer is None:
+        return
+    current = trace.get_current_span()
+    for key, value in attributes.items():
+        current.set_attribute(key, value)
+
+def traced(name: str) -> Callable[[F], F]:
+    """
+    Decorate a function (sync or async) to run in a span named `name`.
+
+    While tracing is off the wrapper only checks a module global before
+    calling through.
+    """
+    def decorator(func: F) -> F:
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if _tracer is None:
+                    return await func(*args, **kwargs)
+                with _tracer.start_as_current_span(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _tracer is None:
+                return func(*args, **kwargs)
+            with _tracer.start_as_current_span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def is_enabled() -> bool:
+    """
+    Check whether spans are being recorded.
+    """
+    return _tracer is not None
@@ -1,34 +1,117 @@
-from pydantic import BaseModel, Field
+from typing import Any, List, Optional
+from pydantic import BaseModel, ConfigDict, Field, field_validator, model_validator
+from app.core.config import settings
 
-class ChatRequest(BaseModel):
+# Hex SHA-256 digest returned by the page registration endpoint
+PAGE_ID_PATTERN = r"^[0-9a-f]{64}$"
+
+# Gemini API keys are about 40 characters; anything much longer isn't one
+API_KEY_MAX_LENGTH = 256
+
+class StrictModel(BaseModel):
+    """
+    Base model for request bodies: values must already have the field's
+    JSON type (no "5" for 5 or "true" for true), so malformed requests fail
+    validation fast instead of being coerced.
+    """
+    model_config = ConfigDict(strict=True)
+
+class ConversationMessage(StrictModel):
+    """
+    One message of a client-side conversation history.
+    """
+    role: str = Field(..., description="Message author, e.g. \"user\" or \"assistant\"", max_length=32)
+    content: str = Field(..., description="Message text", max_length=settings.MAX_MESSAGE_CHARS)
+
+class PageContentRequest(StrictModel):
+    """
+    Base model for requests that reference a webpage inline, by digest, or
+    through the page of a server-side session.
+    """
+    webpage_content: Optional[str] = Field(None, description="Extracted content from the webpage", max_length=settings.MAX_PAGE_CHARS)
+    page_id: Optional[str] = Field(None, description="Digest of a page registered via /api/pages", pattern=PAGE_ID_PATTERN)
+    session_id: Optional[str] = Field(None, description="Conversation session created via /api/sessions", max_length=128)
+
+    @model_validator(mode="after")
+    def check_page_reference(self):
+        if self.webpage_content is None and self.page_id is None and self.session_id is None:
+            raise ValueError("One of webpage_content, page_id or session_id is required")
+        return self
+
+class CreateSessionRequest(StrictModel):
+    """
+    Request model for session creation endpoint.
+    """
+    api_key: str = Field(..., description="User's Gemini API key", max_length=API_KEY_MAX_LENGTH)
+    page_id: Optional[str] = Field(None, description="Digest of the registered page the session is about", pattern=PAGE_ID_PATTERN)
+
+    model_config = ConfigDict(
+        json_schema_extra={
+            "example": {
+                "api_key": "YOUR_GEMINI_API_KEY",
+                "page_id": "9f86d081884c7d659a2feaa0c55ad015a3bf4f1b2b0b822cd15d6c15b0f00a08"
+            }
+        }
+    )
+
+class RegisterPageRequest(StrictModel):
+    """
+    Request model for page registration endpoint.
+    """
+    api_key: str = Field(..., description="User's Gemini API key", max_length=API_KEY_MAX_LENGTH)
+    webpage_content: str = Field(..., description="Extracted content from the webpage", max_length=settings.MAX_PAGE_CHARS)
+
+    model_config = ConfigDict(
+        json_schema_extra={
+            "example": {
+                "api_key": "YOUR_GEMINI_API_KEY",
+                "webpage_content": "This is the content of the webpage..."
+            }
+        }
+    )
+
+class ChatRequest(PageContentRequest):
     """
     Request model for chat endpoint.
     """
-    api_key: str = Field(..., description="User's Gemini API key")
-    webpage_content: str = Field(..., description="Extracted content from the webpage")
-    query: str = Field(..., description="User's query about the webpage content")
+    api_key: str = Field(..., description="User's Gemini API key", max_length=API_KEY_MAX_LENGTH)
+    query: str = Field(..., description="User's query about the webpage content", max_length=settings.MAX_QUERY_CHARS)
+    use_retrieval: bool = Field(False, description="For large pages, send only the sections most relevant to the query")
+    suggestion_count: int = Field(0, description="Number of follow-up questions to return with the answer", ge=0, le=10)
 
-    class Config:
-        schema_extra = {
+    model_config = ConfigDict(
+        json_schema_extra={
             "example": {
                 "api_key": "YOUR_GEMINI_API_KEY",
                 "webpage_content": "This is the content of the webpage...",
-                "query": "What is this webpage about?"
+                "query": "What is this webpage about?",
+                "use_retrieval": False,
+                "suggestion_count": 3
             }
         }
+    )
 
-class SuggestQuestionsRequest(BaseModel):
+class SuggestQuestionsRequest(PageContentRequest):
     """
     Request model for question suggestions endpoint.
     """
-    api_key: str = Field(..., description="User's Gemini API key")
-    webpage_content: str = Field(..., description="Extracted content from the webpage")
+    api_key: str = Field(..., description="User's Gemini API key", max_length=API_KEY_MAX_LENGTH)
     count: int = Field(5, description="Number of question suggestions to generate", ge=1, le=10)
-    conversation_history: list = Field([], description="Previous messages in the conversation")
+    conversation_history: List[ConversationMessage] = Field(
+        [], description="Previous messages in the conversation (only the most recent are kept; ignored with session_id)"
+    )
     use_conversation_context: bool = Field(False, description="Whether to use conversation history for context")
 
-    class Config:
-        schema_extra = {
+    @field_validator("conversation_history", mode="before")
+    @classmethod
+    def keep_recent_history(cls, value: Any) -> Any:
+        # Clients send the whole chat; only the last messages are validated and kept
+        if isinstance(value, list) and len(value) > settings.MAX_HISTORY_MESSAGES:
+            return value[len(value) - settings.MAX_HISTORY_MESSAGES:]
+        return value
+
+    model_config = ConfigDict(
+        json_schema_extra={
             "example": {
                 "api_key": "YOUR_GEMINI_API_KEY",
                 "webpage_content": "This is the content of the webpage...",
@@ -40,3 +123,52 @@ class SuggestQuestionsRequest(BaseModel):
                 "use_conversation_context": True
             }
         }
+    )
+
+class BatchChatItem(StrictModel):
+    """
+    One question of a batch chat request. The page and query default to
+    those of the batch.
+    """
+    id: Optional[str] = Field(None, description="Client-chosen id echoed in the item's result", max_length=256)
+    query: Optional[str] = Field(None, description="Question about the page (defaults to the batch's query)", max_length=settings.MAX_QUERY_CHARS)
+    webpage_content: Optional[str] = Field(
+        None, description="Extracted content of the page (defaults to the batch's page)", max_length=settings.MAX_PAGE_CHARS
+    )
+    page_id: Optional[str] = Field(None, description="Digest of a page registered via /api/pages", pattern=PAGE_ID_PATTERN)
+
+class BatchChatRequest(StrictModel):
+    """
+    Request model for the batch chat endpoint: several questions about one
+    page, one question about several pages, or any mix of the two.
+    """
+    api_key: str = Field(..., description="User's Gemini API key", max_length=API_KEY_MAX_LENGTH)
+    webpage_content: Optional[str] = Field(None, description="Page for items without their own", max_length=settings.MAX_PAGE_CHARS)
+    page_id: Optional[str] = Field(None, description="Registered page for items without their own", pattern=PAGE_ID_PATTERN)
+    query: Optional[str] = Field(None, description="Question for items without their own", max_length=settings.MAX_QUERY_CHARS)
+    items: List[BatchChatItem] = Field(..., description="The questions to answer", min_length=1, max_length=settings.BATCH_MAX_ITEMS)
+    use_retrieval: bool = Field(False, description="For large pages, send only the sections most relevant to each query")
+    suggestion_count: int = Field(0, description="Number of follow-up questions to return with each answer", ge=0, le=10)
+
+    @model_validator(mode="after")
+    def check_items(self):
+        has_page = self.webpage_content is not None or self.page_id is not None
+        for index, item in enumerate(self.items):
+            if not has_page and item.webpage_content is None and item.page_id is None:
+                raise ValueError(f"Item {index} has no page: send webpage_content or page_id")
+            if self.query is None and item.query is None:
+                raise ValueError(f"Item {index} has no query")
+        return self
+
+    model_config = ConfigDict(
+        json_schema_extra={
+            "example": {
+                "api_key": "YOUR_GEMINI_API_KEY",
+                "webpage_content": "This is the content of the webpage...",
+                "items": [
+                    {"id": "q1", "query": "What is this webpage about?"},
+                    {"id": "q2", "query": "Who is the author?"}
+                ]
+            }
+        }
+    )
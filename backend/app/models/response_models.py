@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from typing import List, Optional
 
 class ErrorResponse(BaseModel):
@@ -19,8 +19,8 @@ class SuggestQuestionsResponse(BaseModel):
     """
     questions: List[str] = Field(..., description="List of suggested questions")
 
-    class Config:
-        schema_extra = {
+    model_config = ConfigDict(
+        json_schema_extra={
             "example": {
                 "questions": [
                     "What is the main topic of this webpage?",
@@ -31,3 +31,30 @@ class SuggestQuestionsResponse(BaseModel):
                 ]
             }
         }
+    )
+
+class RegisterPageResponse(BaseModel):
+    """
+    Response model for page registration endpoint.
+    """
+    page_id: str = Field(..., description="Digest to send as page_id in later requests")
+    token_count: int = Field(..., description="Estimated token count of the page")
+    size: int = Field(..., description="Page size in UTF-8 bytes")
+    tokens_saved: int = Field(0, description="Approximate tokens removed by content compaction")
+
+    model_config = ConfigDict(
+        json_schema_extra={
+            "example": {
+                "page_id": "9f86d081884c7d659a2feaa0c55ad015a3bf4f1b2b0b822cd15d6c15b0f00a08",
+                "token_count": 1250,
+                "size": 5000,
+                "tokens_saved": 300
+            }
+        }
+    )
+
+class CreateSessionResponse(BaseModel):
+    """
+    Response model for session creation endpoint.
+    """
+    session_id: str = Field(..., description="Id to send as session_id in later requests")
@@ -0,0 +1,348 @@
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+def reserve_from_bucket(
+    tokens: float, updated_at: float, now: float, rate: float, burst: float, max_wait: float
+) -> Tuple[Optional[float], float, float]:
+    """
+    Reserve a token from a token bucket given as its stored state.
+
+    Args:
+        tokens: Tokens in the bucket at `updated_at`.
+        updated_at: When the token count was last updated.
+        now: The current time.
+        rate: Tokens added per second.
+        burst: Bucket capacity.
+        max_wait: The longest the caller is willing to wait for the token.
+
+    Returns:
+        Tuple[Optional[float], float, float]: Seconds to wait before using
+        the token (None if it wouldn't be available within max_wait, in
+        which case nothing is taken), and the new token count and time.
+    """
+    tokens = min(burst, tokens + (now - updated_at) * rate)
+    wait = max(0.0, (1 - tokens) / rate)
+    if wait > max_wait:
+        return None, tokens, now
+    return wait, tokens - 1, now
+
+class CacheBackend:
+    """
+    Key-value store behind the response caches and the rate limits.
+
+    Entries expire `ttl` seconds after they were set. Backends that are
+    `shared` are seen by every worker process, so the caches using them have
+    to timestamp entries with wall-clock time and keep values JSON-serializable.
+    Token buckets live next to the entries, so that a shared backend also
+    shares each API key's request rate across workers.
+    """
+    shared = False
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Get the value of a key, or None if it is missing or expired.
+        """
+        raise NotImplementedError
+
+    def set(self, key: Hashable, value: Any, ttl: float) -> None:
+        """
+        Store a value for `ttl` seconds.
+        """
+        raise NotImplementedError
+
+    def delete(self, key: Hashable) -> bool:
+        """
+        Remove a key.
+
+        Returns:
+            bool: True if the key was present.
+        """
+        raise NotImplementedError
+
+    def reserve_token(self, key: Hashable, rate: float, burst: float, max_wait: float) -> Tuple[Optional[float], float]:
+        """
+        Atomically reserve a token from the key's token bucket (see TokenBucket.reserve).
+
+        Returns:
+            Tuple[Optional[float], float]: Seconds to wait before using the
+            token (None if it wouldn't be available within max_wait), and
+            seconds until a token is available.
+        """
+        raise NotImplementedError
+
+    def drain_tokens(self, key: Hashable, rate: float, burst: float) -> None:
+        """
+        Empty the key's token bucket, e.g. after a quota error.
+        """
+        raise NotImplementedError
+
+    def size(self) -> int:
+        """
+        Number of entries (expired ones may be counted until pruned).
+        """
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        """
+        Remove every entry and bucket.
+        """
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """
+        Release the backend's resources.
+        """
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get the backend's counters.
+        """
+        return {"backend": type(self).__name__, "shared": self.shared, "entries": self.size()}
+
+class MemoryCacheBackend(CacheBackend):
+    """
+    In-process backend: an LRU dict bounded to `max_entries`, per worker.
+    """
+
+    def __init__(self, max_entries: int = 1024, clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.clock = clock
+        self._entries: "OrderedDict[Hashable, Tuple[Any, float]]" = OrderedDict()
+        self._buckets: "OrderedDict[Hashable, Tuple[float, float]]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at <= self.clock():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: float) -> None:
+        self._entries[key] = (value, self.clock() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def delete(self, key: Hashable) -> bool:
+        return self._entries.pop(key, None) is not None
+
+    def reserve_token(self, key: Hashable, rate: float, burst: float, max_wait: float) -> Tuple[Optional[float], float]:
+        now = self.clock()
+        tokens, updated_at = self._buckets.get(key, (burst, now))
+        wait, tokens, updated_at = reserve_from_bucket(tokens, updated_at, now, rate, burst, max_wait)
+        self._buckets[key] = (tokens, updated_at)
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.max_entries:
+            self._buckets.popitem(last=False)
+        return wait, max(0.0, (1 - tokens) / rate)
+
+    def drain_tokens(self, key: Hashable, rate: float, burst: float) -> None:
+        now = self.clock()
+        tokens, updated_at = self._buckets.get(key, (burst, now))
+        tokens = min(burst, tokens + (now - updated_at) * rate)
+        self._buckets[key] = (min(tokens, 0.0), now)
+
+    def size(self) -> int:
+        return len(self._entries)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._buckets.clear()
+
+class SQLiteCacheBackend(CacheBackend):
+    """
+    Backend in a SQLite database file shared by the workers of one host.
+
+    The database runs in WAL mode, so readers use the memory-mapped shared
+    index and never block each other; writes are short single-row
+    transactions. Keys and values are stored as JSON. Past `max_entries`,
+    the entries closest to expiry are pruned (every `prune_interval` writes).
+
+    The caches call the backend on the event loop, so a write waits at most
+    `busy_timeout` seconds for another worker's write lock. Past that, and on
+    any other error, the operation fails open: it is logged and treated as a
+    miss (or an admitted token), so a busy or broken cache file slows
+    requests down instead of stalling or failing them.
+    """
+    shared = True
+
+    def __init__(
+        self,
+        path: str,
+        max_entries: int = 100000,
+        prune_interval: int = 256,
+        busy_timeout: float = 0.05,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.prune_interval = prune_interval
+        self.busy_timeout = busy_timeout
+        self.clock = clock
+        self.errors = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+        # Workers starting together may wait for each other to create the schema
+        self._connection = sqlite3.connect(path, timeout=5.0, isolation_level=None, check_same_thread=False)
+        with self._lock:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+            self._connection.execute("CREATE INDEX IF NOT EXISTS entries_expiry ON entries (expires_at)")
+            self._connection.execute(f"PRAGMA busy_timeout = {int(busy_timeout * 1000)}")
+
+    @staticmethod
+    def _key(key: Hashable) -> str:
+        return json.dumps(key, separators=(",", ":"))
+
+    def _failed(self, operation: str, error: sqlite3.Error) -> None:
+        self.errors += 1
+        logger.warning(f"Cache backend {operation} failed: {type(error).__name__}: {error}")
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        try:
+            with self._lock:
+                row = self._connection.execute(
+                    "SELECT value FROM entries WHERE key = ? AND expires_at > ?", (self._key(key), self.clock())
+                ).fetchone()
+        except sqlite3.Error as e:
+            self._failed("get", e)
+            return None
+        return json.loads(row[0]) if row is not None else None
+
+    def set(self, key: Hashable, value: Any, ttl: float) -> None:
+        try:
+            with self._lock:
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO entries (key, value, expires_at) VALUES (?, ?, ?)",
+                    (self._key(key), json.dumps(value), self.clock() + ttl),
+                )
+                self._writes += 1
+                if self._writes % self.prune_interval == 0:
+                    self._prune()
+        except sqlite3.Error as e:
+            self._failed("set", e)
+
+    def _prune(self) -> None:
+        self._connection.execute("DELETE FROM entries WHERE expires_at <= ?", (self.clock(),))
+        self._connection.execute(
+            "DELETE FROM entries WHERE key IN "
+            "(SELECT key FROM entries ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+        # Buckets untouched for an hour are full again, the same as absent ones
+        self._connection.execute("DELETE FROM buckets WHERE updated_at <= ?", (self.clock() - 3600,))
+
+    def delete(self, key: Hashable) -> bool:
+        try:
+            with self._lock:
+                cursor = self._connection.execute("DELETE FROM entries WHERE key = ?", (self._key(key),))
+        except sqlite3.Error as e:
+            self._failed("delete", e)
+            return False
+        return cursor.rowcount > 0
+
+    def _update_bucket(self, key: Hashable, rate: float, burst: float, update: Callable) -> Any:
+        # The read-modify-write must not interleave with other workers
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                now = self.clock()
+                row = self._connection.execute(
+                    "SELECT tokens, updated_at FROM buckets WHERE key = ?", (self._key(key),)
+                ).fetchone()
+                tokens, updated_at = row if row is not None else (burst, now)
+                result, tokens, updated_at = update(tokens, updated_at, now)
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO buckets (key, tokens, updated_at) VALUES (?, ?, ?)",
+                    (self._key(key), tokens, updated_at),
+                )
+                self._connection.execute("COMMIT")
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
+        return result, tokens
+
+    def reserve_token(self, key: Hashable, rate: float, burst: float, max_wait: float) -> Tuple[Optional[float], float]:
+        def reserve(tokens, updated_at, now):
+            return reserve_from_bucket(tokens, updated_at, now, rate, burst, max_wait)
+
+        try:
+            wait, tokens = self._update_bucket(key, rate, burst, reserve)
+        except sqlite3.Error as e:
+            # Without the shared bucket, admit rather than reject
+            self._failed("reserve_token", e)
+            return 0.0, 0.0
+        return wait, max(0.0, (1 - tokens) / rate)
+
+    def drain_tokens(self, key: Hashable, rate: float, burst: float) -> None:
+        def drain(tokens, updated_at, now):
+            tokens = min(burst, tokens + (now - updated_at) * rate)
+            return None, min(tokens, 0.0), now
+
+        try:
+            self._update_bucket(key, rate, burst, drain)
+        except sqlite3.Error as e:
+            self._failed("drain_tokens", e)
+
+    def size(self) -> int:
+        try:
+            with self._lock:
+                return self._connection.execute(
+                    "SELECT COUNT(*) FROM entries WHERE expires_at > ?", (self.clock(),)
+                ).fetchone()[0]
+        except sqlite3.Error as e:
+            self._failed("count", e)
+            return 0
+
+    def clear(self) -> None:
+        with self._lock:
+            self._connection.execute("DELETE FROM entries")
+            self._connection.execute("DELETE FROM buckets")
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {**super().stats(), "path": self.path, "errors": self.errors}
+
+def create_shared_backend() -> Optional[CacheBackend]:
+    """
+    Create the backend the workers share, as configured by CACHE_BACKEND.
+
+    Returns:
+        Optional[CacheBackend]: The SQLite backend for "sqlite", or None for
+        "memory", where each cache keeps its own in-process backend.
+    """
+    if settings.CACHE_BACKEND == "memory":
+        return None
+    if settings.CACHE_BACKEND == "sqlite":
+        path = settings.CACHE_SQLITE_PATH or os.path.join(tempfile.gettempdir(), "webpage-chatter-cache.sqlite3")
+        return SQLiteCacheBackend(
+            path, max_entries=settings.CACHE_SQLITE_MAX_ENTRIES, busy_timeout=settings.CACHE_SQLITE_BUSY_TIMEOUT
+        )
+    raise ValueError(f"Unknown CACHE_BACKEND {settings.CACHE_BACKEND!r}; use \"memory\" or \"sqlite\"")
+
+# Backend shared by the suggestion cache, context cache handles and rate limits
+# of all workers (None when each worker keeps its own in memory)
+shared_backend = create_shared_backend()
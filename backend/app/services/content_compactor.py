@@ -0,0 +1,299 @@
+import asyncio
+import re
+from typing import Dict, Iterable, Iterator
+from app.core.config import settings
+from app.services.token_estimator import CHARS_PER_TOKEN
+
+# Blank lines separate the blocks (headings, paragraphs, list items, table rows) the extension sends
+_BLOCK_SEPARATOR = re.compile(r"\n[ \t\r\f\v]*\n")
+
+# Trailing whitespace before a line break (the next line keeps its indentation),
+# and runs of whitespace other than a single space after the start of a line
+_LINE_BREAK = re.compile(r"[^\S\n]*\n")
+_INLINE_WHITESPACE = re.compile(r"(?<=\S)(?:[^\S\n]{2,}|[^\S\n ])")
+_INDENTATION = re.compile(r"[^\S\n]*")
+
+# Prefixes the extension adds to list items; "• Home" and "Home" are the same text
+_BULLET_PREFIX = "• "
+
+# Short blocks that are entirely one of these (lowercased) are navigation or sharing links
+_BOILERPLATE_BLOCK = re.compile(
+    r"(?:• )?(?:"
+    r"skip to (?:main )?content|skip navigation|back to top|toggle navigation|main menu|"
+    r"(?:sign|log) (?:in|out|up)|"
+    r"share(?: this)? on (?:facebook|twitter|x|linkedin|reddit|whatsapp|email)|share this|print this page|"
+    r"accept(?: all)? cookies|cookie (?:settings|preferences|policy)|"
+    r"privacy policy|terms (?:of (?:use|service)|and conditions)"
+    r")"
+)
+# Single words that are chrome next to other chrome but can also be a real heading
+# ("Menu" on a restaurant page), so they are only dropped within a run of chrome blocks
+_NAV_WORD_BLOCK = re.compile(r"(?:• )?(?:menu|register|share|tweet|print)")
+BOILERPLATE_BLOCK_MAX_CHARS = 40
+
+# Short blocks containing these (lowercased) are cookie, newsletter or legal notices
+_BOILERPLATE_PHRASE = re.compile(
+    r"all rights reserved|(?:we|site|website) uses? cookies|(?:subscribe|sign up)\b.{0,40}\bnewsletter|"
+    r"^(?:• )?(?:©|\(c\)|copyright (?:©|\(c\) )?\d{4})"
+)
+# Cheap substring checks that must pass before the phrase pattern is tried
+_BOILERPLATE_HINTS = ("reserved", "cookies", "newsletter", "©", "(c)", "copyright")
+BOILERPLATE_MAX_CHARS = 200
+
+# Blocks up to this size are normalized by splitting, which is faster than the regexes
+SPLIT_NORMALIZE_MAX_CHARS = 4096
+
+# Lines and blocks shorter than this are never dropped as repeats (table cells, "}" lines, short labels)
+LINE_DEDUPE_MIN_CHARS = 20
+BLOCK_DEDUPE_MIN_CHARS = 20
+
+def iter_blocks(text: str) -> Iterator[str]:
+    """
+    Split text into blank-line separated blocks, lazily.
+
+    Args:
+        text: The raw webpage text.
+
+    Yields:
+        str: Each block, unnormalized.
+    """
+    start = 0
+    for match in _BLOCK_SEPARATOR.finditer(text):
+        yield text[start:match.start()]
+        start = match.end()
+    yield text[start:]
+
+def normalize_line(line: str) -> str:
+    """
+    Collapse runs of whitespace within a line, keeping its indentation.
+
+    Returns:
+        str: The line with single-spaced words, or "" if it was blank.
+    """
+    text = line.lstrip()
+    if not text:
+        return ""
+    return line[:len(line) - len(text)] + " ".join(text.split())
+
+def normalize_blocks(blocks: Iterable[str]) -> Iterator[str]:
+    """
+    Collapse runs of whitespace and drop empty lines within each block.
+
+    Leading indentation is kept, since it carries meaning in code and
+    nested lists.
+
+    Yields:
+        str: Each non-empty block with single-spaced lines.
+    """
+    for block in blocks:
+        if "\n" in block:
+            if len(block) <= SPLIT_NORMALIZE_MAX_CHARS:
+                block = "\n".join(filter(None, map(normalize_line, block.split("\n"))))
+            else:
+                # Splitting a huge block into words would allocate an object per word
+                block = _INLINE_WHITESPACE.sub(" ", _LINE_BREAK.sub("\n", block)).lstrip("\n").rstrip()
+        else:
+            block = block.rstrip()
+            # Clean blocks (the common case) pass through without another copy
+            if "  " in block or not block.isprintable():
+                block = normalize_line(block)
+        if block:
+            yield block
+
+def _is_boilerplate(block: str) -> bool:
+    if len(block) > BOILERPLATE_MAX_CHARS:
+        return False
+    lowered = block.strip().lower()
+    if len(block) <= BOILERPLATE_BLOCK_MAX_CHARS and _BOILERPLATE_BLOCK.fullmatch(lowered):
+        return True
+    return any(hint in lowered for hint in _BOILERPLATE_HINTS) and _BOILERPLATE_PHRASE.search(lowered) is not None
+
+def _is_nav_word(block: str) -> bool:
+    return len(block) <= BOILERPLATE_BLOCK_MAX_CHARS and _NAV_WORD_BLOCK.fullmatch(block.strip().lower()) is not None
+
+def drop_boilerplate(blocks: Iterable[str]) -> Iterator[str]:
+    """
+    Drop short blocks that are navigation, cookie, sharing or legal chrome.
+
+    Words like "Menu" or "Print" are only dropped when they sit next to
+    other chrome (including each other), so a lone one is kept as content.
+
+    Yields:
+        str: The remaining blocks.
+    """
+    # Nav words seen since the last content block, held until a neighbour decides them
+    pending = []
+    in_run = False
+    for block in blocks:
+        if _is_nav_word(block):
+            if in_run or pending:
+                pending.clear()
+                in_run = True
+            else:
+                pending.append(block)
+            continue
+        if _is_boilerplate(block):
+            pending.clear()
+            in_run = True
+            continue
+        yield from pending
+        pending.clear()
+        in_run = False
+        yield block
+    yield from pending
+
+def _text_length(text: str) -> int:
+    # Length without the indentation, which would make a "}" line long enough to dedupe
+    return len(text) - _INDENTATION.match(text).end()
+
+def _dedupe_key(text: str) -> int:
+    # Indentation and a list bullet don't make a repeat different text
+    text = text.lstrip()
+    return hash(text[len(_BULLET_PREFIX):] if text.startswith(_BULLET_PREFIX) else text)
+
+def dedupe_blocks(blocks: Iterable[str]) -> Iterator[str]:
+    """
+    Drop repeated long blocks and repeated long lines.
+
+    Blocks and lines are compared by hash, so memory grows with the number
+    of distinct blocks rather than their size. A list item repeating a
+    paragraph (the extension emits nested elements more than once) counts as
+    a repeat. Short blocks and lines, such as table cells or closing braces,
+    legitimately repeat and are always kept, and so are indented lines
+    within a block (code repeats lines on purpose).
+
+    Yields:
+        str: Each block the first time its text appears.
+    """
+    seen_blocks = set()
+    seen_lines = set()
+    for block in blocks:
+        if _text_length(block) < BLOCK_DEDUPE_MIN_CHARS:
+            yield block
+            continue
+        key = _dedupe_key(block)
+        if key in seen_blocks:
+            continue
+        seen_blocks.add(key)
+
+        if "\n" not in block:
+            # A one-line block repeating a line of an earlier block
+            if key in seen_lines:
+                continue
+            if len(block) >= LINE_DEDUPE_MIN_CHARS:
+                seen_lines.add(key)
+            yield block
+            continue
+
+        kept = []
+        repeated = kept_long = 0
+        for line in block.split("\n"):
+            if _text_length(line) < LINE_DEDUPE_MIN_CHARS:
+                kept.append(line)
+                continue
+            line_key = _dedupe_key(line)
+            if line_key in seen_lines and not line[0].isspace():
+                repeated += 1
+                continue
+            seen_lines.add(line_key)
+            kept.append(line)
+            kept_long += 1
+        if not repeated:
+            yield block
+        # Nothing but short lines would be left of a block made of repeats
+        elif kept_long:
+            yield "\n".join(kept)
+
+def compact_blocks(text: str) -> Iterator[str]:
+    """
+    Run the compaction pipeline over a webpage.
+
+    Each stage is a generator, so blocks flow through one at a time and the
+    whole pipeline runs in a single linear pass.
+
+    Args:
+        text: The raw webpage text.
+
+    Yields:
+        str: The compacted blocks.
+    """
+    return dedupe_blocks(drop_boilerplate(normalize_blocks(iter_blocks(text))))
+
+class CompactionResult:
+    """
+    Compacted webpage text and what the compaction saved.
+    """
+    __slots__ = ("content", "original_size", "size", "tokens_saved")
+
+    def __init__(self, content: str, original_size: int):
+        self.content = content
+        self.original_size = original_size
+        self.size = len(content)
+        # Approximate, at the estimator's characters-per-token ratio
+        self.tokens_saved = max(0, original_size - self.size) // CHARS_PER_TOKEN
+
+class CompactionStats:
+    """
+    Process-wide compaction counters.
+    """
+
+    def __init__(self):
+        self.pages = 0
+        self.chars_in = 0
+        self.chars_out = 0
+        self.tokens_saved = 0
+
+    def record(self, result: CompactionResult) -> None:
+        self.pages += 1
+        self.chars_in += result.original_size
+        self.chars_out += result.size
+        self.tokens_saved += result.tokens_saved
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get the compaction counters.
+
+        Returns:
+            dict: Compacted page count, characters in and out, and tokens saved.
+        """
+        return {
+            "pages": self.pages,
+            "chars_in": self.chars_in,
+            "chars_out": self.chars_out,
+            "tokens_saved": self.tokens_saved,
+        }
+
+compaction_stats = CompactionStats()
+
+def compact_content(text: str) -> CompactionResult:
+    """
+    Normalize whitespace and remove duplicate and boilerplate blocks.
+
+    Args:
+        text: The raw webpage text.
+
+    Returns:
+        CompactionResult: The compacted text and the approximate tokens saved.
+    """
+    blocks = list(compact_blocks(text))
+    size = sum(map(len, blocks)) + 2 * max(0, len(blocks) - 1)
+    # Nothing was removed (at most single whitespace characters were replaced
+    # by spaces), so keep the original rather than building a copy of it
+    content = text if size == len(text) else "\n\n".join(blocks)
+    result = CompactionResult(content, len(text))
+    compaction_stats.record(result)
+    return result
+
+async def compact_content_async(text: str) -> CompactionResult:
+    """
+    Compact a webpage without blocking the event loop on large inputs.
+
+    Args:
+        text: The raw webpage text.
+
+    Returns:
+        CompactionResult: The compacted text and the approximate tokens saved.
+    """
+    if len(text) < settings.CONTENT_COMPACTION_THREAD_THRESHOLD:
+        return compact_content(text)
+    return await asyncio.to_thread(compact_content, text)
@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import TYPE_CHECKING, Callable, Dict, Optional, Tuple
+from app.core.config import settings
+from app.core.lazy_import import lazy_module
+from app.core.security import hash_api_key
+from app.services.cache_backend import CacheBackend, MemoryCacheBackend, shared_backend
+from app.services.page_store import PageEntry, compute_page_id
+
+if TYPE_CHECKING:
+    from google.genai import types
+else:
+    types = lazy_module("google.genai.types")
+
+logger = logging.getLogger(__name__)
+
+def page_prompt_parts(page: PageEntry) -> list:
+    """
+    Build the prompt parts carrying a webpage's content.
+
+    Args:
+        page: The webpage to include in the prompt.
+
+    Returns:
+        list: Gemini parts with the labelled webpage content.
+    """
+    return [
+        types.Part.from_text(text="WEBPAGE CONTENT:\n"),
+        types.Part.from_text(text=page.content),
+        types.Part.from_text(text="\n\n"),
+    ]
+
+class ContextCacheRegistry:
+    """
+    Registry of Gemini cached-content handles for large webpages.
+
+    Handles are keyed by page digest, model name and API key hash, since an
+    upstream cache belongs to one API key and one model. Only pages of at
+    least `min_tokens` tokens are cached. Handles are dropped locally a little
+    before their upstream TTL runs out so a request never uses one that is
+    about to expire. With a shared backend, all workers use the handles any
+    of them created, instead of each uploading the page again.
+    """
+
+    def __init__(
+        self,
+        ttl: int = 600,
+        min_tokens: int = 32768,
+        max_entries: int = 1024,
+        clock: Optional[Callable[[], float]] = None,
+        backend: Optional[CacheBackend] = None,
+    ):
+        self.ttl = ttl
+        self.min_tokens = min_tokens
+        self.max_entries = max_entries
+        self.backend = backend if backend is not None else MemoryCacheBackend(max_entries)
+        # Expiry times of shared handles are compared by other workers, so they need wall-clock time
+        self.clock = clock or (time.time if self.backend.shared else time.monotonic)
+        self._pending: Dict[Tuple[str, str, str, str], asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.failures = 0
+        self.invalidations = 0
+
+    def _key(self, user_api_key: str, model_name: str, page: PageEntry) -> Tuple[str, str, str, str]:
+        if page.page_id is None:
+            page.page_id = compute_page_id(page.content)
+        return ("context_cache", page.page_id, model_name, hash_api_key(user_api_key))
+
+    async def get_or_create(self, client, user_api_key: str, model_name: str, page: PageEntry) -> Optional[str]:
+        """
+        Get a cached-content handle for a page, creating it upstream on a miss.
+
+        Args:
+            client: The Gemini client for the API key.
+            user_api_key: The user's Gemini API key.
+            model_name: The name of the Gemini model to use.
+            page: The webpage to cache.
+
+        Returns:
+            Optional[str]: The cached-content name, or None if the page is too
+            small to cache or the cache could not be created.
+        """
+        if page.token_count < self.min_tokens:
+            return None
+
+        key = self._key(user_api_key, model_name, page)
+        entry = self.backend.get(key)
+        if entry is not None:
+            name, expires_at = entry
+            if expires_at > self.clock():
+                self.hits += 1
+                return name
+            self.backend.delete(key)
+            self.expirations += 1
+
+        # Concurrent requests for the same page share one upstream create call
+        pending = self._pending.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._pending[key] = future
+        name = None
+        try:
+            cached = await client.aio.caches.create(
+                model=model_name,
+                config=types.CreateCachedContentConfig(
+                    contents=[types.Content(role="user", parts=page_prompt_parts(page))],
+                    ttl=f"{self.ttl}s",
+                ),
+            )
+            name = cached.name
+            # Stop using the handle shortly before the upstream TTL runs out
+            margin = min(30.0, self.ttl / 10)
+            self.backend.set(key, (name, self.clock() + self.ttl - margin), self.ttl - margin)
+        except Exception as e:
+            self.failures += 1
+            logger.warning(f"Could not create Gemini context cache, using inline content: {type(e).__name__}")
+        finally:
+            future.set_result(name)
+            del self._pending[key]
+        return name
+
+    def invalidate(self, user_api_key: str, model_name: str, page: PageEntry) -> None:
+        """
+        Forget a page's handle, e.g. after Gemini rejected it as expired.
+        """
+        if self.backend.delete(self._key(user_api_key, model_name, page)):
+            self.invalidations += 1
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get the registry counters.
+
+        Returns:
+            dict: Handle count and hit/miss/expiry/failure counts.
+        """
+        return {
+            "entries": self.backend.size(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "expirations": self.expirations,
+            "failures": self.failures,
+            "invalidations": self.invalidations,
+        }
+
+# Process-wide context cache registry
+context_cache = ContextCacheRegistry(
+    ttl=settings.CONTEXT_CACHE_TTL,
+    min_tokens=settings.CONTEXT_CACHE_MIN_TOKENS,
+    backend=shared_backend,
+)
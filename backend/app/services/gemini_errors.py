@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import asyncio
+from typing import TYPE_CHECKING, Any, Dict, Iterator, Optional
+from app.core.lazy_import import lazy_module
+
+if TYPE_CHECKING:
+    import httpx
+    from google.genai import errors
+else:
+    httpx = lazy_module("httpx")
+    errors = lazy_module("google.genai.errors")
+
+class GeminiError(Exception):
+    """
+    A classified Gemini failure.
+
+    Each kind carries the HTTP status the API answers with, whether the
+    failure is worth retrying, and a user-facing message.
+    """
+    kind = "upstream"
+    status_code = 502
+    retryable = False
+    default_message = "The Gemini API returned an unexpected error. Please try again later."
+
+    def __init__(self, message: Optional[str] = None, retry_after: Optional[float] = None):
+        super().__init__(message or self.default_message)
+        self.message = message or self.default_message
+        self.retry_after = retry_after
+
+class GeminiQuotaError(GeminiError):
+    # Not retried: quota errors fail over to another model, or go back to the client
+    kind = "quota"
+    status_code = 429
+    default_message = "API quota exceeded or rate limited. Please try again later or check your API quota."
+
+class GeminiAuthError(GeminiError):
+    kind = "auth"
+    status_code = 401
+    default_message = "API key issue. Please check your API key and try again."
+
+class GeminiInvalidRequestError(GeminiError):
+    kind = "invalid_request"
+    status_code = 400
+    default_message = "The request was rejected by the Gemini API."
+
+class GeminiUnavailableError(GeminiError):
+    kind = "unavailable"
+    status_code = 503
+    retryable = True
+    default_message = "Service temporarily unavailable. Please try again later."
+
+class GeminiTimeoutError(GeminiError):
+    kind = "timeout"
+    status_code = 504
+    retryable = True
+    default_message = (
+        "Request timed out. The response took too long to generate. Try a shorter prompt or try again later."
+    )
+
+class GeminiNetworkError(GeminiError):
+    kind = "network"
+    status_code = 502
+    retryable = True
+    default_message = "Network connection issue between the server and the Gemini API. Please try again later."
+
+class GeminiResponseError(GeminiError):
+    kind = "bad_response"
+    default_message = "The Gemini API returned a response that couldn't be read. Please try again."
+
+# Reasons in google.rpc.ErrorInfo details that mean the key itself is at fault
+_AUTH_REASONS = {"API_KEY_INVALID", "API_KEY_EXPIRED", "API_KEY_SERVICE_BLOCKED"}
+
+def _error_details(e: errors.APIError) -> Iterator[Dict[str, Any]]:
+    """
+    Iterate over the google.rpc detail objects of an API error response.
+    """
+    body = e.details.get("error", e.details) if isinstance(e.details, dict) else {}
+    details = body.get("details") if isinstance(body, dict) else None
+    for detail in details or []:
+        if isinstance(detail, dict):
+            yield detail
+
+def _retry_delay(e: errors.APIError) -> Optional[float]:
+    """
+    Get the delay Gemini asked for in a RetryInfo detail, e.g. "39s".
+    """
+    for detail in _error_details(e):
+        delay = detail.get("retryDelay")
+        if isinstance(delay, str) and delay.endswith("s"):
+            try:
+                return float(delay[:-1])
+            except ValueError:
+                return None
+    return None
+
+def _classify_api_error(e: errors.APIError) -> GeminiError:
+    """
+    Map a Gemini API error to its kind by HTTP code and RPC status.
+    """
+    reasons = {detail.get("reason") for detail in _error_details(e)}
+    if e.code == 429 or e.status == "RESOURCE_EXHAUSTED":
+        return GeminiQuotaError(retry_after=_retry_delay(e))
+    if e.code in (401, 403) or e.status in ("UNAUTHENTICATED", "PERMISSION_DENIED") or reasons & _AUTH_REASONS:
+        return GeminiAuthError()
+    if e.code == 504 or e.status == "DEADLINE_EXCEEDED":
+        return GeminiTimeoutError()
+    if e.code in (500, 502, 503) or e.status in ("UNAVAILABLE", "INTERNAL"):
+        return GeminiUnavailableError()
+    if isinstance(e, errors.ClientError):
+        message = f"The request was rejected by the Gemini API: {e.message}" if e.message else None
+        return GeminiInvalidRequestError(message)
+    return GeminiError()
+
+def classify_error(e: BaseException) -> GeminiError:
+    """
+    Classify an exception raised while calling Gemini.
+
+    Uses the SDK's exception types and status codes, not the error text.
+
+    Args:
+        e: The exception.
+
+    Returns:
+        GeminiError: The classified error (e itself if already classified).
+    """
+    if isinstance(e, GeminiError):
+        return e
+    if isinstance(e, errors.APIError):
+        return _classify_api_error(e)
+    if isinstance(e, (asyncio.TimeoutError, httpx.TimeoutException)):
+        return GeminiTimeoutError()
+    if isinstance(e, (httpx.TransportError, ConnectionError)):
+        return GeminiNetworkError()
+    if isinstance(e, (ValueError, KeyError, TypeError)):
+        # Raised while decoding the response, e.g. malformed JSON output
+        return GeminiResponseError()
+    return GeminiError()
+
+def is_retryable(e: BaseException) -> bool:
+    """
+    Check whether retrying the call that raised e could succeed.
+    """
+    return classify_error(e).retryable
+
+def is_quota_error(e: BaseException) -> bool:
+    """
+    Check whether Gemini rejected a call for quota or rate limit reasons.
+    """
+    return isinstance(classify_error(e), GeminiQuotaError)
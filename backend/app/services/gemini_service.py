@@ -1,194 +1,724 @@
 # To run this code you need to install the following dependencies:
 # pip install google-genai tenacity
 
-import asyncio
+from __future__ import annotations
+
+import functools
+import hashlib
 import json
 import logging
-from typing import List, AsyncGenerator
-from tenacity import retry, stop_after_attempt, wait_exponential
-from google import genai
-from google.genai import types
+import time
+from contextvars import ContextVar
+from typing import TYPE_CHECKING, Any, AsyncGenerator, Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+from app.core.config import settings
+from app.core import fast_json, metrics, tracing
+from app.core.deadline import remaining_time
+from app.core.lazy_import import lazy_module
+from app.core.security import hash_api_key
+from app.services.cache_backend import shared_backend
+from app.services.client_pool import client_pool
+from app.services.context_cache import context_cache, page_prompt_parts
+from app.services.json_stream import JsonStringFieldStreamer
+from app.services.gemini_errors import (
+    GeminiAuthError,
+    GeminiInvalidRequestError,
+    GeminiQuotaError,
+    classify_error,
+    is_quota_error,
+    is_retryable,
+)
+from app.services.model_router import model_router
+from app.services.page_store import PageEntry, compute_page_id
+from app.services.rate_limiter import rate_limiter
+from app.services.response_cache import ResponseCache
+from app.services.single_flight import SingleFlight
+
+if TYPE_CHECKING:
+    import tenacity
+    from google.genai import errors, types
+else:
+    tenacity = lazy_module("tenacity")
+    errors = lazy_module("google.genai.errors")
+    types = lazy_module("google.genai.types")
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Shares one upstream call between identical concurrent requests
+gemini_single_flight = SingleFlight()
+
+T = TypeVar("T")
+
+def _request_key(kind: str, user_api_key: str, model_name: str, *parts: str) -> Tuple[str, str, str, str]:
+    """
+    Build the coalescing key for a request: API key hash, model and prompt hash.
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return (kind, hash_api_key(user_api_key), model_name, digest.hexdigest())
+
+async def _coalesced(
+    key: Tuple[str, str, str, str], user_api_key: str, func, rate_limit_wait: Optional[float] = None
+):
+    """
+    Run func through the single-flight group unless coalescing is disabled.
+
+    Only the caller that starts the upstream call takes a rate limit permit
+    for it; callers joining the call in flight wait for its result without
+    holding a slot of their own.
+    """
+    async def call():
+        permit = await rate_limiter.acquire(user_api_key, rate_limit_wait)
+        try:
+            return await func()
+        finally:
+            permit.release()
+
+    if not settings.COALESCE_REQUESTS:
+        return await call()
+    return await gemini_single_flight.do(key, call)
+
+# Suggestion failures that are raised instead of answered with DEFAULT_QUESTIONS
+_CALLER_ERRORS = (GeminiAuthError, GeminiInvalidRequestError, GeminiQuotaError)
+
+# Questions returned when suggestions can't be generated
+DEFAULT_QUESTIONS = [
+    "What is this webpage about?",
+    "Can you summarize the key points?",
+    "What are the main topics discussed?",
+    "How does this information relate to current events?",
+    "What are the implications of this content?"
+]
+
+def _is_real_suggestions(questions: List[str]) -> bool:
+    """
+    Check that suggestions came from Gemini rather than the defaults.
+    """
+    return questions != DEFAULT_QUESTIONS and questions != DEFAULT_QUESTIONS[:1]
+
+# Keyed by API key hash as well: suggestions are only served to the key that paid for them
+suggestion_cache = ResponseCache(
+    max_entries=settings.SUGGESTION_CACHE_SIZE,
+    ttl=settings.SUGGESTION_CACHE_TTL,
+    stale_ttl=settings.SUGGESTION_CACHE_STALE_TTL,
+    cacheable=_is_real_suggestions,
+    backend=shared_backend,
+    namespace="suggestions",
+)
+
+def _suggestion_cache_key(
+    user_api_key: str,
+    model_name: str,
+    page_id: str,
+    count: int,
+    conversation_history: Optional[List[dict]],
+    use_conversation_context: bool
+) -> Tuple[str, str, str, int, str]:
+    """
+    Build the suggestion cache key from the normalized request inputs.
+    """
+    history = ""
+    if use_conversation_context and conversation_history:
+        # Role case and whitespace don't change the suggestions
+        normalized = [
+            [str(message.get("role", "")).strip().lower(), " ".join(str(message.get("content", "")).split())]
+            for message in conversation_history
+        ]
+        history = hashlib.sha256(json.dumps(normalized).encode("utf-8")).hexdigest()
+    return (hash_api_key(user_api_key), model_name, page_id, count, history)
+
+# Attempt number of the Gemini call in progress, for its trace span
+_attempt: ContextVar[int] = ContextVar("gemini_attempt", default=1)
+
+def _before_attempt(retry_state) -> None:
+    _attempt.set(retry_state.attempt_number)
+
+def _before_retry(retry_state) -> None:
+    metrics.RETRIES.inc()
+    logger.info(f"Retrying Gemini API call: attempt {retry_state.attempt_number}")
+
+class stop_before_deadline:
+    """
+    Stop retrying when the request deadline would pass during the next backoff.
+
+    A plain tenacity stop callable, so defining it doesn't import tenacity;
+    it can only be combined with `|` on the right of a tenacity stop.
+    """
+
+    def __call__(self, retry_state) -> bool:
+        remaining = remaining_time()
+        return remaining is not None and remaining <= (retry_state.upcoming_sleep or 0.0)
+
 # Define retry decorator for Gemini API calls
 def gemini_retry_decorator():
-    """Create a retry decorator for Gemini API calls."""
-    return retry(
-        # Retry on any exception that might be related to network or service issues
-        # We can't import specific Google API exceptions, so we'll retry on all exceptions
-        stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=1, min=1, max=10),
+    """
+    Create a retry decorator for Gemini API calls.
+
+    The decorated functions must be coroutines: tenacity then backs off with
+    asyncio.sleep instead of time.sleep, so retries never block the event loop.
+    Only failures that can succeed on another attempt (timeouts, network
+    errors, 5xx responses) are retried. Auth and bad-request errors never
+    will, and retrying quota errors only deepens the 429 storm, so those fail
+    over to another model (or back to the client) straight away.
+    """
+    return tenacity.retry(
+        retry=tenacity.retry_if_exception(is_retryable),
+        # Give up after the attempt limit, or before a backoff would overrun the time budget
+        # or the request's deadline
+        stop=(
+            tenacity.stop_after_attempt(settings.GEMINI_MAX_ATTEMPTS)
+            | tenacity.stop_before_delay(settings.GEMINI_RETRY_BUDGET)
+            | stop_before_deadline()
+        ),
+        # Full jitter keeps clients that failed together from retrying together
+        wait=tenacity.wait_random_exponential(multiplier=1, max=settings.GEMINI_RETRY_MAX_WAIT),
         reraise=True,
-        before_sleep=lambda retry_state: logger.info(f"Retrying Gemini API call: attempt {retry_state.attempt_number}")
+        # The attempt number is only needed for tracing spans
+        before=_before_attempt if tracing.is_enabled() else tenacity.before_nothing,
+        before_sleep=_before_retry,
+    )
+
+def _record_call(
+    model: str, latency: float, error: Optional[Exception] = None, user_api_key: Optional[str] = None
+) -> None:
+    """
+    Report the outcome of a Gemini call to the model router and the metrics.
+    """
+    model_router.record(model, latency, error, user_api_key)
+    metrics.observe_upstream_call(model, latency, classify_error(error).kind if error is not None else None)
+
+def _build_contents(
+    input_text_parts: List[str],
+    page: Optional[PageEntry] = None,
+    history: Optional[List[types.Content]] = None
+) -> List[types.Content]:
+    """
+    Build the Gemini request contents: prior turns, then the new user turn.
+
+    The webpage, if given inline, leads the first user turn.
+    """
+    contents = list(history) if history else []
+    contents.append(types.Content(role="user", parts=[types.Part.from_text(text="\n".join(input_text_parts))]))
+    if page is not None:
+        # Copy rather than mutate the first turn, since retries rebuild the contents
+        first = contents[0]
+        contents[0] = types.Content(role=first.role, parts=page_prompt_parts(page) + list(first.parts))
+    return contents
+
+def _history_key(history: Optional[List[types.Content]]) -> List[str]:
+    """
+    Flatten the history into strings for the coalescing key.
+    """
+    if not history:
+        return []
+    return [f"{content.role}:{part.text}" for content in history for part in content.parts]
+
+@functools.lru_cache(maxsize=None)
+def answer_with_suggestions_schema() -> types.Schema:
+    """
+    Structured output for an answer plus follow-up questions in one call
+    (built on first use, like the SDK types it is made of).
+    """
+    return types.Schema(
+        type=types.Type.OBJECT,
+        properties={
+            "answer": types.Schema(type=types.Type.STRING),
+            "suggestions": types.Schema(type=types.Type.ARRAY, items=types.Schema(type=types.Type.STRING)),
+        },
+        required=["answer", "suggestions"],
+        # The answer comes first so it can be streamed before the suggestions
+        property_ordering=["answer", "suggestions"],
+    )
+
+@functools.lru_cache(maxsize=None)
+def suggestions_schema() -> types.Schema:
+    """
+    Structured output for a list of suggested questions.
+    """
+    return types.Schema(
+        type=types.Type.ARRAY,
+        items=types.Schema(type=types.Type.STRING),
+    )
+
+def _suggestions_instruction(count: int) -> str:
+    """
+    Prompt instruction asking for the answer and follow-up questions as JSON.
+    """
+    return (
+        "\n\nRespond with a JSON object. Put your answer to the user query (Markdown allowed) in \"answer\", "
+        f"and {count} relevant, diverse follow-up questions the user might want to ask next in \"suggestions\"."
+    )
+
+def _generate_content_config(
+    cached_content: Optional[str] = None,
+    response_schema: Optional[types.Schema] = None
+) -> types.GenerateContentConfig:
+    """
+    Configure response generation with no thinking budget.
+
+    Responses are plain text unless a schema is given, in which case Gemini
+    returns JSON matching it. Note: We'll still render text as Markdown on
+    the frontend.
+    """
+    return types.GenerateContentConfig(
+        thinking_config = types.ThinkingConfig(
+            thinking_budget=0,
+        ),
+        response_mime_type="application/json" if response_schema is not None else "text/plain",
+        response_schema=response_schema,
+        cached_content=cached_content,
     )
 
-async def get_gemini_response(user_api_key: str, model_name: str, input_text_parts: List[str]) -> str:
+def _raise_classified(e: Exception, context: str) -> None:
+    """
+    Log a failed Gemini call and raise it as a classified GeminiError.
+    """
+    error = classify_error(e)
+    logger.error(f"Error during {context} ({error.kind}): {type(e).__name__}: {e}")
+    if error is e:
+        raise error
+    raise error from e
+
+def _is_stale_cache_error(e: Exception) -> bool:
+    """
+    Check whether Gemini rejected a cached-content handle (e.g. it expired).
+    """
+    return isinstance(e, errors.ClientError) and (e.code in (403, 404) or "cache" in str(e).lower())
+
+async def _get_page_cache(client, user_api_key: str, model_name: str, page: Optional[PageEntry]) -> Optional[str]:
+    """
+    Get a context cache handle for the page when caching applies.
+    """
+    if page is None or not settings.CONTEXT_CACHE_ENABLED:
+        return None
+    return await context_cache.get_or_create(client, user_api_key, model_name, page)
+
+async def _call_with_failover(
+    user_api_key: str,
+    model_name: str,
+    fallback_models: Optional[List[str]],
+    call: Callable[[str], Awaitable[T]],
+    record_success: bool = True
+) -> Tuple[str, T]:
+    """
+    Call the routed model, failing over to the next model on quota errors.
+
+    Each model's call is retried on its own, so a retry after a transient
+    error never starts over at a model that already ran out of quota.
+    Every attempt is reported to the model router, so a model that ran out
+    of quota cools down and later requests are routed elsewhere. Quota errors
+    also make the rate limiter back off the key.
+
+    Args:
+        user_api_key: The user's Gemini API key.
+        model_name: The routed model.
+        fallback_models: Models to fail over to, in order (optional).
+        call: Makes the call with a given model.
+        record_success: Whether to record successful calls here (streams
+            record theirs once the stream has finished).
+
+    Returns:
+        Tuple[str, T]: The model that answered and the call's result.
+    """
+    models = [model_name]
+    if settings.ROUTER_FAILOVER and fallback_models:
+        models += [model for model in fallback_models if model != model_name]
+
+    # The async client keeps the event loop free while waiting on Gemini
+    @gemini_retry_decorator()
+    async def attempt(model: str, index: int) -> T:
+        start = time.perf_counter()
+        try:
+            with tracing.span("gemini.call", model=model, attempt=_attempt.get(), failover_index=index):
+                result = await call(model)
+        except Exception as e:
+            _record_call(model, time.perf_counter() - start, e, user_api_key)
+            if is_quota_error(e):
+                rate_limiter.record_quota_error(user_api_key)
+            raise
+        if record_success:
+            _record_call(model, time.perf_counter() - start)
+            metrics.observe_usage(model, getattr(result, "usage_metadata", None))
+        return result
+
+    for index, model in enumerate(models):
+        try:
+            return model, await attempt(model, index)
+        except Exception as e:
+            if index + 1 < len(models) and is_quota_error(e):
+                logger.warning(f"Gemini quota exhausted for {model}, failing over to {models[index + 1]}")
+                model_router.record_failover(model, models[index + 1])
+                continue
+            raise
+
+async def get_gemini_response(
+    user_api_key: str,
+    model_name: str,
+    input_text_parts: List[str],
+    page: Optional[PageEntry] = None,
+    history: Optional[List[types.Content]] = None,
+    fallback_models: Optional[List[str]] = None,
+    rate_limit_wait: Optional[float] = None
+) -> str:
     """
     Get a non-streaming response from the Gemini API.
 
+    When a page is given, input_text_parts hold only the question. Large
+    pages are then served from a Gemini context cache, falling back to
+    sending the page inline if the cache is unavailable or has expired.
+
     Args:
         user_api_key: The user's Gemini API key.
         model_name: The name of the Gemini model to use.
         input_text_parts: The input text parts to send to the Gemini API.
+        page: The webpage the question is about (optional).
+        history: Earlier conversation turns as Gemini contents (optional).
+        fallback_models: Models to fail over to on quota errors (optional).
+        rate_limit_wait: Seconds to wait at most for a rate limit slot
+            (default: the limiter's max_wait; 0 to only take a free one).
 
     Returns:
         str: The complete text response from the Gemini API.
+
+    Raises:
+        GeminiError: If the call failed, classified by kind.
+        RateLimitExceeded: If no rate limit slot was free within the wait.
     """
-    try:
-        # Initialize Gemini client with user's API key
-        client = genai.Client(api_key=user_api_key)
+    # Identical requests in flight at the same time share one upstream call
+    page_id = ""
+    if page is not None:
+        if page.page_id is None:
+            page.page_id = compute_page_id(page.content)
+        page_id = page.page_id
+    key = _request_key("chat", user_api_key, model_name, page_id, *_history_key(history), *input_text_parts)
+    return await _coalesced(
+        key,
+        user_api_key,
+        lambda: _get_gemini_response(user_api_key, model_name, input_text_parts, page, history, fallback_models),
+        rate_limit_wait,
+    )
 
-        # Prepare content for Gemini API
-        combined_text = "\n".join(input_text_parts)
-        contents = [
-            types.Content(
-                role="user",
-                parts=[
-                    types.Part.from_text(text=combined_text),
-                ],
-            ),
-        ]
+async def get_gemini_answer_with_suggestions(
+    user_api_key: str,
+    model_name: str,
+    input_text_parts: List[str],
+    page: Optional[PageEntry] = None,
+    count: int = 3,
+    history: Optional[List[types.Content]] = None,
+    fallback_models: Optional[List[str]] = None
+) -> Dict[str, Any]:
+    """
+    Get an answer and follow-up question suggestions from one Gemini call.
 
-        # Configure response generation with plain text and no thinking budget
-        # Note: We'll still render as Markdown on the frontend
-        generate_content_config = types.GenerateContentConfig(
-            thinking_config = types.ThinkingConfig(
-                thinking_budget=0,
-            ),
-            response_mime_type="text/plain",
+    Uses structured JSON output instead of a second suggestions request that
+    would resend and reprocess the whole page.
+
+    Args:
+        user_api_key: The user's Gemini API key.
+        model_name: The name of the Gemini model to use.
+        input_text_parts: The input text parts to send to the Gemini API.
+        page: The webpage the question is about (optional).
+        count: Number of follow-up questions to suggest.
+        history: Earlier conversation turns as Gemini contents (optional).
+        fallback_models: Models to fail over to on quota errors (optional).
+
+    Returns:
+        dict: The answer as "text" and the follow-up questions as "suggestions".
+
+    Raises:
+        GeminiError: If the call failed, classified by kind.
+        RateLimitExceeded: If no rate limit slot was free within the limiter's max_wait.
+    """
+    if page is not None and page.page_id is None:
+        page.page_id = compute_page_id(page.content)
+    key = _request_key(
+        "chat+suggestions",
+        user_api_key,
+        model_name,
+        page.page_id if page else "",
+        str(count),
+        *_history_key(history),
+        *input_text_parts,
+    )
+    return await _coalesced(
+        key,
+        user_api_key,
+        lambda: _get_answer_with_suggestions(
+            user_api_key, model_name, input_text_parts, page, count, history, fallback_models
+        ),
+    )
+
+async def _call_gemini(
+    user_api_key: str,
+    model_name: str,
+    input_text_parts: List[str],
+    page: Optional[PageEntry],
+    response_schema: Optional[types.Schema] = None,
+    history: Optional[List[types.Content]] = None,
+    fallback_models: Optional[List[str]] = None
+) -> types.GenerateContentResponse:
+    """
+    Make a non-streaming Gemini call with retries, failover and context caching.
+    """
+    # Get the pooled Gemini client for the user's API key
+    client = client_pool.get(user_api_key)
+
+    async def call_model(model: str) -> types.GenerateContentResponse:
+        cached_content = await _get_page_cache(client, user_api_key, model, page)
+        if cached_content is not None:
+            try:
+                return await client.aio.models.generate_content(
+                    model=model,
+                    contents=_build_contents(input_text_parts, None, history),
+                    config=_generate_content_config(cached_content, response_schema),
+                )
+            except Exception as e:
+                if not _is_stale_cache_error(e):
+                    raise
+                context_cache.invalidate(user_api_key, model, page)
+
+        return await client.aio.models.generate_content(
+            model=model,
+            contents=_build_contents(input_text_parts, page, history),
+            config=_generate_content_config(None, response_schema),
         )
 
-        # Use the retry decorator for the API call
-        @gemini_retry_decorator()
-        def get_content():
-            return client.models.generate_content(
-                model=model_name,
-                contents=contents,
-                config=generate_content_config,
-            )
+    # Each model's call is retried inside the failover
+    _, response = await _call_with_failover(user_api_key, model_name, fallback_models, call_model)
+    return response
 
+async def _get_gemini_response(
+    user_api_key: str,
+    model_name: str,
+    input_text_parts: List[str],
+    page: Optional[PageEntry],
+    history: Optional[List[types.Content]],
+    fallback_models: Optional[List[str]]
+) -> str:
+    """
+    Make the Gemini call for get_gemini_response.
+    """
+    try:
         # Get the complete response (non-streaming)
-        response = get_content()
+        response = await _call_gemini(
+            user_api_key, model_name, input_text_parts, page, history=history, fallback_models=fallback_models
+        )
 
         # Return the complete text
         return response.text
 
     except Exception as e:
-        # Handle all exceptions with specific error messages based on error type
-        error_type = type(e).__name__
-        error_message = str(e)
+        _raise_classified(e, "Gemini API call")
 
-        # Log the error
-        logger.error(f"Error during Gemini API call: {error_type}: {error_message}")
-
-        # Categorize errors based on their type or message content
-        if "quota" in error_message.lower() or "rate" in error_message.lower() or "limit" in error_message.lower():
-            return f"Error: API quota exceeded or rate limited. Please try again later or check your API quota."
-        elif "unavailable" in error_message.lower() or "service" in error_message.lower():
-            return f"Error: Service temporarily unavailable. Please try again later."
-        elif "timeout" in error_message.lower() or "deadline" in error_message.lower():
-            return f"Error: Request timed out. The response took too long to generate. Try a shorter prompt or try again later."
-        elif "key" in error_message.lower() or "auth" in error_message.lower() or "credential" in error_message.lower():
-            return f"Error: API key issue. Please check your API key and try again."
-        elif "network" in error_message.lower() or "connection" in error_message.lower():
-            return f"Error: Network connection issue. Please check your internet connection and try again."
-        else:
-            return f"Error: {error_type}: {error_message}"
-
-async def get_gemini_response_stream(user_api_key: str, model_name: str, input_text_parts: List[str]) -> AsyncGenerator[str, None]:
-    """
-    Get a streaming response from the Gemini API with improved error handling and retry logic.
+async def _get_answer_with_suggestions(
+    user_api_key: str,
+    model_name: str,
+    input_text_parts: List[str],
+    page: Optional[PageEntry],
+    count: int,
+    history: Optional[List[types.Content]],
+    fallback_models: Optional[List[str]]
+) -> Dict[str, Any]:
+    """
+    Make the Gemini call for get_gemini_answer_with_suggestions.
+    """
+    try:
+        response = await _call_gemini(
+            user_api_key,
+            model_name,
+            input_text_parts + [_suggestions_instruction(count)],
+            page,
+            answer_with_suggestions_schema(),
+            history,
+            fallback_models,
+        )
+        data = fast_json.loads(response.text)
+        suggestions = [str(question).strip() for question in data.get("suggestions", []) if str(question).strip()]
+        return {"text": data["answer"], "suggestions": suggestions[:count]}
+
+    except Exception as e:
+        _raise_classified(e, "Gemini API call")
+
+async def get_gemini_response_stream(
+    user_api_key: str,
+    model_name: str,
+    input_text_parts: List[str],
+    page: Optional[PageEntry] = None,
+    suggestion_count: int = 0,
+    history: Optional[List[types.Content]] = None,
+    fallback_models: Optional[List[str]] = None
+) -> AsyncGenerator[Dict[str, Any], None]:
+    """
+    Get a streaming response from the Gemini API as typed events.
+
+    Events are dicts with an "event" name and a "data" payload:
+    "delta" ({"text": ...}) for each chunk of text, "suggestions"
+    ({"questions": [...]}) when follow-up questions were requested, "usage"
+    with the token counts reported by Gemini, then either "done" or "error"
+    ({"message": ..., "kind": ...}). Failures before the first event are
+    raised instead, so the caller can still answer with an HTTP error status.
+    Closing the generator early (e.g. when the client disconnects) closes the
+    upstream stream as well. Pages are handled as in get_gemini_response.
+    The stream fails over to the next model on a quota error before any
+    output, and "done" names the model that answered.
 
     Args:
         user_api_key: The user's Gemini API key.
         model_name: The name of the Gemini model to use.
         input_text_parts: The input text parts to send to the Gemini API.
+        page: The webpage the question is about (optional).
+        suggestion_count: Number of follow-up questions to generate in the same call.
+        history: Earlier conversation turns as Gemini contents (optional).
+        fallback_models: Models to fail over to on quota errors (optional).
 
     Yields:
-        str: Chunks of text from the Gemini API response.
-    """
-    # Initialize Gemini client with user's API key
-    client = genai.Client(api_key=user_api_key)
-
-    # Prepare content for Gemini API
-    combined_text = "\n".join(input_text_parts)
-    contents = [
-        types.Content(
-            role="user",
-            parts=[
-                types.Part.from_text(text=combined_text),
-            ],
-        ),
-    ]
-
-    # Configure response generation with timeout and no thinking budget
-    generate_content_config = types.GenerateContentConfig(
-        thinking_config = types.ThinkingConfig(
-            thinking_budget=0,
-        ),
-        response_mime_type="text/plain",
-    )
+        dict: Stream events for the Gemini API response.
 
-    # Track if we've started streaming to provide better error messages
+    Raises:
+        GeminiError: If the call failed before any event was yielded.
+    """
+    # Get the pooled Gemini client for the user's API key
+    client = client_pool.get(user_api_key)
+
+    # With suggestions, Gemini streams a JSON object and the answer field is decoded as it arrives
+    response_schema = None
+    answer_streamer = None
+    if suggestion_count:
+        input_text_parts = input_text_parts + [_suggestions_instruction(suggestion_count)]
+        response_schema = answer_with_suggestions_schema()
+        answer_streamer = JsonStringFieldStreamer("answer")
+
+    # Track whether any output was sent, which decides how errors are reported
     stream_started = False
+    stream = None
+    usage = None
+
+    stream_finished = False
+    span = tracing.NO_SPAN
+    start = time.perf_counter()
 
     try:
-        # Use the retry decorator for the API call
-        @gemini_retry_decorator()
-        def get_content_stream():
-            return client.models.generate_content_stream(
-                model=model_name,
-                contents=contents,
-                config=generate_content_config,
+        async def open_model_stream(model: str):
+            cached_content = await _get_page_cache(client, user_api_key, model, page)
+            if cached_content is not None:
+                try:
+                    return await client.aio.models.generate_content_stream(
+                        model=model,
+                        contents=_build_contents(input_text_parts, None, history),
+                        config=_generate_content_config(cached_content, response_schema),
+                    )
+                except Exception as e:
+                    if not _is_stale_cache_error(e):
+                        raise
+                    context_cache.invalidate(user_api_key, model, page)
+
+            return await client.aio.models.generate_content_stream(
+                model=model,
+                contents=_build_contents(input_text_parts, page, history),
+                config=_generate_content_config(None, response_schema),
             )
 
-        # Stream the response with retries
-        for chunk in get_content_stream():
-            stream_started = True
-            if chunk.text:
-                yield chunk.text
-            # Small delay to prevent overwhelming the client
-            await asyncio.sleep(0.01)
+        # Only opening the stream is retried; output can't be retried once forwarded
+        model_name, stream = await _call_with_failover(
+            user_api_key, model_name, fallback_models, open_model_stream, record_success=False
+        )
+        # Not the current span: the context can't be held across the generator's yields
+        span = tracing.start_span("gemini.stream", model=model_name)
+        # Forward chunks as soon as they arrive from upstream
+        async for chunk in stream:
+            text = chunk.text
+            if text and answer_streamer is not None:
+                text = answer_streamer.feed(text)
+            if text:
+                if not stream_started:
+                    metrics.TIME_TO_FIRST_TOKEN.labels(model_name).observe(time.perf_counter() - start)
+                stream_started = True
+                span.add_event("chunk", {"chars": len(text)})
+                yield {"event": "delta", "data": {"text": text}}
+            # Usage metadata is cumulative, so the last one reported wins
+            if getattr(chunk, "usage_metadata", None) is not None:
+                usage = chunk.usage_metadata
+        _record_call(model_name, time.perf_counter() - start)
+        metrics.observe_usage(model_name, usage)
+        if usage is not None:
+            span.set_attribute("prompt_tokens", usage.prompt_token_count or 0)
+            span.set_attribute("response_tokens", usage.candidates_token_count or 0)
+        stream_finished = True
+
+        if answer_streamer is not None:
+            data = fast_json.loads(answer_streamer.text)
+            questions = [str(question).strip() for question in data.get("suggestions", []) if str(question).strip()]
+            yield {"event": "suggestions", "data": {"questions": questions[:suggestion_count]}}
+
+        if usage is not None:
+            yield {
+                "event": "usage",
+                "data": {
+                    "prompt_tokens": usage.prompt_token_count,
+                    "response_tokens": usage.candidates_token_count,
+                    "total_tokens": usage.total_token_count,
+                },
+            }
 
         # Signal successful completion
-        yield "\n\n[Response completed successfully]"
+        yield {"event": "done", "data": {"model": model_name}}
 
     except Exception as e:
-        # Handle all exceptions with specific error messages based on error type
-        error_type = type(e).__name__
-        error_message = str(e)
+        if stream is not None and not stream_finished:
+            # Failures to open the stream were recorded with the model router already
+            _record_call(model_name, time.perf_counter() - start, e, user_api_key)
+        if not stream_started:
+            # Nothing was sent yet, so the caller can still answer with an error status
+            _raise_classified(e, "Gemini API streaming")
+
+        error = classify_error(e)
+        span.set_attribute("error.kind", error.kind)
+        logger.error(f"Error during Gemini API streaming ({error.kind}): {type(e).__name__}: {e}")
+        # Report a user-friendly error message
+        yield {"event": "error", "data": {"message": f"Stream interrupted. {error.message}", "kind": error.kind}}
+
+    finally:
+        span.end()
+        # Stop the upstream call if we were closed before it finished
+        if stream is not None and hasattr(stream, "aclose"):
+            await stream.aclose()
+
+def cached_question_suggestions(
+    user_api_key: str,
+    model_name: str,
+    page_id: str,
+    count: int = 5,
+    conversation_history: List[dict] = None,
+    use_conversation_context: bool = False
+) -> Optional[List[str]]:
+    """
+    Get suggested questions from the cache, without calling Gemini.
 
-        # Log the error
-        logger.error(f"Error during Gemini API streaming: {error_type}: {error_message}")
-
-        # Categorize errors based on their type or message content
-        if "quota" in error_message.lower() or "rate" in error_message.lower() or "limit" in error_message.lower():
-            # Handle rate limiting or quota errors
-            user_message = f"\n\nError: API quota exceeded or rate limited. Please try again later or check your API quota."
-        elif "unavailable" in error_message.lower() or "service" in error_message.lower():
-            # Handle service unavailability
-            user_message = f"\n\nError: Service temporarily unavailable. Please try again later."
-        elif "timeout" in error_message.lower() or "deadline" in error_message.lower():
-            # Handle timeout errors
-            user_message = f"\n\nError: Request timed out. The response took too long to generate. Try a shorter prompt or try again later."
-        elif "key" in error_message.lower() or "auth" in error_message.lower() or "credential" in error_message.lower():
-            # Handle API key errors
-            user_message = f"\n\nError: API key issue. Please check your API key and try again."
-        elif "network" in error_message.lower() or "connection" in error_message.lower():
-            # Handle network errors
-            user_message = f"\n\nError: Network connection issue. Please check your internet connection and try again."
-        else:
-            # Generic error message with context about whether streaming started
-            if not stream_started:
-                user_message = f"\n\nError: Failed to start streaming response. {error_type}: {error_message}"
-            else:
-                user_message = f"\n\nError: Stream interrupted. {error_type}: {error_message}"
-
-        # Return a user-friendly error message
-        yield user_message
+    Lets callers skip the rate limiter for requests the cache answers. Stale
+    entries aren't returned, since serving them starts a refresh; that is
+    left to generate_question_suggestions.
+
+    Args:
+        user_api_key: The user's Gemini API key (only its own suggestions are served).
+        model_name: The name of the Gemini model to use.
+        page_id: The digest of the webpage content.
+        count: Number of questions to generate (default: 5).
+        conversation_history: Previous messages in the conversation (optional).
+        use_conversation_context: Whether to use conversation history for context.
+
+    Returns:
+        Optional[List[str]]: The cached questions, or None if there are no fresh ones.
+    """
+    cache_key = _suggestion_cache_key(
+        user_api_key, model_name, page_id, count, conversation_history, use_conversation_context
+    )
+    cached = suggestion_cache.get(cache_key)
+    if cached is None or cached[1]:
+        return None
+    return list(cached[0])
 
 async def generate_question_suggestions(
     user_api_key: str,
@@ -196,11 +726,16 @@ async def generate_question_suggestions(
     webpage_content: str,
     count: int = 5,
     conversation_history: List[dict] = None,
-    use_conversation_context: bool = False
+    use_conversation_context: bool = False,
+    fallback_models: Optional[List[str]] = None,
+    rate_limit_wait: Optional[float] = None
 ) -> List[str]:
     """
     Generate suggested questions based on webpage content and optionally conversation history.
 
+    A stale cached set is served at once and refreshed in the background,
+    which only takes a rate limit slot that is free right away.
+
     Args:
         user_api_key: The user's Gemini API key.
         model_name: The name of the Gemini model to use.
@@ -208,23 +743,78 @@ async def generate_question_suggestions(
         count: Number of questions to generate (default: 5).
         conversation_history: Previous messages in the conversation (optional).
         use_conversation_context: Whether to use conversation history for context.
+        fallback_models: Models to fail over to on quota errors (optional).
+        rate_limit_wait: Seconds to wait at most for a rate limit slot
+            (default: the limiter's max_wait; 0 to only take a free one).
 
     Returns:
-        List[str]: A list of suggested questions.
+        List[str]: A list of suggested questions (defaults if Gemini failed transiently).
+
+    Raises:
+        GeminiError: For auth, quota and bad-request failures.
+        RateLimitExceeded: If no rate limit slot was free within the wait.
+    """
+    page_id = compute_page_id(webpage_content)
+    cache_key = _suggestion_cache_key(
+        user_api_key, model_name, page_id, count, conversation_history, use_conversation_context
+    )
+
+    # Identical requests in flight at the same time share one upstream call
+    flight_key = _request_key("suggestions", user_api_key, model_name, *map(str, cache_key))
+
+    def generate(wait: Optional[float]):
+        return _coalesced(
+            flight_key,
+            user_api_key,
+            lambda: _generate_question_suggestions(
+                user_api_key,
+                model_name,
+                webpage_content,
+                count,
+                conversation_history,
+                use_conversation_context,
+                fallback_models,
+            ),
+            wait,
+        )
+
+    cached = suggestion_cache.get(cache_key)
+    if cached is not None:
+        questions, stale = cached
+        if stale:
+            # Serve the stale set now and replace it in the background, never queueing for the rate limit
+            suggestion_cache.refresh_in_background(cache_key, lambda: generate(0.0))
+        return list(questions)
+
+    questions = await generate(rate_limit_wait)
+    suggestion_cache.set(cache_key, questions)
+    return list(questions)
+
+async def _generate_question_suggestions(
+    user_api_key: str,
+    model_name: str,
+    webpage_content: str,
+    count: int,
+    conversation_history: Optional[List[dict]],
+    use_conversation_context: bool,
+    fallback_models: Optional[List[str]]
+) -> List[str]:
+    """
+    Make the Gemini call for generate_question_suggestions.
     """
     try:
-        # Initialize Gemini client with user's API key
-        client = genai.Client(api_key=user_api_key)
+        # Get the pooled Gemini client for the user's API key
+        client = client_pool.get(user_api_key)
 
         # Format conversation history if provided and enabled
         conversation_context = ""
         if use_conversation_context and conversation_history and len(conversation_history) > 0:
-            conversation_context = "CONVERSATION HISTORY:\n"
-            for message in conversation_history:
-                role = message.get("role", "").capitalize()
-                content = message.get("content", "")
-                conversation_context += f"{role}: {content}\n"
-            conversation_context += "\n"
+            # Build the lines once and join them, rather than growing a string per message
+            lines = [
+                f"{message.get('role', '').capitalize()}: {message.get('content', '')}\n"
+                for message in conversation_history
+            ]
+            conversation_context = "CONVERSATION HISTORY:\n" + "".join(lines) + "\n"
 
         # Create a prompt for generating questions
         prompt = f"""
@@ -258,78 +848,38 @@ async def generate_question_suggestions(
             ),
         ]
 
-        # Configure response generation with no thinking budget
-        generate_content_config = types.GenerateContentConfig(
-            thinking_config = types.ThinkingConfig(
-                thinking_budget=0,
+        # Get the complete response (each model's call is retried inside the failover);
+        # structured output guarantees a JSON array of strings
+        _, response = await _call_with_failover(
+            user_api_key,
+            model_name,
+            fallback_models,
+            lambda model: client.aio.models.generate_content(
+                model=model,
+                contents=contents,
+                config=_generate_content_config(response_schema=suggestions_schema()),
             ),
-            response_mime_type="text/plain",
         )
-
-        # Use the retry decorator for the API call
-        @gemini_retry_decorator()
-        def get_content():
-            return client.models.generate_content(
-                model=model_name,
-                contents=contents,
-                config=generate_content_config,
-            )
-
-        # Get the complete response
-        response = get_content()
-        response_text = response.text.strip()
-
-        # Try to parse the response as JSON
-        try:
-            # Check if the response is already in JSON format
-            if response_text.startswith("[") and response_text.endswith("]"):
-                questions = json.loads(response_text)
-            else:
-                # Try to extract JSON array from the response text
-                # Look for text between square brackets
-                import re
-                json_match = re.search(r'\[(.*?)\]', response_text, re.DOTALL)
-                if json_match:
-                    # Try to parse the extracted text as JSON
-                    questions = json.loads(f"[{json_match.group(1)}]")
-                else:
-                    # If no JSON array found, split by newlines and clean up
-                    questions = [q.strip() for q in response_text.split('\n') if q.strip()]
-                    # Remove any numbering (e.g., "1.", "2.", etc.)
-                    questions = [re.sub(r'^\d+[\.\)]\s*', '', q) for q in questions]
-                    # Remove any quotes
-                    questions = [q.strip('"\'') for q in questions]
-        except json.JSONDecodeError:
-            # If JSON parsing fails, split by newlines and clean up
-            questions = [q.strip() for q in response_text.split('\n') if q.strip()]
-            # Remove any numbering (e.g., "1.", "2.", etc.)
-            import re
-            questions = [re.sub(r'^\d+[\.\)]\s*', '', q) for q in questions]
-            # Remove any quotes
-            questions = [q.strip('"\'') for q in questions]
+        questions = [str(question).strip() for question in fast_json.loads(response.text)]
+        questions = [question for question in questions if question]
 
         # Limit to the requested count
         questions = questions[:count]
 
         # Ensure we have at least one question
         if not questions:
-            questions = ["What is this webpage about?"]
+            questions = DEFAULT_QUESTIONS[:1]
 
         return questions
 
     except Exception as e:
-        # Handle all exceptions with specific error messages based on error type
-        error_type = type(e).__name__
-        error_message = str(e)
+        error = classify_error(e)
+        if isinstance(error, _CALLER_ERRORS):
+            # The caller has to fix these, so they are reported rather than papered over
+            _raise_classified(e, "question suggestions")
 
         # Log the error
-        logger.error(f"Error generating question suggestions: {error_type}: {error_message}")
+        logger.error(f"Error generating question suggestions ({error.kind}): {type(e).__name__}: {e}")
 
         # Return default questions if there's an error
-        return [
-            "What is this webpage about?",
-            "Can you summarize the key points?",
-            "What are the main topics discussed?",
-            "How does this information relate to current events?",
-            "What are the implications of this content?"
-        ]
+        return list(DEFAULT_QUESTIONS)
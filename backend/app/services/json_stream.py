@@ -0,0 +1,100 @@
+import json
+import re
+
+class JsonStringFieldStreamer:
+    """
+    Incrementally extract one string field from a streamed JSON object.
+
+    Gemini's structured output arrives as chunks of a JSON document. Feeding
+    the chunks in order returns the newly decoded text of the chosen string
+    field as soon as it is complete enough to decode, so the field can be
+    forwarded while the rest of the object is still being generated.
+    """
+
+    def __init__(self, field: str):
+        self._key_pattern = re.compile(r'"' + re.escape(field) + r'"\s*:\s*"')
+        self._quoted_key = '"' + field + '"'
+        # Chunks are joined once, when the whole document is needed; appending
+        # to one string would copy everything received so far on every chunk
+        self._chunks = []
+        # The received text not yet consumed: a possible start of the key
+        # while searching for it, then the undecoded part of the field value
+        self._tail = ""
+        self._found = False
+        self.done = False
+
+    @property
+    def text(self) -> str:
+        """
+        The raw JSON received so far.
+        """
+        if len(self._chunks) > 1:
+            self._chunks = ["".join(self._chunks)]
+        return self._chunks[0] if self._chunks else ""
+
+    def _find_key(self) -> bool:
+        match = self._key_pattern.search(self._tail)
+        if match is not None:
+            self._tail = self._tail[match.end():]
+            return True
+        # Only a key that runs into the next chunk can still match: one starting
+        # at the last complete key name, or a key name cut off at the end
+        keep = len(self._tail) - len(self._quoted_key)
+        last_key = self._tail.rfind(self._quoted_key)
+        if last_key != -1:
+            keep = min(keep, last_key)
+        if keep > 0:
+            self._tail = self._tail[keep:]
+        return False
+
+    def feed(self, chunk: str) -> str:
+        """
+        Add a chunk of JSON and decode any new text of the field.
+
+        Args:
+            chunk: The next piece of the JSON document.
+
+        Returns:
+            str: The newly decoded field text (possibly empty).
+        """
+        self._chunks.append(chunk)
+        if self.done:
+            return ""
+
+        self._tail += chunk
+        if not self._found:
+            self._found = self._find_key()
+            if not self._found:
+                return ""
+
+        buffer = self._tail
+        index = 0
+        length = len(buffer)
+        while index < length:
+            char = buffer[index]
+            if char == '"':
+                self.done = True
+                break
+            if char != "\\":
+                index += 1
+                continue
+            # Don't split an escape sequence across decodes
+            if index + 1 >= length:
+                break
+            if buffer[index + 1] != "u":
+                index += 2
+                continue
+            if index + 6 > length:
+                break
+            # A high surrogate must be decoded together with its low surrogate
+            if 0xD800 <= int(buffer[index + 2:index + 6], 16) <= 0xDBFF:
+                if index + 12 > length:
+                    break
+                index += 12
+            else:
+                index += 6
+
+        self._tail = "" if self.done else buffer[index:]
+        if index == 0:
+            return ""
+        return json.loads('"' + buffer[:index] + '"')
@@ -0,0 +1,311 @@
+import time
+from abc import ABC, abstractmethod
+from collections import Counter, OrderedDict
+from typing import Callable, Dict, List, Optional
+from app.core import metrics
+from app.core.config import settings
+from app.core.security import hash_api_key
+from app.services.gemini_errors import GeminiAuthError, GeminiInvalidRequestError, classify_error, is_quota_error
+
+# Task types the router distinguishes
+TASK_CHAT = "chat"
+TASK_SUGGESTIONS = "suggestions"
+
+class ModelHealth:
+    """
+    Observed latency and error rate of one model.
+
+    Both are exponentially weighted moving averages, so recent calls count
+    most. Health is shared by all users, so it only reflects outcomes that
+    say something about the model: errors caused by the caller's key (auth,
+    bad requests, its quota) are counted but don't move the averages.
+    """
+    __slots__ = ("calls", "errors", "quota_errors", "key_errors", "latency", "error_rate")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.quota_errors = 0
+        self.key_errors = 0
+        self.latency: Optional[float] = None
+        self.error_rate = 0.0
+
+    def to_dict(self) -> Dict[str, object]:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "quota_errors": self.quota_errors,
+            "key_errors": self.key_errors,
+            "latency_ewma": self.latency,
+            "error_rate_ewma": self.error_rate,
+        }
+
+class RouteDecision:
+    """
+    The models to try for a request, in order, and why the first was chosen.
+    """
+    __slots__ = ("models", "reason")
+
+    def __init__(self, models: List[str], reason: str):
+        self.models = models
+        self.reason = reason
+
+    @property
+    def model(self) -> str:
+        """
+        The model to call first.
+        """
+        return self.models[0]
+
+    @property
+    def fallbacks(self) -> List[str]:
+        """
+        The models to fail over to, in order.
+        """
+        return self.models[1:]
+
+class RoutingPolicy(ABC):
+    """
+    Orders the models that can serve a request.
+
+    Subclasses implement `order`; the router has already dropped models whose
+    token limit the request exceeds, and afterwards moves models in a quota
+    cooldown to the end.
+    """
+    name = "base"
+
+    @abstractmethod
+    def order(self, task: str, token_count: int, models: List[str], health: Dict[str, ModelHealth]) -> List[str]:
+        """
+        Order the candidate models, most preferred first.
+
+        Args:
+            task: TASK_CHAT or TASK_SUGGESTIONS.
+            token_count: Estimated prompt tokens.
+            models: Candidate models in configured preference order.
+            health: Observed health per model.
+
+        Returns:
+            List[str]: The candidates, most preferred first.
+        """
+
+class PreferencePolicy(RoutingPolicy):
+    """
+    Keep the configured preference order (the original TOKEN_LIMIT rule).
+    """
+    name = "preference"
+
+    def order(self, task, token_count, models, health):
+        return list(models)
+
+class LatencyPolicy(RoutingPolicy):
+    """
+    Prefer the fastest model among those with an acceptable error rate.
+
+    Models without observations yet are tried first, so every candidate gets
+    measured.
+    """
+    name = "latency"
+
+    def __init__(self, max_error_rate: float = 0.5):
+        self.max_error_rate = max_error_rate
+
+    def order(self, task, token_count, models, health):
+        def sort_key(model: str):
+            model_health = health.get(model)
+            if model_health is None or model_health.latency is None:
+                return (False, 0.0)
+            return (model_health.error_rate > self.max_error_rate, model_health.latency)
+        return sorted(models, key=sort_key)
+
+POLICIES: Dict[str, Callable[[], RoutingPolicy]] = {
+    PreferencePolicy.name: PreferencePolicy,
+    LatencyPolicy.name: lambda: LatencyPolicy(settings.ROUTER_MAX_ERROR_RATE),
+}
+
+class ModelRouter:
+    """
+    Chooses the Gemini model for each request.
+
+    The candidates for a task are its preferred models (e.g. a lite model
+    for suggestions) followed by the primary and fallback models. Models
+    whose token limit the prompt exceeds are dropped, the policy orders the
+    rest, and models cooling down after a quota error go last. Outcomes of
+    calls feed back into the per-model health the policies use.
+
+    Each user brings their own Gemini key, and quota is per key, so quota
+    cooldowns are kept per key hash (the `max_keys` most recently seen): one
+    user running out of quota doesn't move anyone else off a model.
+    """
+
+    def __init__(
+        self,
+        primary_model: str,
+        fallback_model: str,
+        token_limits: Optional[Dict[str, int]] = None,
+        task_models: Optional[Dict[str, str]] = None,
+        policy: Optional[RoutingPolicy] = None,
+        quota_cooldown: float = 60.0,
+        ewma_alpha: float = 0.2,
+        max_keys: int = 10000,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.primary_model = primary_model
+        self.fallback_model = fallback_model
+        self.token_limits = token_limits or {}
+        self.task_models = task_models or {}
+        self.policy = policy or PreferencePolicy()
+        self.quota_cooldown = quota_cooldown
+        self.ewma_alpha = ewma_alpha
+        self.max_keys = max_keys
+        self.clock = clock
+        self.health: Dict[str, ModelHealth] = {}
+        # Cooldown end per model, per API key hash
+        self._cooldowns: "OrderedDict[str, Dict[str, float]]" = OrderedDict()
+        self.decisions: Counter = Counter()
+        self.failovers: Counter = Counter()
+
+    def _candidates(self, task: str) -> List[str]:
+        models = [self.task_models.get(task), self.primary_model, self.fallback_model]
+        return list(dict.fromkeys(model for model in models if model))
+
+    def route(self, task: str, token_count: int, api_key: Optional[str] = None) -> RouteDecision:
+        """
+        Choose the models to try for a request.
+
+        Args:
+            task: TASK_CHAT or TASK_SUGGESTIONS.
+            token_count: Estimated prompt tokens.
+            api_key: The user's Gemini API key, whose quota cooldowns apply (optional).
+
+        Returns:
+            RouteDecision: The models in the order to try them.
+        """
+        candidates = self._candidates(task)
+        fitting = [model for model in candidates if token_count <= self.token_limits.get(model, token_count)]
+        # Without a model that fits, the last resort is still the fallback model
+        models = self.policy.order(task, token_count, fitting or [self.fallback_model], self.health)
+
+        now = self.clock()
+        cooldowns = self._key_cooldowns(api_key) if api_key is not None else {}
+        available = [model for model in models if cooldowns.get(model, 0.0) <= now]
+        cooling = [model for model in models if cooldowns.get(model, 0.0) > now]
+        ordered = available + cooling
+
+        if ordered[0] != models[0]:
+            reason = "quota_cooldown"
+        elif candidates[0] not in fitting:
+            reason = "token_limit"
+        elif models[0] != fitting[0]:
+            reason = self.policy.name
+        elif models[0] == self.task_models.get(task):
+            reason = "task"
+        else:
+            reason = "default"
+
+        self.decisions[(task, ordered[0], reason)] += 1
+        # The token count is the routing input; its distribution per decision goes to the metrics
+        metrics.ROUTING_TOKENS.labels(task, ordered[0], reason).observe(token_count)
+        return RouteDecision(ordered, reason)
+
+    def _key_cooldowns(self, api_key: str) -> Dict[str, float]:
+        key_hash = hash_api_key(api_key)
+        cooldowns = self._cooldowns.get(key_hash)
+        if cooldowns is None:
+            return {}
+        self._cooldowns.move_to_end(key_hash)
+        return cooldowns
+
+    def record(
+        self, model: str, latency: float, error: Optional[Exception] = None, api_key: Optional[str] = None
+    ) -> None:
+        """
+        Record the outcome of a Gemini call.
+
+        Args:
+            model: The model that was called.
+            latency: Seconds the call took.
+            error: The exception the call failed with, if it failed.
+            api_key: The user's Gemini API key, cooled down on quota errors (optional).
+        """
+        model_health = self.health.get(model)
+        if model_health is None:
+            model_health = self.health[model] = ModelHealth()
+        model_health.calls += 1
+        alpha = self.ewma_alpha
+
+        if error is None:
+            model_health.error_rate -= alpha * model_health.error_rate
+            # Failed calls return early, so only successful calls shape the latency
+            if model_health.latency is None:
+                model_health.latency = latency
+            else:
+                model_health.latency += alpha * (latency - model_health.latency)
+            return
+
+        model_health.errors += 1
+        if is_quota_error(error):
+            model_health.quota_errors += 1
+            if api_key is not None:
+                self._cool_down(api_key, model)
+        elif isinstance(classify_error(error), (GeminiAuthError, GeminiInvalidRequestError)):
+            model_health.key_errors += 1
+        else:
+            # Server-side and transient failures are the model's, for everyone
+            model_health.error_rate += alpha * (1.0 - model_health.error_rate)
+
+    def _cool_down(self, api_key: str, model: str) -> None:
+        key_hash = hash_api_key(api_key)
+        cooldowns = self._cooldowns.get(key_hash)
+        if cooldowns is None:
+            cooldowns = self._cooldowns[key_hash] = {}
+            # Forget the least recently seen keys beyond the bound
+            while len(self._cooldowns) > self.max_keys:
+                self._cooldowns.popitem(last=False)
+        else:
+            self._cooldowns.move_to_end(key_hash)
+        cooldowns[model] = self.clock() + self.quota_cooldown
+
+    def record_failover(self, from_model: str, to_model: str) -> None:
+        """
+        Count a failover from one model to another after a quota error.
+        """
+        self.failovers[(from_model, to_model)] += 1
+
+    def stats(self) -> Dict[str, object]:
+        """
+        Get the routing counters and per-model health.
+
+        Returns:
+            dict: Policy name, decision counts by task/model/reason, failover
+            counts, per-model health and the keys with a model cooling down.
+        """
+        now = self.clock()
+        cooling_keys = sum(
+            1 for cooldowns in self._cooldowns.values() if any(until > now for until in cooldowns.values())
+        )
+        return {
+            "policy": self.policy.name,
+            "decisions": [
+                {"task": task, "model": model, "reason": reason, "count": count}
+                for (task, model, reason), count in sorted(self.decisions.items())
+            ],
+            "failovers": [
+                {"from": from_model, "to": to_model, "count": count}
+                for (from_model, to_model), count in sorted(self.failovers.items())
+            ],
+            "models": {model: model_health.to_dict() for model, model_health in self.health.items()},
+            "keys_cooling_down": cooling_keys,
+        }
+
+# Process-wide model router
+model_router = ModelRouter(
+    primary_model=settings.PRIMARY_MODEL,
+    fallback_model=settings.FALLBACK_MODEL,
+    token_limits={settings.PRIMARY_MODEL: settings.TOKEN_LIMIT},
+    task_models={TASK_SUGGESTIONS: settings.SUGGESTIONS_MODEL} if settings.SUGGESTIONS_MODEL else {},
+    policy=POLICIES[settings.ROUTER_POLICY](),
+    quota_cooldown=settings.ROUTER_QUOTA_COOLDOWN,
+    ewma_alpha=settings.ROUTER_EWMA_ALPHA,
+    max_keys=settings.ROUTER_MAX_KEYS,
+)
@@ -0,0 +1,246 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+from collections import OrderedDict
+from typing import Dict, Optional
+from app.core.config import settings
+from app.services.cache_backend import CacheBackend, shared_backend
+from app.services.token_estimator import estimate_tokens_async
+
+logger = logging.getLogger(__name__)
+
+class PageEntry:
+    """
+    A webpage and its precomputed token count.
+
+    size is the UTF-8 encoded size of the content in bytes.
+    page_id is None for inline pages until something needs their digest.
+    tokens_saved is the approximate number of tokens content compaction
+    removed from the page as sent by the client. token_count_checked is
+    set once retrieval has recounted the page against its budget.
+    """
+    __slots__ = ("page_id", "content", "token_count", "size", "tokens_saved", "token_count_checked")
+
+    def __init__(self, page_id: Optional[str], content: str, token_count: int, size: int, tokens_saved: int = 0):
+        self.page_id = page_id
+        self.content = content
+        self.token_count = token_count
+        self.size = size
+        self.tokens_saved = tokens_saved
+        self.token_count_checked = False
+
+def compute_page_id(content: str) -> str:
+    """
+    Compute the content address of a webpage.
+
+    Args:
+        content: The webpage content.
+
+    Returns:
+        str: The hex SHA-256 digest of the UTF-8 encoded content.
+    """
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+def utf8_size(content: str) -> int:
+    """
+    Get the UTF-8 encoded size of a webpage without encoding ASCII content.
+
+    Args:
+        content: The webpage content.
+
+    Returns:
+        int: The size in bytes.
+    """
+    return len(content) if content.isascii() else len(content.encode("utf-8"))
+
+class PageStore:
+    """
+    Content-addressed store of webpage content, bounded by total size.
+
+    Pages are evicted least-recently-used first once the total UTF-8 size exceeds
+    `max_bytes`. If `spill_dir` is set, evicted pages are written there and
+    loaded back on the next lookup, with the spill directory itself pruned to
+    `spill_max_bytes` (oldest files first).
+
+    With a shared `backend`, registered pages are also written there for
+    `shared_ttl` seconds, so a page registered with one worker can be
+    looked up by the others.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 256 * 1024 * 1024,
+        spill_dir: Optional[str] = None,
+        spill_max_bytes: int = 1024 * 1024 * 1024,
+        backend: Optional[CacheBackend] = None,
+        shared_ttl: float = 3600.0,
+    ):
+        self.max_bytes = max_bytes
+        self.spill_dir = spill_dir
+        self.spill_max_bytes = spill_max_bytes
+        self.backend = backend
+        self.shared_ttl = shared_ttl
+        self._pages: "OrderedDict[str, PageEntry]" = OrderedDict()
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.spill_hits = 0
+        self.shared_hits = 0
+
+    async def register(self, content: str, tokens_saved: int = 0) -> PageEntry:
+        """
+        Store a webpage, counting its tokens once.
+
+        Args:
+            content: The webpage content.
+            tokens_saved: Tokens removed from the content by compaction.
+
+        Returns:
+            PageEntry: The stored entry (the existing one if already registered).
+        """
+        page_id = compute_page_id(content)
+        entry = await self.get(page_id)
+        if entry is not None:
+            return entry
+
+        token_count = await estimate_tokens_async(content)
+        entry = PageEntry(page_id, content, token_count, utf8_size(content), tokens_saved)
+        await self._insert(entry)
+        if self.backend is not None:
+            # Pages can be large; serialize and write them off the event loop
+            await asyncio.to_thread(
+                self.backend.set, ("page", page_id), self._page_data(entry), self.shared_ttl
+            )
+        return entry
+
+    async def get(self, page_id: str) -> Optional[PageEntry]:
+        """
+        Look up a registered webpage by its digest.
+
+        Args:
+            page_id: The page digest returned at registration.
+
+        Returns:
+            Optional[PageEntry]: The entry, or None if it is unknown or was evicted.
+        """
+        entry = self._pages.get(page_id)
+        if entry is not None:
+            self.hits += 1
+            self._pages.move_to_end(page_id)
+            return entry
+
+        if self.spill_dir:
+            entry = await asyncio.to_thread(self._read_spilled, page_id)
+            if entry is not None:
+                self.spill_hits += 1
+                await self._insert(entry)
+                return entry
+
+        if self.backend is not None and self._valid_page_id(page_id):
+            data = await asyncio.to_thread(self.backend.get, ("page", page_id))
+            if data is not None:
+                self.shared_hits += 1
+                entry = self._entry_from_data(page_id, data)
+                await self._insert(entry)
+                return entry
+
+        self.misses += 1
+        return None
+
+    async def _insert(self, entry: PageEntry) -> None:
+        if entry.page_id in self._pages:
+            return
+        self._pages[entry.page_id] = entry
+        self._size += entry.size
+
+        evicted = []
+        while self._size > self.max_bytes and len(self._pages) > 1:
+            _, old = self._pages.popitem(last=False)
+            self._size -= old.size
+            self.evictions += 1
+            evicted.append(old)
+
+        if self.spill_dir and evicted:
+            await asyncio.to_thread(self._spill, evicted)
+
+    def _spill_path(self, page_id: str) -> str:
+        return os.path.join(self.spill_dir, f"{page_id}.json")
+
+    def _spill(self, entries) -> None:
+        os.makedirs(self.spill_dir, exist_ok=True)
+        for entry in entries:
+            path = self._spill_path(entry.page_id)
+            if os.path.exists(path):
+                continue
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(self._page_data(entry), f)
+        self._prune_spill_dir()
+
+    def _prune_spill_dir(self) -> None:
+        files = []
+        total = 0
+        for name in os.listdir(self.spill_dir):
+            path = os.path.join(self.spill_dir, name)
+            stat = os.stat(path)
+            files.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+        for _, size, path in sorted(files):
+            if total <= self.spill_max_bytes:
+                break
+            os.remove(path)
+            total -= size
+
+    @staticmethod
+    def _page_data(entry: PageEntry) -> Dict[str, object]:
+        return {"token_count": entry.token_count, "tokens_saved": entry.tokens_saved, "content": entry.content}
+
+    @staticmethod
+    def _entry_from_data(page_id: str, data: Dict[str, object]) -> PageEntry:
+        content = data["content"]
+        return PageEntry(page_id, content, data["token_count"], utf8_size(content), data.get("tokens_saved", 0))
+
+    @staticmethod
+    def _valid_page_id(page_id: str) -> bool:
+        return len(page_id) == 64 and all(c in "0123456789abcdef" for c in page_id)
+
+    def _read_spilled(self, page_id: str) -> Optional[PageEntry]:
+        # Page ids are validated hex digests, but never build paths from anything else
+        if not self._valid_page_id(page_id):
+            return None
+        try:
+            with open(self._spill_path(page_id), encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return self._entry_from_data(page_id, data)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get the store counters.
+
+        Returns:
+            dict: Page count, total size and hit/miss/eviction counts (pages
+            of this worker; shared hits were registered with another).
+        """
+        return {
+            "pages": len(self._pages),
+            "size": self._size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "spill_hits": self.spill_hits,
+            "shared_hits": self.shared_hits,
+        }
+
+# Process-wide page store (registered pages shared across workers with a shared cache backend)
+page_store = PageStore(
+    max_bytes=settings.PAGE_STORE_MAX_BYTES,
+    spill_dir=settings.PAGE_STORE_SPILL_DIR or None,
+    spill_max_bytes=settings.PAGE_STORE_SPILL_MAX_BYTES,
+    backend=shared_backend,
+    shared_ttl=settings.PAGE_STORE_SHARED_TTL,
+)
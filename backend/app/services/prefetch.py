@@ -0,0 +1,254 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Set
+from app.core.config import settings
+from app.core.security import hash_api_key
+from app.services.cache_backend import CacheBackend, shared_backend
+from app.services.gemini_service import generate_question_suggestions, get_gemini_response
+from app.services.model_router import TASK_CHAT, TASK_SUGGESTIONS, model_router
+from app.services.page_store import PageEntry, compute_page_id
+from app.services.rate_limiter import RateLimitExceeded, TokenBucket
+from app.services.response_cache import ResponseCache
+from app.services.token_estimator import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+def normalize_query(query: str) -> str:
+    """
+    Normalize a chat query for matching: case, whitespace and trailing
+    punctuation don't change the question.
+    """
+    return " ".join(query.split()).rstrip(".!?").strip().lower()
+
+class Prefetcher:
+    """
+    Answers the first questions about a page before they are asked.
+
+    The sidebar's first interaction is almost always "summarize" or loading
+    suggestions. When a page is registered, the summary (and the
+    suggestions, which land in the suggestion cache) are generated in the
+    background, so the first chat request for the summary is answered from
+    a short-TTL cache, or joins the prefetch still in flight. Summaries are
+    only served to the key that paid for them.
+
+    Prefetching is speculative and spends the user's quota, so it yields to
+    real requests: each key gets a budget of `budget` prefetch calls per
+    `budget_window` seconds, at most `concurrency` prefetch calls run per
+    worker, and a prefetch only goes upstream if the key's rate limiter has
+    a slot free right away (it never queues). Anything over these limits is
+    skipped, not delayed.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        query: str = "Summarize this page",
+        suggestion_count: int = 3,
+        max_entries: int = 256,
+        ttl: float = 120.0,
+        budget: float = 20.0,
+        budget_window: float = 3600.0,
+        concurrency: int = 4,
+        max_keys: int = 10000,
+        backend: Optional[CacheBackend] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.enabled = enabled
+        self.query = query
+        self.suggestion_count = suggestion_count
+        self.budget = budget
+        self.budget_window = budget_window
+        self.concurrency = concurrency
+        self.max_keys = max_keys
+        self.clock = clock
+        # Summaries, plus markers for the pages whose suggestions were prefetched
+        self.cache = ResponseCache(max_entries=max_entries, ttl=ttl, backend=backend, namespace="prefetch")
+        self._budgets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._in_flight: Dict[Hashable, asyncio.Task] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self.started = 0
+        self.completed = 0
+        self.failed = 0
+        self.served = 0
+        self.skipped: Dict[str, int] = {"budget": 0, "concurrency": 0, "rate": 0}
+
+    def matches(self, query: str) -> bool:
+        """
+        Whether a chat query asks the prefetched question.
+        """
+        return normalize_query(query) == normalize_query(self.query)
+
+    def _summary_key(self, api_key: str, model: str, page_id: str) -> Hashable:
+        # Answers were paid for by the key that triggered the prefetch, and only serve that key
+        return ("summary", hash_api_key(api_key), model, page_id, normalize_query(self.query))
+
+    def _take_budget(self, api_key: str) -> bool:
+        key_hash = hash_api_key(api_key)
+        now = self.clock()
+        bucket = self._budgets.get(key_hash)
+        if bucket is None:
+            bucket = TokenBucket(self.budget / self.budget_window, self.budget, now)
+            self._budgets[key_hash] = bucket
+            while len(self._budgets) > self.max_keys:
+                self._budgets.popitem(last=False)
+        else:
+            self._budgets.move_to_end(key_hash)
+        return bucket.reserve(now, 0.0) is not None
+
+    def prefetch_page(self, api_key: str, page: PageEntry, suggestions: bool = True) -> int:
+        """
+        Start prefetching the summary (and suggestions) of a page in the background.
+
+        Args:
+            api_key: The user's Gemini API key, whose quota the calls use.
+            page: The registered or resolved webpage.
+            suggestions: Whether to prefetch the suggestions too.
+
+        Returns:
+            int: The number of prefetch calls started.
+        """
+        if not self.enabled:
+            return 0
+        if page.page_id is None:
+            page.page_id = compute_page_id(page.content)
+
+        route = model_router.route(TASK_CHAT, page.token_count + estimate_tokens(self.query), api_key)
+        input_text_parts = [f"USER QUERY: {self.query}"]
+        jobs = [(
+            self._summary_key(api_key, route.model, page.page_id),
+            lambda: get_gemini_response(
+                api_key, route.model, input_text_parts, page, None, route.fallbacks, rate_limit_wait=0.0
+            ),
+        )]
+        if suggestions and self.suggestion_count:
+            suggestion_route = model_router.route(TASK_SUGGESTIONS, page.token_count, api_key)
+            count = self.suggestion_count
+            # Generated with the same arguments as a first /suggest-questions request, so it hits the suggestion cache
+            jobs.append((
+                ("suggestions", hash_api_key(api_key), suggestion_route.model, page.page_id, count),
+                lambda: generate_question_suggestions(
+                    api_key,
+                    suggestion_route.model,
+                    page.content,
+                    count,
+                    [],
+                    False,
+                    suggestion_route.fallbacks,
+                    rate_limit_wait=0.0,
+                ),
+            ))
+
+        started = 0
+        for key, call in jobs:
+            if key in self._in_flight or self.cache.get(key) is not None:
+                continue
+            if len(self._in_flight) >= self.concurrency:
+                self.skipped["concurrency"] += 1
+                continue
+            if not self._take_budget(api_key):
+                self.skipped["budget"] += 1
+                continue
+            self._start(key, api_key, call)
+            started += 1
+        return started
+
+    def _start(self, key: Hashable, api_key: str, call: Callable[[], Awaitable[Any]]) -> None:
+        async def run() -> Optional[Any]:
+            try:
+                # The call takes a rate limit slot only if one is free right away,
+                # so it never queues behind (or ahead of) the user's own requests
+                value = await call()
+            except RateLimitExceeded:
+                self.skipped["rate"] += 1
+                return None
+            except Exception as e:
+                self.failed += 1
+                logger.warning(f"Prefetch failed: {type(e).__name__}")
+                return None
+            self.completed += 1
+            # Suggestions are kept by the suggestion cache; only remember they're done
+            self.cache.set(key, value if key[0] == "summary" else True)
+            return value
+
+        self.started += 1
+        task = asyncio.ensure_future(run())
+        self._in_flight[key] = task
+        # Keep a reference so the task isn't garbage collected mid-flight
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+
+    async def get_summary(self, api_key: str, model: str, page: PageEntry, query: str) -> Optional[str]:
+        """
+        Get the prefetched answer to a chat query, waiting for a prefetch in flight.
+
+        Args:
+            api_key: The user's Gemini API key (only its own prefetches are served).
+            model: The model the chat request was routed to.
+            page: The webpage the query is about.
+            query: The user's query.
+
+        Returns:
+            Optional[str]: The answer, or None if the query isn't the
+            prefetched one or nothing was prefetched for the page.
+        """
+        if not self.enabled or not self.matches(query):
+            return None
+        page_id = page.page_id if page.page_id is not None else compute_page_id(page.content)
+        key = self._summary_key(api_key, model, page_id)
+
+        cached = self.cache.get(key)
+        if cached is not None:
+            self.served += 1
+            return cached[0]
+        task = self._in_flight.get(key)
+        if task is None:
+            return None
+        # Shielded: a cancelled chat request leaves the prefetch running for the next one
+        text = await asyncio.shield(task)
+        if text is not None:
+            self.served += 1
+        return text
+
+    async def stop(self) -> None:
+        """
+        Cancel the prefetches still running at shutdown.
+        """
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> Dict[str, object]:
+        """
+        Get the prefetch counters.
+
+        Returns:
+            dict: Started, completed, failed and in-flight prefetches,
+            skipped ones by reason, summaries served, and the cache counters.
+        """
+        return {
+            "enabled": self.enabled,
+            "started": self.started,
+            "completed": self.completed,
+            "failed": self.failed,
+            "in_flight": len(self._in_flight),
+            "skipped": dict(self.skipped),
+            "served": self.served,
+            "cache": self.cache.stats(),
+        }
+
+# Process-wide prefetcher (prefetched summaries shared across workers with a shared cache backend)
+prefetcher = Prefetcher(
+    enabled=settings.PREFETCH_ENABLED,
+    query=settings.PREFETCH_QUERY,
+    suggestion_count=settings.PREFETCH_SUGGESTION_COUNT,
+    max_entries=settings.PREFETCH_CACHE_SIZE,
+    ttl=settings.PREFETCH_TTL,
+    budget=settings.PREFETCH_BUDGET,
+    budget_window=settings.PREFETCH_BUDGET_WINDOW,
+    concurrency=settings.PREFETCH_CONCURRENCY,
+    backend=shared_backend,
+)
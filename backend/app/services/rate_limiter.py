@@ -0,0 +1,381 @@
+import asyncio
+import time
+from collections import OrderedDict, deque
+from typing import Awaitable, Callable, Deque, Dict, Optional
+from app.core.config import settings
+from app.core.security import hash_api_key
+from app.services.cache_backend import CacheBackend, shared_backend
+
+class RateLimitExceeded(Exception):
+    """
+    Raised when a request can't get an upstream slot within the allowed wait.
+    """
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(f"Rate limit exceeded ({reason}), retry after {retry_after:.1f}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+class TokenBucket:
+    """
+    Token bucket refilled at `rate` tokens per second, holding up to `burst`.
+
+    Tokens are reserved ahead of time: a caller that takes a token while the
+    bucket is empty is told how long to wait for it, so queued callers are
+    spaced out at the refill rate instead of all waking at once.
+    """
+    __slots__ = ("rate", "burst", "tokens", "updated_at")
+
+    def __init__(self, rate: float, burst: float, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated_at = now
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def reserve(self, now: float, max_wait: float) -> Optional[float]:
+        """
+        Take a token, possibly one that only becomes available later.
+
+        Args:
+            now: The current time.
+            max_wait: The longest the caller is willing to wait for the token.
+
+        Returns:
+            Optional[float]: Seconds to wait before using the token, or None
+            if it wouldn't be available within max_wait (nothing is taken).
+        """
+        self._refill(now)
+        wait = max(0.0, (1 - self.tokens) / self.rate)
+        if wait > max_wait:
+            return None
+        self.tokens -= 1
+        return wait
+
+    def time_until_token(self, now: float) -> float:
+        """
+        Seconds until a token will be available.
+        """
+        self._refill(now)
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+    def drain(self, now: float) -> None:
+        """
+        Empty the bucket, e.g. after upstream reported a quota error.
+        """
+        self._refill(now)
+        self.tokens = min(self.tokens, 0.0)
+
+class ConcurrencyLimit:
+    """
+    Counting semaphore whose limit can change while it is in use.
+
+    Waiters are served first come, first served. Futures are created per
+    wait on the running loop, so one instance works across event loops.
+    """
+
+    def __init__(self, limit: float):
+        self.limit = limit
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    def _has_room(self) -> bool:
+        return self.in_flight < max(1, int(self.limit))
+
+    async def acquire(self, timeout: float) -> bool:
+        """
+        Take a slot, waiting up to `timeout` seconds for one.
+
+        Returns:
+            bool: True if a slot was taken.
+        """
+        # Drop waiters that timed out or were cancelled
+        while self._waiters and self._waiters[0].done():
+            self._waiters.popleft()
+        if self._has_room() and not self._waiters:
+            self.in_flight += 1
+            return True
+        if timeout <= 0:
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout)
+        except asyncio.TimeoutError:
+            if not waiter.done():
+                waiter.cancel()
+                return False
+            # Woken just as the wait timed out; the slot is ours
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Pass the slot we were handed on to the next waiter
+                self.release()
+            else:
+                waiter.cancel()
+            raise
+        return True
+
+    def release(self) -> None:
+        """
+        Free a slot, handing it to the first live waiter.
+        """
+        self.in_flight -= 1
+        self.wake()
+
+    def wake(self) -> None:
+        """
+        Hand free slots to waiters (e.g. after the limit was raised).
+        """
+        while self._waiters and self._has_room():
+            waiter = self._waiters.popleft()
+            if waiter.done():
+                continue
+            self.in_flight += 1
+            waiter.get_loop().call_soon_threadsafe(self._resolve, waiter)
+
+    @staticmethod
+    def _resolve(waiter: asyncio.Future) -> None:
+        if not waiter.done():
+            waiter.set_result(None)
+
+class KeyState:
+    """
+    Rate limit state of one API key: its token bucket and adaptive concurrency.
+    """
+    __slots__ = ("bucket", "concurrency", "quota_errors", "last_decrease")
+
+    def __init__(self, bucket: TokenBucket, concurrency: ConcurrencyLimit):
+        self.bucket = bucket
+        self.concurrency = concurrency
+        self.quota_errors = 0
+        self.last_decrease = float("-inf")
+
+class Permit:
+    """
+    An upstream slot held by one request. Release it exactly once when done;
+    further releases are ignored.
+    """
+    __slots__ = ("_limiter", "_state", "_quota_errors", "_released")
+
+    def __init__(self, limiter: "RateLimiter", state: Optional[KeyState]):
+        self._limiter = limiter
+        self._state = state
+        self._quota_errors = state.quota_errors if state is not None else 0
+        self._released = False
+
+    def release(self) -> None:
+        if self._released:
+            return
+        self._released = True
+        self._limiter._release(self._state, self._quota_errors)
+
+class RateLimiter:
+    """
+    Per-API-key rate limiting with adaptive upstream concurrency.
+
+    Each key hash gets a token bucket (`rate` requests per second, bursts of
+    `burst`) and a concurrency limit adjusted AIMD-style: every request that
+    completes without a quota error raises it by 1/limit (about +1 per round
+    of requests), and a quota error from upstream halves it (at most once per
+    `decrease_interval`) and empties the bucket. A per-worker limit caps
+    upstream calls across all keys.
+
+    Requests wait up to `max_wait` seconds in total for a token and slots;
+    if they can't get them in time, RateLimitExceeded tells them when to
+    retry instead.
+
+    With a shared `buckets` backend the token buckets live there, so a key's
+    rate holds across all workers (reserved in a worker thread, as that means
+    waiting for other workers); concurrency limits stay per worker.
+    """
+
+    def __init__(
+        self,
+        rate: float = 5.0,
+        burst: float = 20.0,
+        max_wait: float = 10.0,
+        initial_concurrency: float = 8.0,
+        min_concurrency: float = 1.0,
+        max_concurrency: float = 32.0,
+        global_concurrency: int = 128,
+        decrease_factor: float = 0.5,
+        decrease_interval: float = 1.0,
+        max_keys: int = 10000,
+        enabled: bool = True,
+        buckets: Optional[CacheBackend] = None,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], Awaitable[None]] = asyncio.sleep,
+    ):
+        self.enabled = enabled
+        self.buckets = buckets
+        self.rate = rate
+        self.burst = burst
+        self.max_wait = max_wait
+        self.initial_concurrency = initial_concurrency
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.decrease_factor = decrease_factor
+        self.decrease_interval = decrease_interval
+        self.max_keys = max_keys
+        self.clock = clock
+        self.sleep = sleep
+        self.global_limit = ConcurrencyLimit(global_concurrency)
+        self._keys: "OrderedDict[str, KeyState]" = OrderedDict()
+        self.admitted = 0
+        self.queued = 0
+        self.rejected: Dict[str, int] = {"rate": 0, "key_concurrency": 0, "global_concurrency": 0}
+        self.decreases = 0
+
+    def _state(self, api_key: str) -> KeyState:
+        key_hash = hash_api_key(api_key)
+        state = self._keys.get(key_hash)
+        if state is None:
+            state = KeyState(
+                TokenBucket(self.rate, self.burst, self.clock()), ConcurrencyLimit(self.initial_concurrency)
+            )
+            self._keys[key_hash] = state
+            # Forget the least recently used idle keys beyond the bound
+            while len(self._keys) > self.max_keys:
+                oldest_hash, oldest = next(iter(self._keys.items()))
+                if oldest.concurrency.in_flight:
+                    break
+                del self._keys[oldest_hash]
+        else:
+            self._keys.move_to_end(key_hash)
+        return state
+
+    async def acquire(self, api_key: str, max_wait: Optional[float] = None) -> Permit:
+        """
+        Wait for a token and an upstream slot for the key.
+
+        Args:
+            api_key: The user's Gemini API key (only its hash is kept).
+            max_wait: Seconds to wait at most, instead of the limiter's
+                max_wait (0 to only take a slot that is free right away).
+
+        Returns:
+            Permit: The slot; release it when the upstream work is done.
+
+        Raises:
+            RateLimitExceeded: If no slot can be had within max_wait.
+        """
+        if not self.enabled:
+            return Permit(self, None)
+
+        if max_wait is None:
+            max_wait = self.max_wait
+        state = self._state(api_key)
+        start = self.clock()
+        if self.buckets is not None:
+            bucket_key = ("rate", hash_api_key(api_key))
+            if self.buckets.shared:
+                # A shared bucket is a locked file transaction; keep it off the event loop
+                wait, until_token = await asyncio.to_thread(
+                    self.buckets.reserve_token, bucket_key, self.rate, self.burst, max_wait
+                )
+            else:
+                wait, until_token = self.buckets.reserve_token(bucket_key, self.rate, self.burst, max_wait)
+        else:
+            wait = state.bucket.reserve(start, max_wait)
+            until_token = state.bucket.time_until_token(start) if wait is None else 0.0
+        if wait is None:
+            self.rejected["rate"] += 1
+            raise RateLimitExceeded("rate", until_token)
+        if wait > 0:
+            self.queued += 1
+            await self.sleep(wait)
+
+        remaining = max_wait - (self.clock() - start)
+        if not await state.concurrency.acquire(remaining):
+            self.rejected["key_concurrency"] += 1
+            raise RateLimitExceeded("key_concurrency", 1.0)
+
+        remaining = max_wait - (self.clock() - start)
+        try:
+            acquired = await self.global_limit.acquire(remaining)
+        except BaseException:
+            state.concurrency.release()
+            raise
+        if not acquired:
+            state.concurrency.release()
+            self.rejected["global_concurrency"] += 1
+            raise RateLimitExceeded("global_concurrency", 1.0)
+
+        self.admitted += 1
+        return Permit(self, state)
+
+    def _release(self, state: Optional[KeyState], quota_errors_at_acquire: int) -> None:
+        if state is None:
+            return
+        self.global_limit.release()
+        concurrency = state.concurrency
+        if state.quota_errors == quota_errors_at_acquire:
+            # Additive increase: about +1 after a full limit's worth of successes
+            concurrency.limit = min(self.max_concurrency, concurrency.limit + 1 / concurrency.limit)
+        concurrency.release()
+
+    def record_quota_error(self, api_key: str) -> None:
+        """
+        Back off a key after upstream rejected one of its calls for quota.
+
+        Args:
+            api_key: The user's Gemini API key.
+        """
+        if not self.enabled:
+            return
+        state = self._state(api_key)
+        state.quota_errors += 1
+        now = self.clock()
+        if self.buckets is not None:
+            self.buckets.drain_tokens(("rate", hash_api_key(api_key)), self.rate, self.burst)
+        else:
+            state.bucket.drain(now)
+        # Calls in flight together tend to fail together; decrease once for them
+        if now - state.last_decrease >= self.decrease_interval:
+            state.last_decrease = now
+            state.concurrency.limit = max(self.min_concurrency, state.concurrency.limit * self.decrease_factor)
+            self.decreases += 1
+
+    def reset(self) -> None:
+        """
+        Forget the state of every key (in this worker).
+        """
+        self._keys.clear()
+
+    def stats(self) -> Dict[str, object]:
+        """
+        Get the limiter counters.
+
+        Returns:
+            dict: Tracked keys, admissions, queued and rejected requests,
+            multiplicative decreases and global slots in use.
+        """
+        return {
+            "enabled": self.enabled,
+            "shared_buckets": self.buckets is not None,
+            "keys": len(self._keys),
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "rejected": dict(self.rejected),
+            "decreases": self.decreases,
+            "global_in_flight": self.global_limit.in_flight,
+            "global_limit": self.global_limit.limit,
+        }
+
+# Process-wide rate limiter (rates shared across workers with a shared cache backend)
+rate_limiter = RateLimiter(
+    rate=settings.RATE_LIMIT_RPS,
+    burst=settings.RATE_LIMIT_BURST,
+    max_wait=settings.RATE_LIMIT_MAX_WAIT,
+    initial_concurrency=settings.KEY_CONCURRENCY_INITIAL,
+    min_concurrency=settings.KEY_CONCURRENCY_MIN,
+    max_concurrency=settings.KEY_CONCURRENCY_MAX,
+    global_concurrency=settings.GLOBAL_UPSTREAM_CONCURRENCY,
+    max_keys=settings.RATE_LIMIT_MAX_KEYS,
+    enabled=settings.RATE_LIMIT_ENABLED,
+    buckets=shared_backend,
+)
@@ -0,0 +1,138 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Set, Tuple
+from app.services.cache_backend import CacheBackend, MemoryCacheBackend
+
+logger = logging.getLogger(__name__)
+
+class ResponseCache:
+    """
+    TTL + LRU cache for upstream responses, with optional stale-while-revalidate.
+
+    Entries are fresh for `ttl` seconds. With `stale_ttl` > 0 an expired
+    entry is still served for up to `stale_ttl` more seconds while a single
+    background refresh replaces it. Values rejected by `cacheable` (e.g.
+    placeholder results returned on errors) are never stored, so they can't
+    overwrite a real result.
+
+    Entries are kept in `backend`, under `namespace`: by default an LRU dict
+    of `max_entries` in this worker, or a shared backend so all workers see
+    the same entries (keys and values must then be JSON-serializable).
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl: float = 600.0,
+        stale_ttl: float = 0.0,
+        cacheable: Callable[[Any], bool] = lambda value: True,
+        clock: Optional[Callable[[], float]] = None,
+        backend: Optional[CacheBackend] = None,
+        namespace: str = "responses",
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.cacheable = cacheable
+        self.backend = backend if backend is not None else MemoryCacheBackend(max_entries)
+        self.namespace = namespace
+        # Other workers compare timestamps of shared entries, so those need wall-clock time
+        self.clock = clock or (time.time if self.backend.shared else time.monotonic)
+        self._refreshing: Set[Hashable] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.rejected = 0
+
+    def get(self, key: Hashable) -> Optional[Tuple[Any, bool]]:
+        """
+        Look up a cached value.
+
+        Args:
+            key: The cache key.
+
+        Returns:
+            Optional[Tuple[Any, bool]]: The value and whether it is stale, or
+            None if there is no usable entry.
+        """
+        entry = self.backend.get((self.namespace, key))
+        if entry is None:
+            self.misses += 1
+            return None
+
+        value, stored_at = entry
+        age = self.clock() - stored_at
+        if age <= self.ttl:
+            self.hits += 1
+            return value, False
+        if age <= self.ttl + self.stale_ttl:
+            self.stale_hits += 1
+            return value, True
+
+        self.backend.delete((self.namespace, key))
+        self.misses += 1
+        return None
+
+    def set(self, key: Hashable, value: Any) -> bool:
+        """
+        Store a value unless it is rejected by `cacheable`.
+
+        Returns:
+            bool: True if the value was stored.
+        """
+        if not self.cacheable(value):
+            self.rejected += 1
+            return False
+        # The backend drops the entry once it can no longer be served, even stale
+        self.backend.set((self.namespace, key), (value, self.clock()), self.ttl + self.stale_ttl)
+        return True
+
+    def refresh_in_background(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> bool:
+        """
+        Start a background refresh for a stale key, unless one is running.
+
+        Args:
+            key: The cache key to refresh.
+            func: Produces the fresh value.
+
+        Returns:
+            bool: True if a refresh was started.
+        """
+        if key in self._refreshing:
+            return False
+        self._refreshing.add(key)
+        self.refreshes += 1
+
+        async def refresh():
+            try:
+                self.set(key, await func())
+            except Exception as e:
+                logger.warning(f"Background cache refresh failed: {type(e).__name__}")
+            finally:
+                self._refreshing.discard(key)
+
+        # Keep a reference so the task isn't garbage collected mid-flight
+        task = asyncio.ensure_future(refresh())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return True
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get the cache counters.
+
+        Returns:
+            dict: Entry count and hit/stale/miss/refresh/rejection counts
+            (the entry count covers the whole backend when it is shared).
+        """
+        return {
+            "entries": self.backend.size(),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "refreshes": self.refreshes,
+            "rejected": self.rejected,
+        }
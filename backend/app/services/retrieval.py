@@ -0,0 +1,269 @@
+from __future__ import annotations
+
+import asyncio
+import re
+from collections import Counter, OrderedDict
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+from app.core.config import settings
+from app.core.lazy_import import lazy_module
+from app.services.page_store import PageEntry, compute_page_id, utf8_size
+from app.services.token_estimator import estimate_tokens, estimate_tokens_async
+
+if TYPE_CHECKING:
+    import numpy as np
+else:
+    np = lazy_module("numpy")
+
+# Words used for BM25 matching (lowercased before indexing)
+_TERM_PATTERN = re.compile(r"\w+")
+
+# Separator placed between non-adjacent excerpts in the prompt
+EXCERPT_SEPARATOR = "\n\n[...]\n\n"
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into lowercase terms for BM25 scoring.
+
+    Args:
+        text: The text to split.
+
+    Returns:
+        List[str]: The terms in order of appearance.
+    """
+    return _TERM_PATTERN.findall(text.lower())
+
+def chunk_text(text: str, chunk_chars: int, overlap_chars: int) -> List[Tuple[int, int]]:
+    """
+    Split text into overlapping chunks, preferring to cut at whitespace.
+
+    Args:
+        text: The text to split.
+        chunk_chars: Maximum chunk length in characters.
+        overlap_chars: Characters shared by consecutive chunks.
+
+    Returns:
+        List[Tuple[int, int]]: (start, end) offsets of each chunk.
+    """
+    chunks = []
+    start = 0
+    length = len(text)
+    while start < length:
+        end = min(start + chunk_chars, length)
+        if end < length:
+            # Cut at the last paragraph break or space in the final fifth of the chunk
+            floor = start + chunk_chars * 4 // 5
+            cut = text.rfind("\n", floor, end)
+            if cut == -1:
+                cut = text.rfind(" ", floor, end)
+            if cut != -1:
+                end = cut + 1
+        chunks.append((start, end))
+        if end >= length:
+            break
+        start = max(end - overlap_chars, start + 1)
+    return chunks
+
+class BM25Index:
+    """
+    In-memory BM25 index over the chunks of one webpage.
+
+    The inverted index maps each term to NumPy arrays of chunk ids and term
+    frequencies, so scoring a query is a few vectorized operations per term.
+    """
+
+    def __init__(self, text: str, chunk_chars: int, overlap_chars: int, k1: float = 1.5, b: float = 0.75):
+        self.text = text
+        self.k1 = k1
+        self.b = b
+        self.chunks = chunk_text(text, chunk_chars, overlap_chars)
+        self.chunk_tokens = np.array(
+            [estimate_tokens(text[start:end]) for start, end in self.chunks], dtype=np.int64
+        )
+
+        postings: Dict[str, Tuple[List[int], List[int]]] = {}
+        lengths = np.zeros(len(self.chunks), dtype=np.float64)
+        for chunk_id, (start, end) in enumerate(self.chunks):
+            terms = Counter(tokenize(text[start:end]))
+            lengths[chunk_id] = sum(terms.values())
+            for term, tf in terms.items():
+                ids, tfs = postings.setdefault(term, ([], []))
+                ids.append(chunk_id)
+                tfs.append(tf)
+
+        self.lengths = lengths
+        self.avg_length = float(lengths.mean()) if len(lengths) and lengths.mean() > 0 else 1.0
+        n = len(self.chunks)
+        self.postings = {}
+        for term, (ids, tfs) in postings.items():
+            df = len(ids)
+            idf = np.log(1.0 + (n - df + 0.5) / (df + 0.5))
+            self.postings[term] = (np.array(ids, dtype=np.int64), np.array(tfs, dtype=np.float64), idf)
+
+    def score(self, query: str) -> np.ndarray:
+        """
+        Score every chunk against a query.
+
+        Args:
+            query: The user's query.
+
+        Returns:
+            np.ndarray: One BM25 score per chunk.
+        """
+        scores = np.zeros(len(self.chunks), dtype=np.float64)
+        norms = self.k1 * (1.0 - self.b + self.b * self.lengths / self.avg_length)
+        for term in set(tokenize(query)):
+            posting = self.postings.get(term)
+            if posting is None:
+                continue
+            ids, tfs, idf = posting
+            # Chunk ids are unique within a posting list, so direct indexing is safe
+            scores[ids] += idf * tfs * (self.k1 + 1.0) / (tfs + norms[ids])
+        return scores
+
+    def select(self, query: str, token_budget: int, top_k: int) -> Tuple[str, int]:
+        """
+        Build the prompt context from the best chunks within a token budget.
+
+        Chunks are taken in score order (ties keep document order) until the
+        budget or top_k is reached, then emitted in document order with
+        separators between non-adjacent chunks.
+
+        Args:
+            query: The user's query.
+            token_budget: Maximum tokens of page content to include.
+            top_k: Maximum number of chunks to include.
+
+        Returns:
+            Tuple[str, int]: The selected content and its estimated token count.
+        """
+        scores = self.score(query)
+        order = np.argsort(-scores, kind="stable")
+        selected = []
+        used = 0
+        for chunk_id in order[:top_k]:
+            cost = int(self.chunk_tokens[chunk_id])
+            if used + cost > token_budget:
+                continue
+            selected.append(int(chunk_id))
+            used += cost
+
+        pieces = []
+        previous_end = None
+        for chunk_id in sorted(selected):
+            start, end = self.chunks[chunk_id]
+            if previous_end is not None:
+                if start > previous_end:
+                    pieces.append(EXCERPT_SEPARATOR)
+                else:
+                    # Skip the overlap already included from the previous chunk
+                    start = previous_end
+            pieces.append(self.text[start:end])
+            previous_end = end
+        return "".join(pieces), used
+
+class RetrievalIndexCache:
+    """
+    LRU cache of BM25 indexes keyed by page digest, so follow-up questions
+    about the same page skip re-indexing.
+    """
+
+    def __init__(self, max_entries: int = 32):
+        self.max_entries = max_entries
+        self._indexes: "OrderedDict[str, BM25Index]" = OrderedDict()
+        self._pending: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+
+    async def get_index(self, page: PageEntry) -> BM25Index:
+        """
+        Get the index for a page, building it off the event loop on a miss.
+
+        Args:
+            page: The webpage to index.
+
+        Returns:
+            BM25Index: The page's index.
+        """
+        if page.page_id is None:
+            page.page_id = compute_page_id(page.content)
+
+        index = self._indexes.get(page.page_id)
+        if index is not None:
+            self.hits += 1
+            self._indexes.move_to_end(page.page_id)
+            return index
+
+        # Concurrent questions about a new page share one indexing job
+        pending = self._pending.get(page.page_id)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._pending[page.page_id] = future
+        try:
+            index = await asyncio.to_thread(
+                BM25Index, page.content, settings.RETRIEVAL_CHUNK_CHARS, settings.RETRIEVAL_CHUNK_OVERLAP
+            )
+            self._indexes[page.page_id] = index
+            while len(self._indexes) > self.max_entries:
+                self._indexes.popitem(last=False)
+            future.set_result(index)
+            return index
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved when nobody else was waiting
+            future.exception()
+            raise
+        finally:
+            del self._pending[page.page_id]
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get the index cache counters.
+
+        Returns:
+            dict: Index count and hit/miss counts.
+        """
+        return {"indexes": len(self._indexes), "hits": self.hits, "misses": self.misses}
+
+# Process-wide index cache
+retrieval_index_cache = RetrievalIndexCache(max_entries=settings.RETRIEVAL_INDEX_CACHE_SIZE)
+
+async def _within_budget(page: PageEntry, token_budget: int) -> bool:
+    """
+    Whether a page fits the budget, without trusting a count that may be a length-based approximation.
+    """
+    if page.token_count > token_budget:
+        return False
+    # A token covers at least one UTF-8 byte
+    if page.size <= token_budget or page.token_count_checked:
+        return True
+    # Count once in full; registered pages keep the result for their next questions
+    page.token_count = await estimate_tokens_async(page.content)
+    page.token_count_checked = True
+    return page.token_count <= token_budget
+
+async def retrieve_relevant_content(page: PageEntry, query: str, token_budget: Optional[int] = None) -> PageEntry:
+    """
+    Reduce a large page to the chunks most relevant to a query.
+
+    Pages already within the budget are returned unchanged. The count a
+    page carries is checked against the budget before retrieval is skipped,
+    so inline and registered copies of a page are treated alike.
+
+    Args:
+        page: The full webpage.
+        query: The user's query.
+        token_budget: Maximum tokens of page content (defaults to RETRIEVAL_TOKEN_BUDGET).
+
+    Returns:
+        PageEntry: An inline page holding only the selected excerpts.
+    """
+    token_budget = token_budget or settings.RETRIEVAL_TOKEN_BUDGET
+    if await _within_budget(page, token_budget):
+        return page
+
+    index = await retrieval_index_cache.get_index(page)
+    content, token_count = index.select(query, token_budget, settings.RETRIEVAL_TOP_K)
+    return PageEntry(None, content, token_count, utf8_size(content))
@@ -0,0 +1,283 @@
+from __future__ import annotations
+
+import secrets
+import time
+from collections import OrderedDict, deque
+from typing import TYPE_CHECKING, Callable, Deque, Dict, List, Optional
+from app.core.config import settings
+from app.core.lazy_import import lazy_module
+from app.core.security import hash_api_key
+from app.services.cache_backend import CacheBackend, shared_backend
+from app.services.token_estimator import estimate_tokens
+
+if TYPE_CHECKING:
+    from google.genai import types
+else:
+    types = lazy_module("google.genai.types")
+
+# Gemini's name for the assistant role
+MODEL_ROLE = "model"
+USER_ROLE = "user"
+
+class Turn:
+    """
+    One message of a conversation with its token count.
+    """
+    __slots__ = ("role", "text", "tokens")
+
+    def __init__(self, role: str, text: str, tokens: int):
+        self.role = role
+        self.text = text
+        self.tokens = tokens
+
+class Session:
+    """
+    Server-side conversation history for one page chat.
+
+    Turns are kept in a ring buffer capped by a token budget: when a new
+    exchange pushes the total over the budget, the oldest exchanges are
+    dropped and folded into a short extractive summary that is itself capped
+    at `summary_max_chars`.
+    """
+    __slots__ = (
+        "session_id", "key_hash", "page_id", "turns", "token_count",
+        "summary", "token_budget", "summary_max_chars", "last_used",
+    )
+
+    def __init__(self, session_id: str, key_hash: str, page_id: Optional[str], token_budget: int, summary_max_chars: int):
+        self.session_id = session_id
+        self.key_hash = key_hash
+        self.page_id = page_id
+        self.turns: Deque[Turn] = deque()
+        self.token_count = 0
+        self.summary = ""
+        self.token_budget = token_budget
+        self.summary_max_chars = summary_max_chars
+        self.last_used = 0.0
+
+    def add_exchange(self, query: str, answer: str) -> None:
+        """
+        Record a question and its answer, trimming old turns over budget.
+
+        Args:
+            query: The user's question.
+            answer: The model's answer.
+        """
+        for role, text in ((USER_ROLE, query), (MODEL_ROLE, answer)):
+            turn = Turn(role, text, estimate_tokens(text))
+            self.turns.append(turn)
+            self.token_count += turn.tokens
+
+        # Drop whole exchanges so the history always starts with a user turn
+        while self.token_count > self.token_budget and len(self.turns) > 2:
+            for _ in range(2):
+                old = self.turns.popleft()
+                self.token_count -= old.tokens
+                self._summarize(old)
+
+    def _summarize(self, turn: Turn) -> None:
+        # Keep the start of each trimmed message; the newest summary lines win
+        label = "User" if turn.role == USER_ROLE else "Assistant"
+        line = f"{label}: {' '.join(turn.text.split())[:200]}\n"
+        self.summary = (self.summary + line)[-self.summary_max_chars:]
+
+    def to_contents(self) -> List[types.Content]:
+        """
+        Build the multi-turn Gemini contents for the history.
+
+        Returns:
+            List[types.Content]: One content per turn, the summary of trimmed
+            turns (if any) leading the first user turn.
+        """
+        contents = [
+            types.Content(role=turn.role, parts=[types.Part.from_text(text=turn.text)])
+            for turn in self.turns
+        ]
+        if self.summary:
+            summary = types.Part.from_text(text=f"SUMMARY OF EARLIER CONVERSATION:\n{self.summary}\n")
+            if contents:
+                contents[0].parts.insert(0, summary)
+            else:
+                contents.append(types.Content(role=USER_ROLE, parts=[summary]))
+        return contents
+
+    def to_dict(self) -> Dict[str, object]:
+        """
+        Serialize the session for a shared backend.
+        """
+        return {
+            "session_id": self.session_id,
+            "key_hash": self.key_hash,
+            "page_id": self.page_id,
+            "turns": [[turn.role, turn.text, turn.tokens] for turn in self.turns],
+            "token_count": self.token_count,
+            "summary": self.summary,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, object], token_budget: int, summary_max_chars: int) -> "Session":
+        """
+        Rebuild a session serialized with `to_dict`.
+        """
+        session = cls(data["session_id"], data["key_hash"], data["page_id"], token_budget, summary_max_chars)
+        session.turns.extend(Turn(role, text, tokens) for role, text, tokens in data["turns"])
+        session.token_count = data["token_count"]
+        session.summary = data["summary"]
+        return session
+
+    def to_messages(self) -> List[Dict[str, str]]:
+        """
+        Get the history as role/content messages.
+
+        Returns:
+            List[dict]: Messages in the format of the conversation_history field.
+        """
+        messages = [{"role": "user", "content": f"(Earlier conversation)\n{self.summary}"}] if self.summary else []
+        messages.extend(
+            {"role": "user" if turn.role == USER_ROLE else "assistant", "content": turn.text}
+            for turn in self.turns
+        )
+        return messages
+
+class SessionStore:
+    """
+    Bounded registry of conversation sessions.
+
+    Sessions belong to the API key that created them and are evicted
+    least-recently-used first at capacity, or after `idle_ttl` seconds idle.
+
+    With a shared `backend`, sessions live there instead, so every worker
+    can continue them; callers `save` a session after changing it. Two
+    requests of one session answered by different workers at the same time
+    keep only the exchange saved last.
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = 10000,
+        idle_ttl: float = 3600.0,
+        token_budget: int = 8000,
+        summary_max_chars: int = 2000,
+        backend: Optional[CacheBackend] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.token_budget = token_budget
+        self.summary_max_chars = summary_max_chars
+        self.backend = backend
+        self.clock = clock
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self.evictions = 0
+
+    def _evict_idle(self, now: float) -> None:
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if now - session.last_used <= self.idle_ttl:
+                break
+            del self._sessions[session.session_id]
+            self.evictions += 1
+
+    def create(self, user_api_key: str, page_id: Optional[str] = None) -> Session:
+        """
+        Start a new session.
+
+        Args:
+            user_api_key: The user's Gemini API key (only its hash is stored).
+            page_id: Digest of the registered page the session is about (optional).
+
+        Returns:
+            Session: The new session.
+        """
+        now = self.clock()
+        self._evict_idle(now)
+        session = Session(
+            secrets.token_urlsafe(16), hash_api_key(user_api_key), page_id, self.token_budget, self.summary_max_chars
+        )
+        session.last_used = now
+        if self.backend is not None:
+            self.save(session)
+            return session
+        self._sessions[session.session_id] = session
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+            self.evictions += 1
+        return session
+
+    def get(self, session_id: str, user_api_key: str) -> Optional[Session]:
+        """
+        Look up a session owned by the API key.
+
+        Args:
+            session_id: The session id returned at creation.
+            user_api_key: The user's Gemini API key.
+
+        Returns:
+            Optional[Session]: The session, or None if it is unknown, expired
+            or owned by a different API key.
+        """
+        if self.backend is not None:
+            data = self.backend.get(("session", session_id))
+            if data is None or data["key_hash"] != hash_api_key(user_api_key):
+                return None
+            session = Session.from_dict(data, self.token_budget, self.summary_max_chars)
+            # Using the session restarts its idle time
+            self.save(session)
+            return session
+
+        now = self.clock()
+        self._evict_idle(now)
+        session = self._sessions.get(session_id)
+        if session is None or session.key_hash != hash_api_key(user_api_key):
+            return None
+        session.last_used = now
+        self._sessions.move_to_end(session_id)
+        return session
+
+    def save(self, session: Session) -> None:
+        """
+        Store the changes to a session (only needed with a shared backend,
+        where `get` returns a copy).
+
+        Args:
+            session: The changed session.
+        """
+        if self.backend is not None:
+            self.backend.set(("session", session.session_id), session.to_dict(), self.idle_ttl)
+
+    def delete(self, session_id: str, user_api_key: str) -> bool:
+        """
+        Delete a session owned by the API key.
+
+        Returns:
+            bool: True if the session existed and was deleted.
+        """
+        if self.get(session_id, user_api_key) is None:
+            return False
+        if self.backend is not None:
+            return self.backend.delete(("session", session_id))
+        del self._sessions[session_id]
+        return True
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get the session counters.
+
+        Returns:
+            dict: Session count (of this worker, without a shared backend) and evictions.
+        """
+        return {
+            "sessions": len(self._sessions),
+            "max_sessions": self.max_sessions,
+            "evictions": self.evictions,
+            "shared": self.backend is not None,
+        }
+
+# Process-wide session store (shared across workers with a shared cache backend)
+session_store = SessionStore(
+    max_sessions=settings.SESSION_MAX_SESSIONS,
+    idle_ttl=settings.SESSION_IDLE_TTL,
+    token_budget=settings.SESSION_TOKEN_BUDGET,
+    summary_max_chars=settings.SESSION_SUMMARY_MAX_CHARS,
+    backend=shared_backend,
+)
@@ -0,0 +1,82 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable, TypeVar
+
+T = TypeVar("T")
+
+class _Call:
+    """
+    An in-flight upstream call and the number of callers waiting on it.
+    """
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+class SingleFlight:
+    """
+    Coalesce identical concurrent calls into one shared upstream call.
+
+    The first caller for a key starts the call; callers arriving while it is
+    in flight await the same result. A caller that is cancelled (e.g. because
+    its client disconnected) only stops waiting; the shared call is cancelled
+    once no caller is left waiting on it. Nothing is cached after the call
+    completes.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, _Call] = {}
+        self.calls = 0
+        self.shared = 0
+        self.cancelled = 0
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[T]]) -> T:
+        """
+        Run func for a key, or join the call already in flight for it.
+
+        Args:
+            key: Identifies requests whose results are interchangeable.
+            func: Starts the upstream call when no call for the key is in flight.
+
+        Returns:
+            The result of the shared call (exceptions are shared too).
+        """
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.ensure_future(func()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _: self._forget(key, call))
+            self.calls += 1
+        else:
+            self.shared += 1
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        except asyncio.CancelledError:
+            if call.waiters == 1 and not call.task.done():
+                # The last waiter left, so nobody needs the upstream result
+                self._forget(key, call)
+                call.task.cancel()
+                self.cancelled += 1
+            raise
+        finally:
+            call.waiters -= 1
+
+    def _forget(self, key: Hashable, call: _Call) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get the coalescing counters.
+
+        Returns:
+            dict: In-flight, started, shared and cancelled call counts.
+        """
+        return {
+            "in_flight": len(self._calls),
+            "calls": self.calls,
+            "shared": self.shared,
+            "cancelled": self.cancelled,
+        }
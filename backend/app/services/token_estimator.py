@@ -1,22 +1,180 @@
-import tiktoken
+from __future__ import annotations
 
-def estimate_tokens(text: str) -> int:
+import argparse
+import asyncio
+import contextvars
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Optional, Tuple
+from app.core import metrics, tracing
+from app.core.config import settings
+from app.core.lazy_import import lazy_module
+
+if TYPE_CHECKING:
+    import tiktoken
+else:
+    tiktoken = lazy_module("tiktoken")
+
+logger = logging.getLogger(__name__)
+
+# cl100k_base is a good general-purpose tokenizer
+ENCODING_NAME = "cl100k_base"
+
+# Gemini models use approximately 4 characters per token
+CHARS_PER_TOKEN = 4
+
+# Seconds to wait before retrying to load an encoding that failed to load
+ENCODING_RETRY_INTERVAL = 300.0
+
+_encoding: Optional[tiktoken.Encoding] = None
+_encoding_failed_at: Optional[float] = None
+_encoding_lock = threading.Lock()
+_executor: Optional[ThreadPoolExecutor] = None
+
+def get_encoding() -> Optional[tiktoken.Encoding]:
+    """
+    Get the process-wide tiktoken encoding, loading it on first use.
+
+    The BPE file is read from TOKENIZER_CACHE_DIR when set (see `main`), so
+    servers without internet access still get exact counts. A failed load
+    (e.g. the file is missing and cannot be downloaded) is remembered for
+    ENCODING_RETRY_INTERVAL seconds so requests don't retry it every time.
+
+    Returns:
+        Optional[tiktoken.Encoding]: The encoding, or None if it is unavailable.
+    """
+    global _encoding, _encoding_failed_at
+    if _encoding is not None:
+        return _encoding
+
+    with _encoding_lock:
+        if _encoding is not None:
+            return _encoding
+        if _encoding_failed_at is not None and time.monotonic() - _encoding_failed_at < ENCODING_RETRY_INTERVAL:
+            return None
+        try:
+            if settings.TOKENIZER_CACHE_DIR:
+                # tiktoken looks up (and stores) downloaded BPE files here
+                os.environ["TIKTOKEN_CACHE_DIR"] = settings.TOKENIZER_CACHE_DIR
+            _encoding = tiktoken.get_encoding(ENCODING_NAME)
+            _encoding_failed_at = None
+        except Exception as e:
+            _encoding_failed_at = time.monotonic()
+            logger.warning(f"Could not load tiktoken encoding {ENCODING_NAME}, using approximation: {type(e).__name__}")
+        return _encoding
+
+def warm_up() -> bool:
+    """
+    Load the encoding ahead of the first request.
+
+    Returns:
+        bool: True if the encoding is available.
+    """
+    encoding = get_encoding()
+    if encoding is not None:
+        # Encode once so lazily built tokenizer state is ready too
+        encoding.encode_ordinary("warm up")
+    return encoding is not None
+
+def _approximate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN
+
+def estimate_tokens(text: str, limit: Optional[int] = None) -> int:
     """
     Estimate the number of tokens in a text string.
-    
+
+    When a limit is given and the text length alone shows the count is clearly
+    below or above it, a length-based approximation is returned without
+    encoding the text.
+
     Args:
         text: The text to estimate tokens for.
-        
+        limit: Optional token limit the caller compares the result against.
+
     Returns:
         int: The estimated number of tokens.
     """
+    with tracing.span("tokens.estimate", chars=len(text)) as span:
+        start = time.perf_counter()
+        count, method = _estimate_tokens(text, limit)
+        metrics.TOKEN_ESTIMATION_LATENCY.labels(method).observe(time.perf_counter() - start)
+        span.set_attribute("method", method)
+        span.set_attribute("token_count", count)
+    return count
+
+def _estimate_tokens(text: str, limit: Optional[int]) -> Tuple[int, str]:
+    """
+    Estimate tokens for estimate_tokens, naming the method that was used.
+    """
+    if limit is not None:
+        # A token always covers at least one UTF-8 byte, and an ASCII string
+        # has one byte per character, so this is an upper bound on the count
+        upper_bound = len(text) if text.isascii() else len(text) * 4
+        if upper_bound <= limit:
+            return min(upper_bound, _approximate_tokens(text)), "bounded"
+        # Real text almost never averages more characters per token than this
+        if len(text) > limit * settings.TOKEN_ESTIMATE_MAX_CHARS_PER_TOKEN:
+            return max(limit + 1, _approximate_tokens(text)), "bounded"
+
+    encoding = get_encoding()
+    if encoding is None:
+        # Fallback to a simple approximation if tiktoken is unavailable
+        return _approximate_tokens(text), "approximate"
+
     try:
-        # Use tiktoken to estimate token count
-        # cl100k_base is a good general-purpose tokenizer
-        encoding = tiktoken.get_encoding("cl100k_base")
-        tokens = encoding.encode(text)
-        return len(tokens)
-    except Exception as e:
-        # Fallback to a simple approximation if tiktoken fails
-        # Gemini models use approximately 4 characters per token
-        return len(text) // 4
+        # Special tokens in page text are counted as ordinary text
+        return len(encoding.encode_ordinary(text)), "encode"
+    except Exception:
+        return _approximate_tokens(text), "approximate"
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.TOKEN_ESTIMATE_WORKERS,
+            thread_name_prefix="token-estimator",
+        )
+    return _executor
+
+async def estimate_tokens_async(text: str, limit: Optional[int] = None) -> int:
+    """
+    Estimate tokens without blocking the event loop on large texts.
+
+    Texts longer than TOKEN_ESTIMATE_THREAD_THRESHOLD characters are encoded
+    in a dedicated thread pool; tiktoken releases the GIL while encoding.
+
+    Args:
+        text: The text to estimate tokens for.
+        limit: Optional token limit the caller compares the result against.
+
+    Returns:
+        int: The estimated number of tokens.
+    """
+    if len(text) < settings.TOKEN_ESTIMATE_THREAD_THRESHOLD:
+        return estimate_tokens(text, limit)
+    loop = asyncio.get_running_loop()
+    # Run in a copy of the context, so the estimate's span joins the request's trace
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(_get_executor(), context.run, estimate_tokens, text, limit)
+
+def main() -> None:
+    """
+    Download the tokenizer's BPE file into a cache directory, e.g. while
+    building an image, so that servers with TOKENIZER_CACHE_DIR pointing at
+    it start without network access.
+    """
+    parser = argparse.ArgumentParser(description="Fetch the tiktoken encoding into a cache directory")
+    parser.add_argument("--cache-dir", default=settings.TOKENIZER_CACHE_DIR, required=not settings.TOKENIZER_CACHE_DIR)
+    args = parser.parse_args()
+
+    os.makedirs(args.cache_dir, exist_ok=True)
+    os.environ["TIKTOKEN_CACHE_DIR"] = args.cache_dir
+    # Raises if the file can't be downloaded, failing the build instead of the first request
+    tiktoken.get_encoding(ENCODING_NAME)
+    print(f"Cached {ENCODING_NAME} in {args.cache_dir}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+import asyncio
+import logging
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+from app.core.lazy_import import lazy_module_stats, load_lazy_modules
+from app.services.client_pool import client_pool
+from app.services.token_estimator import warm_up as warm_up_token_estimator
+
+logger = logging.getLogger(__name__)
+
+WARMUP_MODES = ("blocking", "background", "off")
+
+class StartupWarmup:
+    """
+    Loads what the first request would otherwise load on its own path.
+
+    The steps run in a worker thread one after another: the tokenizer's BPE
+    file, the modules deferred by `lazy_module`, and the client pool's
+    connection pools and SDK client machinery. A failing step is logged and
+    skipped; the request path loads the same things on demand anyway.
+    """
+
+    def __init__(self, steps: Optional[List[Tuple[str, Callable[[], object]]]] = None):
+        self.steps = steps if steps is not None else [
+            ("tokenizer", warm_up_token_estimator),
+            ("imports", load_lazy_modules),
+            ("client_pool", client_pool.warm_up),
+        ]
+        self.state = "pending"
+        self.durations: Dict[str, float] = {}
+        self.failed: List[str] = []
+        self._task: Optional[asyncio.Task] = None
+
+    async def run(self) -> None:
+        """
+        Run every step, recording how long each took.
+        """
+        self.state = "running"
+        for name, step in self.steps:
+            start = time.perf_counter()
+            try:
+                await asyncio.to_thread(step)
+            except Exception as e:
+                self.failed.append(name)
+                logger.warning(f"Startup warmup step {name} failed: {type(e).__name__}: {e}")
+            self.durations[name] = time.perf_counter() - start
+        self.state = "done"
+        logger.info(f"Startup warmup done in {sum(self.durations.values()):.2f}s")
+
+    async def start(self, mode: str) -> None:
+        """
+        Warm up as configured by STARTUP_WARMUP.
+
+        Args:
+            mode: "blocking" to finish before the server accepts requests,
+                "background" to warm up while it already does, or "off".
+
+        Raises:
+            ValueError: If the mode is unknown.
+        """
+        if mode not in WARMUP_MODES:
+            raise ValueError(f"Unknown STARTUP_WARMUP {mode!r}; use one of {', '.join(WARMUP_MODES)}")
+        if mode == "blocking":
+            await self.run()
+        elif mode == "background":
+            self.state = "running"
+            self._task = asyncio.create_task(self.run())
+        else:
+            self.state = "off"
+
+    async def stop(self) -> None:
+        """
+        Stop a background warmup still running at shutdown (its current step
+        finishes in its thread).
+        """
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def stats(self) -> Dict[str, object]:
+        """
+        Get the warmup progress.
+
+        Returns:
+            dict: State, seconds per finished step, failed steps, and the
+            import seconds of each deferred module loaded so far.
+        """
+        return {
+            "state": self.state,
+            "durations": dict(self.durations),
+            "failed": list(self.failed),
+            "modules": lazy_module_stats(),
+        }
+
+startup_warmup = StartupWarmup()
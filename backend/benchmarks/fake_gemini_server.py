@@ -0,0 +1,268 @@
+# Fake Gemini API server for offline load tests and benchmarks.
+#
+# Speaks enough of the Gemini REST API (generateContent,
+# streamGenerateContent with SSE, cachedContents) for the backend's
+# google-genai client. Point the backend at it with GEMINI_BASE_URL:
+#
+#   python -m benchmarks.fake_gemini_server --port 9100 --latency 0.2
+#   GEMINI_BASE_URL=http://127.0.0.1:9100 uvicorn main:app
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, AsyncIterator, Dict, List, Optional
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+# google.rpc status names of the HTTP statuses errors can be injected with
+STATUS_NAMES = {
+    400: "INVALID_ARGUMENT",
+    401: "UNAUTHENTICATED",
+    403: "PERMISSION_DENIED",
+    404: "NOT_FOUND",
+    429: "RESOURCE_EXHAUSTED",
+    500: "INTERNAL",
+    503: "UNAVAILABLE",
+    504: "DEADLINE_EXCEEDED",
+}
+
+@dataclass
+class FakeGeminiConfig:
+    """
+    Behaviour of the fake server.
+
+    Attributes:
+        latency: Seconds before a non-streaming response is sent.
+        ttft: Seconds before the first chunk of a stream.
+        chunks: Number of chunks a streamed answer is split into.
+        chunk_interval: Seconds between stream chunks.
+        error_rate: Fraction of calls (0-1) answered with an error.
+        error_status: HTTP status of injected errors.
+        answer_words: Words in each answer.
+        seed: Seed for error injection, for repeatable runs.
+    """
+    latency: float = 0.2
+    ttft: float = 0.1
+    chunks: int = 10
+    chunk_interval: float = 0.02
+    error_rate: float = 0.0
+    error_status: int = 503
+    answer_words: int = 60
+    seed: Optional[int] = None
+
+class FakeGemini:
+    """
+    State of a fake Gemini server: its configuration and call counters.
+    """
+
+    def __init__(self, config: Optional[FakeGeminiConfig] = None):
+        self.config = config or FakeGeminiConfig()
+        self.random = random.Random(self.config.seed)
+        self.calls = 0
+        self.stream_calls = 0
+        self.errors = 0
+        self.caches_created = 0
+        self._cache_ids = itertools.count(1)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get the call counters and configuration.
+        """
+        return {
+            "calls": self.calls,
+            "stream_calls": self.stream_calls,
+            "errors": self.errors,
+            "caches_created": self.caches_created,
+            "config": asdict(self.config),
+        }
+
+    def _injected_error(self) -> Optional[JSONResponse]:
+        if self.config.error_rate <= 0 or self.random.random() >= self.config.error_rate:
+            return None
+        self.errors += 1
+        status = self.config.error_status
+        return JSONResponse(
+            {"error": {"code": status, "message": "Injected error", "status": STATUS_NAMES.get(status, "UNKNOWN")}},
+            status_code=status,
+        )
+
+    def _answer_text(self, body: Dict[str, Any]) -> str:
+        """
+        Build the answer in the shape the request's response schema asks for.
+        """
+        words = " ".join(f"word{index}" for index in range(self.config.answer_words))
+        schema = (body.get("generationConfig") or {}).get("responseSchema") or {}
+        schema_type = str(schema.get("type", "")).upper()
+        if schema_type == "ARRAY":
+            return json.dumps([f"Fake question {index}?" for index in range(1, 6)])
+        if schema_type == "OBJECT":
+            return json.dumps({"answer": words, "suggestions": [f"Fake follow-up {index}?" for index in range(1, 4)]})
+        return words
+
+    def _usage(self, body: Dict[str, Any], text: str) -> Dict[str, int]:
+        # Roughly four characters per token, like the backend's approximation
+        prompt_tokens = len(json.dumps(body.get("contents", []))) // 4
+        response_tokens = max(1, len(text) // 4)
+        return {
+            "promptTokenCount": prompt_tokens,
+            "candidatesTokenCount": response_tokens,
+            "totalTokenCount": prompt_tokens + response_tokens,
+        }
+
+    def _response(self, text: str, model: str, usage: Optional[Dict[str, int]]) -> Dict[str, Any]:
+        response = {
+            "candidates": [{"content": {"role": "model", "parts": [{"text": text}]}, "index": 0}],
+            "modelVersion": model,
+        }
+        if usage is not None:
+            response["candidates"][0]["finishReason"] = "STOP"
+            response["usageMetadata"] = usage
+        return response
+
+    async def generate(self, request: Request) -> Response:
+        model, _, method = request.path_params["model_method"].partition(":")
+        body = await request.json()
+        if method == "streamGenerateContent":
+            return await self._stream(model, body)
+        if method != "generateContent":
+            return JSONResponse({"error": {"code": 404, "message": "Unknown method", "status": "NOT_FOUND"}}, 404)
+
+        self.calls += 1
+        await asyncio.sleep(self.config.latency)
+        error = self._injected_error()
+        if error is not None:
+            return error
+        text = self._answer_text(body)
+        return JSONResponse(self._response(text, model, self._usage(body, text)))
+
+    async def _stream(self, model: str, body: Dict[str, Any]) -> Response:
+        self.stream_calls += 1
+        await asyncio.sleep(self.config.ttft)
+        error = self._injected_error()
+        if error is not None:
+            return error
+        text = self._answer_text(body)
+        parts = _split(text, self.config.chunks)
+        usage = self._usage(body, text)
+
+        async def events() -> AsyncIterator[bytes]:
+            for index, part in enumerate(parts):
+                if index:
+                    await asyncio.sleep(self.config.chunk_interval)
+                last = index == len(parts) - 1
+                chunk = self._response(part, model, usage if last else None)
+                yield f"data: {json.dumps(chunk)}\r\n\r\n".encode()
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    async def create_cache(self, request: Request) -> Response:
+        body = await request.json()
+        self.caches_created += 1
+        expire = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(time.time() + 3600))
+        return JSONResponse({
+            "name": f"cachedContents/fake-{next(self._cache_ids)}",
+            "model": body.get("model", ""),
+            "expireTime": expire,
+        })
+
+    async def stats_endpoint(self, request: Request) -> Response:
+        return JSONResponse(self.stats())
+
+def _split(text: str, count: int) -> List[str]:
+    """
+    Split text into `count` consecutive pieces of similar size.
+    """
+    count = max(1, min(count, len(text)))
+    size = -(-len(text) // count)
+    return [text[start:start + size] for start in range(0, len(text), size)]
+
+def create_app(fake: FakeGemini) -> Starlette:
+    """
+    Create the ASGI app of a fake Gemini server.
+    """
+    return Starlette(routes=[
+        Route("/{version}/models/{model_method}", fake.generate, methods=["POST"]),
+        Route("/{version}/cachedContents", fake.create_cache, methods=["POST"]),
+        Route("/stats", fake.stats_endpoint, methods=["GET"]),
+    ])
+
+class FakeGeminiServer:
+    """
+    Runs a fake Gemini server on a local port in a background thread.
+
+    Usage:
+        with FakeGeminiServer(FakeGeminiConfig(latency=0.1)) as server:
+            os.environ["GEMINI_BASE_URL"] = server.url
+    """
+
+    def __init__(self, config: Optional[FakeGeminiConfig] = None, host: str = "127.0.0.1", port: int = 0):
+        self.fake = FakeGemini(config)
+        self.host = host
+        self._server = uvicorn.Server(uvicorn.Config(
+            create_app(self.fake), host=host, port=port, log_level="warning", lifespan="off"
+        ))
+        self._thread: Optional[threading.Thread] = None
+        self.port = port
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def start(self) -> "FakeGeminiServer":
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+        self._thread.start()
+        while not self._server.started:
+            if not self._thread.is_alive():
+                raise RuntimeError("Fake Gemini server failed to start")
+            time.sleep(0.01)
+        # With port 0 the OS picked a free port
+        self.port = self._server.servers[0].sockets[0].getsockname()[1]
+        return self
+
+    def stop(self) -> None:
+        self._server.should_exit = True
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "FakeGeminiServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run a fake Gemini API server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    defaults = FakeGeminiConfig()
+    parser.add_argument("--latency", type=float, default=defaults.latency, help="Seconds per non-streaming call")
+    parser.add_argument("--ttft", type=float, default=defaults.ttft, help="Seconds to the first stream chunk")
+    parser.add_argument("--chunks", type=int, default=defaults.chunks, help="Chunks per streamed answer")
+    parser.add_argument("--chunk-interval", type=float, default=defaults.chunk_interval, help="Seconds between chunks")
+    parser.add_argument("--error-rate", type=float, default=defaults.error_rate, help="Fraction of failing calls")
+    parser.add_argument("--error-status", type=int, default=defaults.error_status, help="HTTP status of failures")
+    parser.add_argument("--answer-words", type=int, default=defaults.answer_words)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    config = FakeGeminiConfig(
+        latency=args.latency,
+        ttft=args.ttft,
+        chunks=args.chunks,
+        chunk_interval=args.chunk_interval,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        answer_words=args.answer_words,
+        seed=args.seed,
+    )
+    uvicorn.run(create_app(FakeGemini(config)), host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
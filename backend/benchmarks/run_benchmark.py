@@ -0,0 +1,359 @@
+# Load test the backend against a fake Gemini server and save the results as JSON.
+#
+# Starts a fake Gemini server and the backend (uvicorn, pointed at the fake
+# with GEMINI_BASE_URL), drives each scenario at a fixed concurrency and
+# reports latency percentiles, throughput and the backend's memory:
+#
+#   python -m benchmarks.run_benchmark --concurrency 32 --requests 500
+#   python -m benchmarks.run_benchmark --compare benchmarks/results/<earlier run>.json
+#
+# Run from the backend directory. Every request uses its own query (and its
+# own page for suggestions), so response caches and request coalescing
+# don't short-circuit the Gemini path.
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+import httpx
+from benchmarks.fake_gemini_server import FakeGeminiConfig, FakeGeminiServer
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+RESULTS_DIR = BACKEND_DIR / "benchmarks" / "results"
+
+SCENARIOS = ("chat", "stream", "suggest")
+
+# Compared by --compare; higher is better only for throughput
+COMPARED_METRICS = ("p50", "p95", "p99", "throughput_rps")
+
+SAMPLE = "The quick brown fox jumps over the lazy dog. Lorem ipsum dolor sit amet, 42! "
+
+def make_page(chars: int) -> str:
+    return (SAMPLE * (chars // len(SAMPLE) + 1))[:chars]
+
+def api_key(worker: int) -> str:
+    # One key per worker, like separate extension users
+    return f"AIzaSyBenchmarkKey_{worker:016d}"
+
+def percentile(values: List[float], fraction: float) -> Optional[float]:
+    """
+    Nearest-rank percentile of the values (None when there are none).
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, math.ceil(fraction * len(ordered)) - 1)
+    return ordered[index]
+
+def summarize(latencies: List[float]) -> Dict[str, Optional[float]]:
+    """
+    Summarize latencies in seconds as p50/p95/p99, mean and max.
+    """
+    return {
+        "p50": percentile(latencies, 0.50),
+        "p95": percentile(latencies, 0.95),
+        "p99": percentile(latencies, 0.99),
+        "mean": sum(latencies) / len(latencies) if latencies else None,
+        "max": max(latencies) if latencies else None,
+    }
+
+def process_memory(pid: int) -> Optional[Dict[str, int]]:
+    """
+    Current and peak resident memory of a process in bytes (Linux only).
+    """
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            fields = dict(line.split(":", 1) for line in status if ":" in line)
+    except OSError:
+        return None
+    # Values are reported in kB
+    return {
+        "rss_bytes": int(fields["VmRSS"].split()[0]) * 1024,
+        "peak_rss_bytes": int(fields["VmHWM"].split()[0]) * 1024,
+    }
+
+async def send_request(client: httpx.AsyncClient, scenario: str, index: int, worker: int, page: str) -> Dict[str, Any]:
+    """
+    Send one request of a scenario and time it.
+
+    Returns:
+        dict: "latency" in seconds, "status", "ok", and "ttft" (seconds to
+        the first delta event) for streams.
+    """
+    key = api_key(worker)
+    start = time.perf_counter()
+    if scenario == "suggest":
+        response = await client.post(
+            "/api/suggest-questions", json={"api_key": key, "webpage_content": f"{page} #{index}", "count": 3}
+        )
+        return {"latency": time.perf_counter() - start, "status": response.status_code, "ok": response.is_success}
+
+    body = {"api_key": key, "webpage_content": page, "query": f"Question {index}?"}
+    if scenario == "chat":
+        response = await client.post("/api/chat", json=body)
+        return {"latency": time.perf_counter() - start, "status": response.status_code, "ok": response.is_success}
+
+    ttft = None
+    ok = False
+    async with client.stream("POST", "/api/chat/stream", json=body) as response:
+        async for line in response.aiter_lines():
+            if line == "event: delta" and ttft is None:
+                ttft = time.perf_counter() - start
+            elif line == "event: done":
+                ok = True
+            elif line == "event: error":
+                ok = False
+    return {
+        "latency": time.perf_counter() - start,
+        "status": response.status_code,
+        "ok": ok and response.is_success,
+        "ttft": ttft,
+    }
+
+async def run_scenario(
+    client: httpx.AsyncClient,
+    scenario: str,
+    requests: int,
+    concurrency: int,
+    page_chars: int = 20000,
+    warmup: int = 0,
+    memory_pid: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Drive a scenario with `concurrency` clients until `requests` requests are done.
+
+    Args:
+        client: Client for the backend (base URL set).
+        scenario: "chat", "stream" or "suggest".
+        requests: Number of timed requests.
+        concurrency: Number of requests in flight at once.
+        page_chars: Size of the webpage content sent with each request.
+        warmup: Untimed requests sent first.
+        memory_pid: Backend process whose memory is sampled (optional).
+
+    Returns:
+        dict: Latency percentiles, throughput, status counts and memory.
+    """
+    page = make_page(page_chars)
+    for index in range(warmup):
+        await send_request(client, scenario, -1 - index, index % concurrency, page)
+
+    results: List[Dict[str, Any]] = []
+    next_index = 0
+    peak_rss = 0
+
+    async def worker(number: int) -> None:
+        nonlocal next_index
+        while next_index < requests:
+            index = next_index
+            next_index += 1
+            try:
+                results.append(await send_request(client, scenario, index, number, page))
+            except httpx.HTTPError as e:
+                results.append({"latency": None, "status": type(e).__name__, "ok": False})
+
+    async def sample_memory() -> None:
+        nonlocal peak_rss
+        while True:
+            memory = process_memory(memory_pid)
+            if memory is not None:
+                peak_rss = max(peak_rss, memory["rss_bytes"])
+            await asyncio.sleep(0.05)
+
+    sampler = asyncio.ensure_future(sample_memory()) if memory_pid is not None else None
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*(worker(number) for number in range(concurrency)))
+    finally:
+        elapsed = time.perf_counter() - start
+        if sampler is not None:
+            sampler.cancel()
+
+    ok = [result for result in results if result["ok"]]
+    statuses: Dict[str, int] = {}
+    for result in results:
+        statuses[str(result["status"])] = statuses.get(str(result["status"]), 0) + 1
+
+    summary = {
+        "requests": len(results),
+        "errors": len(results) - len(ok),
+        "statuses": statuses,
+        "concurrency": concurrency,
+        "elapsed_seconds": elapsed,
+        "throughput_rps": len(ok) / elapsed if elapsed > 0 else None,
+        **summarize([result["latency"] for result in ok]),
+    }
+    if scenario == "stream":
+        summary["ttft"] = summarize([result["ttft"] for result in ok if result["ttft"] is not None])
+    if memory_pid is not None:
+        summary["memory"] = {**(process_memory(memory_pid) or {}), "sampled_peak_rss_bytes": peak_rss}
+    return summary
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def start_backend(port: int, env: Dict[str, str], show_logs: bool = False) -> subprocess.Popen:
+    """
+    Start the backend with uvicorn and wait until it answers.
+    """
+    # The backend logs every upstream call, which would drown the report
+    output = None if show_logs else subprocess.DEVNULL
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env={**os.environ, **env},
+        stdout=output,
+        stderr=output,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Backend exited with status {process.returncode}")
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/", timeout=1).status_code == 200:
+                return process
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError("Backend did not start within 30 seconds")
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any]) -> List[str]:
+    """
+    Describe the change of each scenario's latency and throughput between two runs.
+    """
+    lines = []
+    for scenario, after in current["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(scenario)
+        if before is None:
+            continue
+        for metric in COMPARED_METRICS:
+            old, new = before.get(metric), after.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old * 100
+            lines.append(f"{scenario:8} {metric:15} {old:10.4f} -> {new:10.4f} ({change:+.1f}%)")
+    return lines
+
+async def run(args: argparse.Namespace, base_url: str, backend_pid: Optional[int]) -> Dict[str, Any]:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=args.timeout) as client:
+        return {
+            scenario: await run_scenario(
+                client, scenario, args.requests, args.concurrency, args.page_chars, args.warmup, backend_pid
+            )
+            for scenario in args.scenarios
+        }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the backend against a fake Gemini server.")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=200, help="Timed requests per scenario")
+    parser.add_argument("--warmup", type=int, default=10, help="Untimed requests per scenario")
+    parser.add_argument("--page-chars", type=int, default=20000, help="Webpage content size per request")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Client timeout per request in seconds")
+    parser.add_argument("--target", help="Benchmark a running backend at this URL instead of starting one")
+    parser.add_argument("--output", type=Path, help="Results file (default: benchmarks/results/<time>_<commit>.json)")
+    parser.add_argument("--compare", type=Path, help="Earlier results file to compare against")
+    parser.add_argument("--backend-logs", action="store_true", help="Show the started backend's log output")
+    parser.add_argument(
+        "--env", action="append", default=[], metavar="NAME=VALUE", help="Extra backend setting (repeatable)"
+    )
+    defaults = FakeGeminiConfig()
+    parser.add_argument("--latency", type=float, default=defaults.latency, help="Fake Gemini seconds per call")
+    parser.add_argument("--ttft", type=float, default=defaults.ttft, help="Fake Gemini seconds to the first chunk")
+    parser.add_argument("--chunks", type=int, default=defaults.chunks, help="Fake Gemini chunks per stream")
+    parser.add_argument("--chunk-interval", type=float, default=defaults.chunk_interval)
+    parser.add_argument("--error-rate", type=float, default=defaults.error_rate, help="Fraction of failing calls")
+    parser.add_argument("--error-status", type=int, default=defaults.error_status)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    config = FakeGeminiConfig(
+        latency=args.latency,
+        ttft=args.ttft,
+        chunks=args.chunks,
+        chunk_interval=args.chunk_interval,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        seed=args.seed,
+    )
+    backend_env = {
+        # Measure the backend, not the per-key throttling of a single benchmark client
+        "RATE_LIMIT_ENABLED": "False",
+        **dict(setting.split("=", 1) for setting in args.env),
+    }
+
+    fake = None
+    backend = None
+    try:
+        if args.target:
+            base_url, backend_pid = args.target, None
+        else:
+            fake = FakeGeminiServer(config).start()
+            port = free_port()
+            backend = start_backend(port, {**backend_env, "GEMINI_BASE_URL": fake.url}, args.backend_logs)
+            base_url, backend_pid = f"http://127.0.0.1:{port}", backend.pid
+        scenarios = asyncio.run(run(args, base_url, backend_pid))
+    finally:
+        if backend is not None:
+            backend.terminate()
+            backend.wait()
+        if fake is not None:
+            fake.stop()
+
+    results = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "target": args.target,
+            "backend_env": backend_env if not args.target else None,
+            "page_chars": args.page_chars,
+            "warmup": args.warmup,
+        },
+        "fake_gemini": None if args.target else fake.fake.stats(),
+        "scenarios": scenarios,
+    }
+
+    output = args.output
+    if output is None:
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        output = RESULTS_DIR / f"{stamp}_{results['meta']['commit'] or 'unknown'}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2))
+
+    for scenario, summary in scenarios.items():
+        p50, p95, p99 = (summary[key] * 1000 if summary[key] is not None else math.nan for key in ("p50", "p95", "p99"))
+        print(
+            f"{scenario:8} {summary['requests']:6} requests  {summary['errors']:4} errors  "
+            f"p50 {p50:8.1f} ms  p95 {p95:8.1f} ms  p99 {p99:8.1f} ms  {summary['throughput_rps'] or 0:8.1f} req/s"
+        )
+    if args.compare:
+        print(f"\nCompared with {args.compare}:")
+        for line in compare(json.loads(args.compare.read_text()), results):
+            print(line)
+    print(f"\nResults saved to {output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+# Measure the backend's cold start: import time, and process start to ready
+# and to the first answered request, over several fresh processes.
+#
+#   python -m benchmarks.startup_benchmark --runs 10
+#   python -m benchmarks.startup_benchmark --env STARTUP_WARMUP=background
+#
+# Run from the backend directory. Each run starts a new interpreter, the way
+# an autoscaled or serverless instance does; the first request goes to a
+# fake Gemini server, so it includes the SDK's first-use costs but not the
+# network.
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Optional
+import httpx
+from benchmarks.fake_gemini_server import FakeGeminiConfig, FakeGeminiServer
+from benchmarks.run_benchmark import BACKEND_DIR, RESULTS_DIR, api_key, free_port, git_commit, make_page, summarize
+
+METRICS = ("import", "ready", "first_response", "first_request")
+
+IMPORT_SCRIPT = "import time; start = time.perf_counter(); import main; print(time.perf_counter() - start)"
+
+def measure_import(env: Dict[str, str]) -> float:
+    """
+    Seconds a fresh interpreter takes to import the app.
+    """
+    result = subprocess.run(
+        [sys.executable, "-W", "ignore", "-c", IMPORT_SCRIPT],
+        cwd=BACKEND_DIR,
+        env={**os.environ, **env},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return float(result.stdout.strip().splitlines()[-1])
+
+def measure_start(env: Dict[str, str], page_chars: int, timeout: float = 60.0) -> Dict[str, float]:
+    """
+    Start the backend and time it until it answers, then time its first chat request.
+
+    Returns:
+        dict: Seconds from spawning the process to the first answer of the
+        root endpoint ("ready") and to the first chat response
+        ("first_response"), and that request's own latency ("first_request").
+    """
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env={**os.environ, **env},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        with httpx.Client(base_url=base_url, timeout=timeout) as client:
+            ready = None
+            while ready is None:
+                if process.poll() is not None:
+                    raise RuntimeError(f"Backend exited with status {process.returncode}")
+                if time.perf_counter() - start > timeout:
+                    raise RuntimeError(f"Backend did not start within {timeout:.0f} seconds")
+                try:
+                    if client.get("/").status_code == 200:
+                        ready = time.perf_counter() - start
+                except httpx.TransportError:
+                    time.sleep(0.005)
+
+            request_start = time.perf_counter()
+            response = client.post(
+                "/api/chat",
+                json={"api_key": api_key(0), "webpage_content": make_page(page_chars), "query": "What is this page about?"},
+            )
+            response.raise_for_status()
+            done = time.perf_counter()
+    finally:
+        process.terminate()
+        process.wait()
+    return {"ready": ready, "first_response": done - start, "first_request": done - request_start}
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure the backend's cold start time.")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh processes to measure")
+    parser.add_argument("--page-chars", type=int, default=20000, help="Webpage content size of the first request")
+    parser.add_argument("--output", type=Path, help="Results file (default: benchmarks/results/<time>_<commit>_startup.json)")
+    parser.add_argument(
+        "--env", action="append", default=[], metavar="NAME=VALUE", help="Extra backend setting (repeatable)"
+    )
+    args = parser.parse_args()
+
+    backend_env = {"RATE_LIMIT_ENABLED": "False", **dict(setting.split("=", 1) for setting in args.env)}
+    samples = {metric: [] for metric in METRICS}
+    fake = FakeGeminiServer(FakeGeminiConfig(latency=0.0, ttft=0.0)).start()
+    try:
+        env = {**backend_env, "GEMINI_BASE_URL": fake.url}
+        for run in range(args.runs):
+            samples["import"].append(measure_import(env))
+            for metric, value in measure_start(env, args.page_chars).items():
+                samples[metric].append(value)
+            print(
+                f"run {run + 1}/{args.runs}: "
+                + "  ".join(f"{metric} {samples[metric][-1] * 1000:7.1f} ms" for metric in METRICS)
+            )
+    finally:
+        fake.stop()
+
+    results = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "backend_env": backend_env,
+            "runs": args.runs,
+            "page_chars": args.page_chars,
+        },
+        "startup": {metric: {**summarize(values), "samples": values} for metric, values in samples.items()},
+    }
+
+    output: Optional[Path] = args.output
+    if output is None:
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        output = RESULTS_DIR / f"{stamp}_{results['meta']['commit'] or 'unknown'}_startup.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2))
+
+    print()
+    for metric in METRICS:
+        summary = results["startup"][metric]
+        print(f"{metric:15} p50 {summary['p50'] * 1000:8.1f} ms  max {summary['max'] * 1000:8.1f} ms")
+    print(f"\nResults saved to {output}")
+
+if __name__ == "__main__":
+    main()
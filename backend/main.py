@@ -1,15 +1,57 @@
-import uvicorn
-from fastapi import FastAPI
+import logging
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
-from app.api.routes import router as api_router
+from prometheus_client import CONTENT_TYPE_LATEST
+from app.api.routes import STATS_SOURCES, TOKENS_SAVED_HEADER, gemini_error_handler, router as api_router
 from app.core.config import settings
+from app.core.metrics import MetricsMiddleware, register_stats, render_metrics
+from app.core.request_body import RequestBodyMiddleware
+from app.core.tracing import setup_tracing, shutdown_tracing
+from app.services.cache_backend import shared_backend
+from app.services.client_pool import client_pool
+from app.services.gemini_errors import GeminiError
+from app.services.prefetch import prefetcher
+from app.services.warmup import startup_warmup
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Manage application startup and shutdown.
+    """
+    # Load the tokenizer, deferred modules and client pool before the first request needs them
+    await startup_warmup.start(settings.STARTUP_WARMUP)
+    # Export trace spans if TRACING_ENABLED is set
+    setup_tracing()
+    yield
+    # Stop a background warmup that is still running
+    await startup_warmup.stop()
+    # Speculative work isn't worth waiting for
+    await prefetcher.stop()
+    # Open streams have already finished or been cut off by the server's graceful shutdown
+    # Close pooled Gemini clients and their shared connections
+    await client_pool.aclose()
+    if shared_backend is not None:
+        shared_backend.close()
+    # Flush the spans still queued for export
+    shutdown_tracing()
 
 app = FastAPI(
     title=settings.API_TITLE,
     description=settings.API_DESCRIPTION,
     version=settings.API_VERSION,
+    lifespan=lifespan,
 )
 
+# Time requests by endpoint and status (innermost, so the matched endpoint is known)
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+    register_stats(STATS_SOURCES)
+
+# Reject oversized bodies early and decode compressed ones
+# (added before CORS so that error responses still carry CORS headers)
+app.add_middleware(RequestBodyMiddleware, max_body_bytes=settings.MAX_REQUEST_BODY_BYTES)
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -17,20 +59,44 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[TOKENS_SAVED_HEADER, "Retry-After"],
 )
 
 # Include API routes
 app.include_router(api_router, prefix="/api")
 
+# Answer failed Gemini calls with the status of their kind (401, 429, 503, ...)
+app.add_exception_handler(GeminiError, gemini_error_handler)
+
 # Root endpoint
 @app.get("/")
 async def root():
     return {"message": "Welcome to WebPage Chatter API", "status": "active"}
 
+# Prometheus metrics endpoint
+if settings.METRICS_ENABLED:
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        return Response(render_metrics(), media_type=CONTENT_TYPE_LATEST)
+
 if __name__ == "__main__":
+    # Only needed to run the server from here, so importing the app skips it
+    import uvicorn
+
+    if settings.WORKERS > 1 and settings.CACHE_BACKEND == "memory" and not settings.DEBUG:
+        logging.getLogger(__name__).warning(
+            "Running %d workers with CACHE_BACKEND=memory: caches, rate limits, registered pages and sessions "
+            "are per worker, so requests by page_id or session_id fail on the other workers. "
+            "Use CACHE_BACKEND=sqlite to share them",
+            settings.WORKERS,
+        )
     uvicorn.run(
         "main:app",
         host=settings.HOST,
         port=settings.PORT,
-        reload=settings.DEBUG
+        reload=settings.DEBUG,
+        # Reloading runs a single process
+        workers=1 if settings.DEBUG else settings.WORKERS,
+        # On SIGTERM, stop accepting connections and let open requests and streams finish
+        timeout_graceful_shutdown=settings.SHUTDOWN_TIMEOUT,
     )
@@ -0,0 +1,21 @@
+import os
+import pytest
+from app.services.rate_limiter import rate_limiter
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "bench: timing and memory benchmarks, only run with RUN_BENCHMARKS=true")
+
+def pytest_collection_modifyitems(config, items):
+    # Wall-clock and peak memory assertions flake on loaded machines, so benchmarks are opt-in
+    if os.getenv("RUN_BENCHMARKS", "false").lower() == "true":
+        return
+    skip = pytest.mark.skip(reason="benchmark, set RUN_BENCHMARKS=true to run")
+    for item in items:
+        if "bench" in item.keywords:
+            item.add_marker(skip)
+
+@pytest.fixture(autouse=True)
+def reset_rate_limiter():
+    """Start every test with fresh per-key rate limits."""
+    rate_limiter.reset()
+    yield
@@ -0,0 +1,121 @@
+# Fake Gemini client used to exercise the service layer without a network
+import asyncio
+from types import SimpleNamespace
+from google.genai import errors
+
+
+class FakeCaches:
+    """
+    Async stand-in for `client.aio.caches` (Gemini context caching).
+    """
+
+    def __init__(self):
+        self.created = 0
+        self.active = {}
+
+    async def create(self, *, model, config=None):
+        self.created += 1
+        name = f"cachedContents/fake-{self.created}"
+        self.active[name] = config
+        return SimpleNamespace(name=name, model=model)
+
+    def expire_all(self):
+        """Simulate every upstream cache reaching its TTL."""
+        self.active.clear()
+
+
+class FakeModels:
+    """
+    Async stand-in for `client.aio.models` that sleeps for a fixed latency.
+    """
+
+    def __init__(self, latency: float = 0.0, text: str = "Fake Gemini answer"):
+        self.latency = latency
+        self.text = text
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.cancelled = 0
+        self.streams_closed = 0
+        self.caches = FakeCaches()
+        self.last_contents = None
+        self.last_config = None
+        # Raised by every call when set, to simulate upstream failures
+        self.error = None
+        # Raised by calls to one model, e.g. to simulate its quota running out
+        self.model_errors = {}
+        self.last_model = None
+
+    def _check_cache(self, model, contents, config):
+        self.last_model = model
+        self.last_contents = contents
+        self.last_config = config
+        if self.error is not None:
+            raise self.error
+        if model in self.model_errors:
+            raise self.model_errors[model]
+        cached_content = getattr(config, "cached_content", None)
+        if cached_content is not None and cached_content not in self.caches.active:
+            raise errors.ClientError(
+                404, {"error": {"code": 404, "message": "CachedContent not found", "status": "NOT_FOUND"}}
+            )
+
+    async def generate_content(self, *, model, contents, config=None):
+        self.calls += 1
+        self._check_cache(model, contents, config)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        finally:
+            self.in_flight -= 1
+        return SimpleNamespace(text=self.text)
+
+    async def generate_content_stream(self, *, model, contents, config=None):
+        self.calls += 1
+        self._check_cache(model, contents, config)
+        await asyncio.sleep(self.latency)
+
+        words = self.text.split(" ")
+        usage = SimpleNamespace(
+            prompt_token_count=10,
+            candidates_token_count=len(words),
+            total_token_count=10 + len(words),
+        )
+
+        async def chunks():
+            try:
+                for index, word in enumerate(words):
+                    last = index == len(words) - 1
+                    yield SimpleNamespace(text=word + " ", usage_metadata=usage if last else None)
+            finally:
+                self.streams_closed += 1
+
+        return chunks()
+
+
+class FakeGeminiClient:
+    """
+    Minimal fake of `genai.Client` exposing only the async surface.
+    """
+
+    def __init__(self, models: FakeModels):
+        self.aio = SimpleNamespace(models=models, caches=models.caches)
+
+
+def install_fake_gemini(monkeypatch, latency: float = 0.0, text: str = "Fake Gemini answer") -> FakeModels:
+    """
+    Make the Gemini client pool hand out fakes sharing one backend.
+
+    Returns:
+        FakeModels: The shared fake backend, for inspecting call counts.
+    """
+    from app.services.client_pool import client_pool
+
+    models = FakeModels(latency=latency, text=text)
+    client_pool.clear()
+    monkeypatch.setattr(client_pool, "factory", lambda api_key: FakeGeminiClient(models))
+    return models
@@ -39,3 +39,57 @@ def test_chat_endpoint_invalid_request():
         }
     )
     assert response.status_code == 422  # Unprocessable Entity
+
+def test_request_fields_are_strict_and_bounded():
+    """Test that mistyped and oversized fields are rejected before any work is done."""
+    from app.core.config import settings
+    base = {"api_key": "AIzaSyFakeKeyForTests_0123456789", "webpage_content": "Test content", "query": "Test query"}
+    for invalid in (
+        {"suggestion_count": "3"},
+        {"use_retrieval": "true"},
+        {"query": "q" * (settings.MAX_QUERY_CHARS + 1)},
+    ):
+        assert client.post("/api/chat", json={**base, **invalid}).status_code == 422
+
+    history = [{"role": "user", "content": "m" * (settings.MAX_MESSAGE_CHARS + 1)}]
+    response = client.post(
+        "/api/suggest-questions",
+        json={"api_key": base["api_key"], "webpage_content": "Test content", "conversation_history": history},
+    )
+    assert response.status_code == 422
+
+def test_long_conversation_history_keeps_the_recent_messages():
+    """Test that a chat longer than MAX_HISTORY_MESSAGES is trimmed to its last messages, not rejected."""
+    from app.core.config import settings
+    from app.models.request_models import SuggestQuestionsRequest
+    history = [{"role": "user", "content": f"Message {index}"} for index in range(settings.MAX_HISTORY_MESSAGES + 5)]
+    request = SuggestQuestionsRequest.model_validate(
+        {"api_key": "AIzaSyFakeKeyForTests_0123456789", "webpage_content": "Test content", "conversation_history": history}
+    )
+    assert len(request.conversation_history) == settings.MAX_HISTORY_MESSAGES
+    assert request.conversation_history[0].content == "Message 5"
+    assert request.conversation_history[-1].content == f"Message {settings.MAX_HISTORY_MESSAGES + 4}"
+
+def test_malformed_json_body():
+    """Test that a body orjson can't parse is a 422 like before."""
+    response = client.post("/api/chat", content=b'{"api_key": ', headers={"Content-Type": "application/json"})
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["type"] == "json_invalid"
+
+def test_chat_answer_round_trips_unicode(monkeypatch):
+    """Test that answers rendered with orjson keep non-ASCII text intact."""
+    from tests.fake_gemini import install_fake_gemini
+    install_fake_gemini(monkeypatch, text="Grüße aus Köln 👋")
+    response = client.post(
+        "/api/chat",
+        json={"api_key": "AIzaSyFakeKeyForTests_0123456789", "webpage_content": "Seite", "query": "Grüße?"},
+    )
+    assert response.status_code == 200
+    assert response.json() == {"text": "Grüße aus Köln 👋"}
+    assert response.headers["content-type"] == "application/json"
+
+def test_openapi_keeps_request_examples():
+    """Test that the request examples survive the move to json_schema_extra."""
+    schemas = client.get("/openapi.json").json()["components"]["schemas"]
+    assert schemas["ChatRequest"]["example"]["query"] == "What is this webpage about?"
+    assert schemas["SuggestQuestionsResponse"]["example"]["questions"]
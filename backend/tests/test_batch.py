@@ -0,0 +1,98 @@
+import json
+from fastapi.testclient import TestClient
+from main import app
+from app.api import routes
+from app.core.config import settings
+from tests.fake_gemini import install_fake_gemini
+
+client = TestClient(app)
+
+VALID_API_KEY = "AIzaSyFakeKeyForTests_0123456789"
+
+def post_batch(body: dict, **kwargs) -> list:
+    response = client.post("/api/chat/batch", json={"api_key": VALID_API_KEY, **body}, **kwargs)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    return [json.loads(line) for line in response.text.splitlines()]
+
+def test_questions_about_one_page_share_its_tokenization(monkeypatch):
+    """Test that a page is estimated once for all of its questions."""
+    models = install_fake_gemini(monkeypatch)
+    estimated = []
+    original = routes.estimate_tokens_async
+
+    async def counting_estimate(text, limit=None):
+        estimated.append(text)
+        return await original(text, limit)
+
+    monkeypatch.setattr(routes, "estimate_tokens_async", counting_estimate)
+    lines = post_batch({
+        "webpage_content": "One page, many questions",
+        "items": [{"id": f"q{index}", "query": f"Question {index}?"} for index in range(4)],
+    })
+
+    results, done = lines[:-1], lines[-1]
+    assert sorted(result["id"] for result in results) == ["q0", "q1", "q2", "q3"]
+    assert all(result["text"] == "Fake Gemini answer" for result in results)
+    assert done == {"done": True, "succeeded": 4, "failed": 0}
+    assert len(estimated) == 1
+    assert models.calls == 4
+
+def test_partial_failures_are_reported_per_item(monkeypatch):
+    """Test one question across pages where one page can't be found."""
+    install_fake_gemini(monkeypatch)
+    lines = post_batch({
+        "query": "What is this tab about?",
+        "items": [
+            {"id": "tab1", "webpage_content": "First tab"},
+            {"id": "tab2", "page_id": "0" * 64},
+            {"id": "tab3", "webpage_content": "Third tab"},
+        ],
+    })
+
+    by_id = {line["id"]: line for line in lines[:-1]}
+    assert by_id["tab2"]["error"]["status"] == 404
+    assert by_id["tab2"]["error"]["kind"] == "not_found"
+    assert "text" in by_id["tab1"] and "text" in by_id["tab3"]
+    assert lines[-1] == {"done": True, "succeeded": 2, "failed": 1}
+
+def test_fan_out_is_bounded(monkeypatch):
+    """Test that at most BATCH_CONCURRENCY items call Gemini at once."""
+    monkeypatch.setattr(settings, "BATCH_CONCURRENCY", 2)
+    answer = json.dumps({"answer": "Batched answer", "suggestions": ["Next?", "Then?"]})
+    models = install_fake_gemini(monkeypatch, latency=0.05, text=answer)
+    lines = post_batch({
+        "webpage_content": "Page",
+        "suggestion_count": 2,
+        "items": [{"query": f"Question {index}?"} for index in range(6)],
+    })
+
+    assert lines[-1]["succeeded"] == 6
+    assert all(line["suggestions"] == ["Next?", "Then?"] for line in lines[:-1])
+    assert models.max_in_flight == 2
+
+def test_items_past_the_deadline_time_out(monkeypatch):
+    """Test that unfinished items fail with kind timeout and their calls are cancelled."""
+    models = install_fake_gemini(monkeypatch, latency=2.0)
+    lines = post_batch(
+        {"webpage_content": "Slow page", "items": [{"query": "First?"}, {"query": "Second?"}]},
+        headers={"X-Request-Timeout": "0.1"},
+    )
+
+    assert [line["error"]["kind"] for line in lines[:-1]] == ["timeout", "timeout"]
+    assert lines[-1] == {"done": True, "succeeded": 0, "failed": 2}
+    assert models.cancelled == 2
+    assert models.in_flight == 0
+
+def test_batch_validation():
+    """Test that items need a query and a page, and batches are bounded."""
+    missing_query = {"api_key": VALID_API_KEY, "webpage_content": "Page", "items": [{"id": "x"}]}
+    assert client.post("/api/chat/batch", json=missing_query).status_code == 422
+    missing_page = {"api_key": VALID_API_KEY, "items": [{"query": "Where?"}]}
+    assert client.post("/api/chat/batch", json=missing_page).status_code == 422
+    too_many = {
+        "api_key": VALID_API_KEY,
+        "webpage_content": "Page",
+        "items": [{"query": "Again?"}] * (settings.BATCH_MAX_ITEMS + 1),
+    }
+    assert client.post("/api/chat/batch", json=too_many).status_code == 422
@@ -0,0 +1,68 @@
+import asyncio
+import httpx
+import pytest
+from main import app
+from app.core.config import settings
+from app.services.client_pool import client_pool
+from app.services.model_router import model_router
+from benchmarks.fake_gemini_server import FakeGeminiConfig, FakeGeminiServer
+from benchmarks.run_benchmark import compare, percentile, run_scenario
+
+@pytest.fixture
+def fake_server(monkeypatch):
+    """Run a fast fake Gemini server and point the real Gemini client at it."""
+    server = FakeGeminiServer(FakeGeminiConfig(latency=0.01, ttft=0.01, chunks=4, chunk_interval=0.0, seed=7))
+    server.start()
+    monkeypatch.setattr(settings, "GEMINI_BASE_URL", server.url)
+    client_pool.clear()
+    yield server
+    server.stop()
+    client_pool.clear()
+
+async def drive(scenario: str, requests: int = 12, concurrency: int = 4) -> dict:
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://backend") as client:
+            return await run_scenario(client, scenario, requests, concurrency, page_chars=2000)
+    finally:
+        # The pooled connections belong to this event loop
+        await client_pool.aclose()
+
+def test_scenarios_run_over_http_against_the_fake_server(fake_server):
+    """Test chat, stream and suggestion traffic through the real Gemini client."""
+    for scenario in ("chat", "stream", "suggest"):
+        summary = asyncio.run(drive(scenario))
+        assert summary["requests"] == 12
+        assert summary["errors"] == 0, summary["statuses"]
+        assert summary["p50"] <= summary["p95"] <= summary["p99"]
+        assert summary["throughput_rps"] > 0
+        if scenario == "stream":
+            assert summary["ttft"]["p50"] <= summary["p50"]
+    assert fake_server.fake.calls == 24
+    assert fake_server.fake.stream_calls == 12
+
+def test_injected_errors_are_reported_with_their_status(fake_server, monkeypatch):
+    """Test that injected upstream errors surface as the backend's error statuses."""
+    monkeypatch.setattr(settings, "GEMINI_MAX_ATTEMPTS", 1)
+    monkeypatch.setattr(model_router, "health", {})
+    fake_server.fake.config.error_rate = 1.0
+    fake_server.fake.config.error_status = 429
+
+    summary = asyncio.run(drive("chat", requests=4, concurrency=2))
+    assert summary["errors"] == 4
+    assert summary["statuses"] == {"429": 4}
+    assert summary["p50"] is None
+
+def test_percentiles_and_comparison():
+    """Test the nearest-rank percentiles and the comparison of two runs."""
+    values = [float(value) for value in range(1, 101)]
+    assert percentile(values, 0.50) == 50.0
+    assert percentile(values, 0.99) == 99.0
+    assert percentile([], 0.5) is None
+
+    baseline = {"scenarios": {"chat": {"p50": 0.1, "p95": 0.2, "p99": 0.4, "throughput_rps": 100.0}}}
+    current = {"scenarios": {"chat": {"p50": 0.2, "p95": 0.2, "p99": None, "throughput_rps": 50.0}}}
+    lines = compare(baseline, current)
+    assert len(lines) == 3
+    assert "+100.0%" in lines[0]
+    assert "-50.0%" in lines[-1]
@@ -0,0 +1,204 @@
+import asyncio
+import sqlite3
+import subprocess
+import sys
+import threading
+from pathlib import Path
+import pytest
+from fastapi.testclient import TestClient
+from main import app
+from app.core.drain import stream_tracker
+from app.services.cache_backend import MemoryCacheBackend, SQLiteCacheBackend
+from app.services.context_cache import ContextCacheRegistry
+from app.services.page_store import PageEntry, PageStore
+from app.services.rate_limiter import RateLimiter, RateLimitExceeded
+from app.services.response_cache import ResponseCache
+from app.services.session_store import SessionStore
+from tests.fake_gemini import FakeGeminiClient, FakeModels, install_fake_gemini
+
+VALID_API_KEY = "AIzaSyFakeKeyForTests_0123456789"
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return str(tmp_path / "cache.sqlite3")
+
+def test_workers_share_response_cache_entries(cache_path):
+    """Test that an entry stored by one worker's backend is a hit for another's."""
+    first = ResponseCache(backend=SQLiteCacheBackend(cache_path), namespace="suggestions")
+    second = ResponseCache(backend=SQLiteCacheBackend(cache_path), namespace="suggestions")
+    key = ("model", "page", 3, None)
+
+    first.set(key, ["What is new?"])
+    assert second.get(key) == (["What is new?"], False)
+    assert second.stats()["hits"] == 1
+    # Namespaces keep caches sharing a backend apart
+    assert ResponseCache(backend=SQLiteCacheBackend(cache_path), namespace="other").get(key) is None
+
+def test_entries_are_shared_across_processes(cache_path):
+    """Test that another process sees entries through the SQLite file."""
+    SQLiteCacheBackend(cache_path).set(["from", "parent"], {"answer": 42}, ttl=60)
+    script = (
+        "import sys; from app.services.cache_backend import SQLiteCacheBackend; "
+        "backend = SQLiteCacheBackend(sys.argv[1]); "
+        "assert backend.get(['from', 'parent']) == {'answer': 42}; "
+        "backend.set(['from', 'child'], 'hello', ttl=60)"
+    )
+    subprocess.run([sys.executable, "-c", script, cache_path], check=True, cwd=Path(__file__).parent.parent)
+    assert SQLiteCacheBackend(cache_path).get(["from", "child"]) == "hello"
+
+def test_sqlite_entries_expire_and_are_pruned(cache_path):
+    """Test TTL expiry and the entry bound."""
+    clock = FakeClock()
+    backend = SQLiteCacheBackend(cache_path, max_entries=3, prune_interval=1, clock=clock)
+    backend.set("short", 1, ttl=10)
+    clock.now += 11
+    assert backend.get("short") is None
+
+    for index in range(5):
+        backend.set(f"key{index}", index, ttl=100 + index)
+    assert backend.size() == 3
+    # The entries closest to expiry go first
+    assert backend.get("key0") is None
+    assert backend.get("key4") == 4
+
+def test_rate_limit_is_shared_between_workers(cache_path):
+    """Test that a key's burst is spent across limiters sharing a backend."""
+    limiters = [
+        RateLimiter(rate=0.1, burst=2.0, max_wait=0.0, buckets=SQLiteCacheBackend(cache_path)) for _ in range(2)
+    ]
+
+    async def run():
+        (await limiters[0].acquire(VALID_API_KEY)).release()
+        (await limiters[1].acquire(VALID_API_KEY)).release()
+        with pytest.raises(RateLimitExceeded) as excinfo:
+            await limiters[0].acquire(VALID_API_KEY)
+        assert excinfo.value.reason == "rate"
+        assert excinfo.value.retry_after > 0
+
+    asyncio.run(run())
+
+def test_memory_backend_buckets_match_the_local_limiter():
+    """Test the in-memory backend's token bucket and LRU bound."""
+    clock = FakeClock()
+    backend = MemoryCacheBackend(max_entries=2, clock=clock)
+    assert backend.reserve_token("key", rate=1.0, burst=1.0, max_wait=0.0) == (0.0, 1.0)
+    assert backend.reserve_token("key", rate=1.0, burst=1.0, max_wait=0.0)[0] is None
+    clock.now += 1
+    assert backend.reserve_token("key", rate=1.0, burst=1.0, max_wait=0.0)[0] == 0.0
+
+    for key in ("a", "b", "c"):
+        backend.set(key, key, ttl=10)
+    assert backend.get("a") is None
+    assert backend.size() == 2
+
+def test_backend_errors_are_misses(cache_path):
+    """Test that a broken backend degrades to misses instead of failing requests."""
+    backend = SQLiteCacheBackend(cache_path)
+    backend.close()
+    assert backend.get("key") is None
+    backend.set("key", "value", ttl=10)
+    assert backend.reserve_token("rate", 1.0, 1.0, 0.0) == (0.0, 0.0)
+    assert backend.stats()["errors"] >= 3
+
+def test_workers_share_registered_pages(cache_path):
+    """Test that a page registered with one worker can be looked up by digest on another."""
+    first = PageStore(backend=SQLiteCacheBackend(cache_path))
+    second = PageStore(backend=SQLiteCacheBackend(cache_path))
+
+    async def run():
+        entry = await first.register("Page registered with the first worker", tokens_saved=3)
+        return entry, await second.get(entry.page_id)
+
+    entry, found = asyncio.run(run())
+    assert (found.content, found.token_count, found.tokens_saved) == (entry.content, entry.token_count, 3)
+    assert second.stats()["shared_hits"] == 1
+    assert asyncio.run(second.get("0" * 64)) is None
+
+def test_workers_share_sessions(cache_path):
+    """Test that a session created on one worker is continued, and deleted, on another."""
+    first = SessionStore(backend=SQLiteCacheBackend(cache_path))
+    second = SessionStore(backend=SQLiteCacheBackend(cache_path))
+    session = first.create(VALID_API_KEY, "page")
+
+    continued = second.get(session.session_id, VALID_API_KEY)
+    continued.add_exchange("What is it?", "A page.")
+    second.save(continued)
+
+    again = first.get(session.session_id, VALID_API_KEY)
+    assert again.page_id == "page"
+    assert again.to_messages() == [
+        {"role": "user", "content": "What is it?"},
+        {"role": "assistant", "content": "A page."},
+    ]
+    assert first.get(session.session_id, VALID_API_KEY[:-1] + "X") is None
+    assert second.delete(session.session_id, VALID_API_KEY)
+    assert first.get(session.session_id, VALID_API_KEY) is None
+
+def test_locked_database_fails_open(cache_path):
+    """Test that another worker holding the write lock makes writes fail open instead of waiting."""
+    backend = SQLiteCacheBackend(cache_path, busy_timeout=0.01)
+    backend.set("key", "value", ttl=60)
+    other = sqlite3.connect(cache_path, isolation_level=None)
+    other.execute("BEGIN IMMEDIATE")
+    try:
+        # WAL readers don't wait for the writer
+        assert backend.get("key") == "value"
+        backend.set("other", "value", ttl=60)
+        assert backend.reserve_token("rate", 1.0, 1.0, 0.0) == (0.0, 0.0)
+        assert backend.stats()["errors"] == 2
+    finally:
+        other.execute("ROLLBACK")
+        other.close()
+    assert backend.get("other") is None
+
+def test_shared_buckets_are_reserved_off_the_event_loop(cache_path):
+    """Test that the limiter reserves shared tokens in a worker thread."""
+    backend = SQLiteCacheBackend(cache_path)
+    threads = []
+    reserve_token = backend.reserve_token
+
+    def record_thread(*args):
+        threads.append(threading.get_ident())
+        return reserve_token(*args)
+
+    backend.reserve_token = record_thread
+    limiter = RateLimiter(buckets=backend)
+
+    async def run():
+        (await limiter.acquire(VALID_API_KEY)).release()
+        return threading.get_ident()
+
+    loop_thread = asyncio.run(run())
+    assert len(threads) == 1 and threads[0] != loop_thread
+
+def test_workers_share_context_cache_handles(cache_path):
+    """Test that one worker reuses the upstream cache another worker created."""
+    client = FakeGeminiClient(FakeModels())
+    content = "Large page content " * 10
+    registries = [ContextCacheRegistry(min_tokens=1000, backend=SQLiteCacheBackend(cache_path)) for _ in range(2)]
+
+    async def run():
+        first = await registries[0].get_or_create(client, VALID_API_KEY, "model", PageEntry(None, content, 5000, len(content)))
+        second = await registries[1].get_or_create(client, VALID_API_KEY, "model", PageEntry(None, content, 5000, len(content)))
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first == second
+    assert client.aio.caches.created == 1
+    assert registries[1].stats()["hits"] == 1
+
+def test_streams_are_tracked(monkeypatch):
+    """Test that the stream endpoint is counted while it runs."""
+    install_fake_gemini(monkeypatch)
+    started = stream_tracker.started
+    client = TestClient(app)
+    client.post("/api/chat/stream", json={"api_key": VALID_API_KEY, "webpage_content": "Page", "query": "Tracked?"})
+    assert stream_tracker.started == started + 1
+    assert stream_tracker.in_flight == 0
@@ -0,0 +1,66 @@
+import asyncio
+from app.services.client_pool import GeminiClientPool
+
+KEY_A = "AIzaSyFakeKeyForTests_aaaaaaaaaa"
+KEY_B = "AIzaSyFakeKeyForTests_bbbbbbbbbb"
+KEY_C = "AIzaSyFakeKeyForTests_cccccccccc"
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def make_pool(max_size=2, idle_ttl=60.0, clock=None):
+    pool = GeminiClientPool(max_size=max_size, idle_ttl=idle_ttl, clock=clock or FakeClock())
+    pool.factory = lambda api_key: object()
+    return pool
+
+def test_same_key_reuses_client():
+    """Test that repeated lookups for one key return the same client."""
+    pool = make_pool()
+    client = pool.get(KEY_A)
+    assert pool.get(KEY_A) is client
+    assert pool.stats()["hits"] == 1
+    assert pool.stats()["misses"] == 1
+
+def test_pool_never_stores_raw_keys():
+    """Test that the registry is keyed by a hash, not the raw API key."""
+    pool = make_pool()
+    pool.get(KEY_A)
+    assert KEY_A not in pool._clients
+    assert all(len(key) == 64 for key in pool._clients)
+
+def test_lru_eviction_when_full():
+    """Test that the least recently used client is evicted at capacity."""
+    pool = make_pool(max_size=2)
+    client_a = pool.get(KEY_A)
+    pool.get(KEY_B)
+    pool.get(KEY_A)  # A is now most recently used
+    pool.get(KEY_C)  # evicts B
+    assert pool.get(KEY_A) is client_a
+    assert pool.stats()["evictions"] == 1
+    assert pool.stats()["size"] == 2
+
+def test_idle_clients_are_evicted():
+    """Test that clients idle for longer than the TTL are dropped."""
+    clock = FakeClock()
+    pool = make_pool(max_size=10, idle_ttl=60.0, clock=clock)
+    client_a = pool.get(KEY_A)
+    clock.now = 61.0
+    assert pool.get(KEY_A) is not client_a
+    assert pool.stats()["evictions"] == 1
+
+def test_real_clients_share_connection_pools():
+    """Test that real Gemini clients share the pool's httpx clients and close cleanly."""
+    pool = GeminiClientPool()
+    client_a = pool.get(KEY_A)
+    client_b = pool.get(KEY_B)
+    assert client_a is not client_b
+    assert client_a._api_client._async_httpx_client is client_b._api_client._async_httpx_client
+    # Nor does each new key load the CA bundle again
+    assert client_a._api_client._http_options.async_client_args["ssl"] is pool._ssl_context
+    assert client_b._api_client._http_options.client_args["verify"] is pool._ssl_context
+    asyncio.run(pool.aclose())
+    assert pool.stats()["size"] == 0
@@ -0,0 +1,73 @@
+import json
+from fastapi.testclient import TestClient
+from main import app
+from app.services.json_stream import JsonStringFieldStreamer
+from tests.fake_gemini import install_fake_gemini
+from tests.test_streaming import parse_sse
+
+client = TestClient(app)
+
+VALID_API_KEY = "AIzaSyFakeKeyForTests_0123456789"
+
+COMBINED_RESPONSE = json.dumps({
+    "answer": "The page explains \"caching\" in depth.\nIt also covers eviction.",
+    "suggestions": ["What is eviction?", "How big should the cache be?", "What is a TTL?"]
+})
+
+def test_streamer_decodes_field_split_at_any_point():
+    """Test that the answer is decoded correctly however the JSON is chunked."""
+    document = json.dumps({"answer": "Tab\tquote\" slash\\ emoji \U0001F600 done", "suggestions": ["a"]})
+    expected = json.loads(document)["answer"]
+    for size in range(1, 12):
+        streamer = JsonStringFieldStreamer("answer")
+        decoded = "".join(streamer.feed(document[i:i + size]) for i in range(0, len(document), size))
+        assert decoded == expected
+        assert streamer.done
+        assert json.loads(streamer.text)["suggestions"] == ["a"]
+
+def test_streamer_finds_the_key_after_other_fields():
+    """Test that the key is found when it follows other fields, including one whose value is the key name."""
+    document = '{"note": "answer", "padding": "' + "x" * 500 + '", "answer"  :  "found"}'
+    for size in (1, 3, 7, 64):
+        streamer = JsonStringFieldStreamer("answer")
+        decoded = "".join(streamer.feed(document[i:i + size]) for i in range(0, len(document), size))
+        assert decoded == "found"
+        assert streamer.text == document
+
+def test_chat_returns_answer_and_suggestions(monkeypatch):
+    """Test that chat returns the answer and suggestions from one Gemini call."""
+    models = install_fake_gemini(monkeypatch, text=COMBINED_RESPONSE)
+    response = client.post(
+        "/api/chat",
+        json={
+            "api_key": VALID_API_KEY,
+            "webpage_content": "Caching page",
+            "query": "What does this page explain?",
+            "suggestion_count": 2
+        }
+    )
+    assert response.status_code == 200
+    assert response.json() == {
+        "text": "The page explains \"caching\" in depth.\nIt also covers eviction.",
+        "suggestions": ["What is eviction?", "How big should the cache be?"]
+    }
+    assert models.calls == 1
+    assert models.last_config.response_mime_type == "application/json"
+
+def test_chat_stream_sends_suggestions_as_trailing_event(monkeypatch):
+    """Test that the stream decodes the answer and ends with a suggestions event."""
+    install_fake_gemini(monkeypatch, text=COMBINED_RESPONSE)
+    response = client.post(
+        "/api/chat/stream",
+        json={
+            "api_key": VALID_API_KEY,
+            "webpage_content": "Caching page",
+            "query": "What does this page explain, in a stream?",
+            "suggestion_count": 3
+        }
+    )
+    events = parse_sse(response.text)
+    answer = "".join(data["text"] for name, data in events if name == "delta")
+    assert answer == "The page explains \"caching\" in depth.\nIt also covers eviction."
+    assert [name for name, _ in events][-3:] == ["suggestions", "usage", "done"]
+    assert events[-3][1]["questions"] == ["What is eviction?", "How big should the cache be?", "What is a TTL?"]
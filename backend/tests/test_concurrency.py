@@ -0,0 +1,37 @@
+import asyncio
+import time
+import httpx
+from main import app
+from tests.fake_gemini import install_fake_gemini
+
+async def _post_chats(count: int):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        # Distinct queries, so the requests are not coalesced into one call, and distinct
+        # keys, so they are not held back by the per-key concurrency limit
+        payloads = [
+            {
+                "api_key": f"AIzaSyFakeKeyForTests_{index:010d}",
+                "webpage_content": "Some webpage content",
+                "query": f"Question {index}?"
+            }
+            for index in range(count)
+        ]
+        return await asyncio.gather(*(client.post("/api/chat", json=payload) for payload in payloads))
+
+def test_parallel_chat_requests_do_not_block_event_loop(monkeypatch):
+    """Test that N parallel chats against a slow backend take about one call's latency."""
+    latency = 0.5
+    requests = 20
+    models = install_fake_gemini(monkeypatch, latency=latency)
+
+    start = time.perf_counter()
+    responses = asyncio.run(_post_chats(requests))
+    elapsed = time.perf_counter() - start
+
+    assert all(response.status_code == 200 for response in responses)
+    assert all(response.json() == {"text": "Fake Gemini answer"} for response in responses)
+    assert models.calls == requests
+    assert models.max_in_flight == requests
+    # Serialized calls would take latency * requests (10 s)
+    assert elapsed < latency * 3
@@ -0,0 +1,120 @@
+import time
+import pytest
+from fastapi.testclient import TestClient
+from main import app
+from app.services.content_compactor import compact_blocks, compact_content
+from tests.fake_gemini import install_fake_gemini
+
+client = TestClient(app)
+
+VALID_API_KEY = "AIzaSyFakeKeyForTests_0123456789"
+
+PARAGRAPH = "Caching keeps recently used pages in memory so follow-up questions are fast."
+
+# Shaped like the extension's output: blocks separated by blank lines, raw textContent inside
+RAW_PAGE = "\n\n".join([
+    "TITLE: Caching guide",
+    "• Home",
+    "• Docs",
+    "Skip to content",
+    "H1:    Caching\t guide  ",
+    PARAGRAPH,
+    "  Eviction   removes the least recently used page\n        once the store is full.  ",
+    "• " + PARAGRAPH,
+    PARAGRAPH,
+    "We use cookies to improve your experience.",
+    "• Home",
+    "© 2025 Example Corp. All rights reserved.",
+])
+
+def test_compaction_normalizes_dedupes_and_strips_boilerplate():
+    """Test each stage of the pipeline on extension-shaped text."""
+    result = compact_content(RAW_PAGE)
+    assert result.content == "\n\n".join([
+        "TITLE: Caching guide",
+        "• Home",
+        "• Docs",
+        "H1: Caching guide",
+        PARAGRAPH,
+        "  Eviction removes the least recently used page\n        once the store is full.",
+        # Short blocks may repeat legitimately and are kept
+        "• Home",
+    ])
+    assert result.tokens_saved == (len(RAW_PAGE) - len(result.content)) // 4
+    assert result.original_size == len(RAW_PAGE)
+
+def test_compaction_drops_lines_repeated_from_nested_elements():
+    """Test that a parent list item's lines make the child items repeats."""
+    parent = "• Getting started with the cache\n  Configure the cache size first\n  Then tune the eviction policy"
+    child = "• Configure the cache size first"
+    blocks = list(compact_blocks("\n\n".join([parent, child, "• Then tune the eviction policy"])))
+    assert blocks == ["• Getting started with the cache\n  Configure the cache size first\n  Then tune the eviction policy"]
+
+def test_compaction_keeps_content_that_only_mentions_boilerplate_words():
+    """Test that long paragraphs and short content lines are not treated as chrome."""
+    long_paragraph = "Browsers store cookies per site. " * 10
+    page = "\n\n".join(["H2: Menu", "• 42", "• 42 | 43", long_paragraph.strip()])
+    assert compact_content(page).content == page
+
+def test_nav_words_are_only_dropped_next_to_other_chrome():
+    """Test that a lone "Menu" or "Print" block is kept as a heading, but not inside a run of nav links."""
+    page = "\n\n".join(["Menu", "Starters and mains change weekly.", "Print", "Register"])
+    assert compact_content(page).content == "Menu\n\nStarters and mains change weekly."
+
+    page = "\n\n".join(["Skip to content", "Menu", "Register", "Caching guide", "Tweet"])
+    assert compact_content(page).content == "Caching guide\n\nTweet"
+
+def test_compaction_keeps_code_indentation_and_short_repeats():
+    """Test that indentation survives and short or indented repeats are not dropped."""
+    assert compact_content("def f(x):\n    if x:\n        return 1").content == "def f(x):\n    if x:\n        return 1"
+    code = "def first(key):\n    value  =  lookup(key)\n    return value\n}"
+    again = "def second(key):\n    value = lookup(key)\n    return value\n}"
+    rows = ["| a | 1 |", "| a | 1 |", "}", "}"]
+    blocks = list(compact_blocks("\n\n".join([code, again, *rows])))
+    assert blocks == ["def first(key):\n    value = lookup(key)\n    return value\n}", again, *rows]
+
+def test_large_blocks_keep_indentation():
+    """Test that the regex path for large blocks normalizes the same way as the split path."""
+    block = "\n".join(f"    line  {index}\t of the block   " for index in range(1000))
+    expected = "\n".join(f"    line {index} of the block" for index in range(1000))
+    assert list(compact_blocks(block)) == [expected]
+
+def test_clean_page_is_returned_without_a_copy():
+    """Test that compaction doesn't copy text it doesn't change."""
+    page = "\n\n".join(f"Paragraph {index} of a clean page." for index in range(1000))
+    result = compact_content(page)
+    assert result.content is page
+    assert result.tokens_saved == 0
+
+@pytest.mark.bench
+def test_compaction_time_is_linear():
+    """Test that compacting four times the text takes roughly four times as long."""
+    def timed(repeats: int) -> float:
+        page = "\n\n".join(f"  Paragraph   {index}\n  with  a second line {index}  " for index in range(repeats))
+        start = time.perf_counter()
+        compact_content(page)
+        return time.perf_counter() - start
+
+    timed(1000)
+    small = min(timed(20_000) for _ in range(3))
+    large = min(timed(80_000) for _ in range(3))
+    assert large < small * 8
+
+def test_chat_reports_tokens_saved(monkeypatch):
+    """Test that chat prompts with the compacted page and reports the savings."""
+    models = install_fake_gemini(monkeypatch)
+    response = client.post(
+        "/api/chat",
+        json={"api_key": VALID_API_KEY, "webpage_content": RAW_PAGE, "query": "What is caching?"}
+    )
+    assert response.status_code == 200
+    assert int(response.headers["X-Tokens-Saved"]) > 0
+    page_text = models.last_contents[0].parts[1].text
+    assert page_text == compact_content(RAW_PAGE).content
+
+def test_register_page_reports_tokens_saved():
+    """Test that registered pages are stored compacted."""
+    response = client.post("/api/pages", json={"api_key": VALID_API_KEY, "webpage_content": RAW_PAGE})
+    compacted = compact_content(RAW_PAGE)
+    assert response.json()["size"] == len(compacted.content.encode("utf-8"))
+    assert response.json()["tokens_saved"] == compacted.tokens_saved
@@ -0,0 +1,90 @@
+import asyncio
+from app.services import gemini_service
+from app.services.context_cache import ContextCacheRegistry
+from app.services.page_store import PageEntry
+from tests.fake_gemini import FakeGeminiClient, FakeModels, install_fake_gemini
+
+VALID_API_KEY = "AIzaSyFakeKeyForTests_0123456789"
+OTHER_API_KEY = "AIzaSyFakeKeyForTests_9876543210"
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def make_page(token_count: int) -> PageEntry:
+    content = "Large page content " * 10
+    return PageEntry(None, content, token_count, len(content))
+
+def test_small_pages_are_not_cached():
+    """Test that pages below the token threshold skip the context cache."""
+    registry = ContextCacheRegistry(min_tokens=1000)
+    client = FakeGeminiClient(FakeModels())
+    name = asyncio.run(registry.get_or_create(client, VALID_API_KEY, "model", make_page(999)))
+    assert name is None
+    assert client.aio.caches.created == 0
+
+def test_handles_are_reused_per_page_model_and_key():
+    """Test that a handle is created once and reused for the same key, model and page."""
+    registry = ContextCacheRegistry(min_tokens=1000)
+    client = FakeGeminiClient(FakeModels())
+    page = make_page(5000)
+
+    async def scenario():
+        first = await registry.get_or_create(client, VALID_API_KEY, "model", page)
+        second = await registry.get_or_create(client, VALID_API_KEY, "model", page)
+        other_model = await registry.get_or_create(client, VALID_API_KEY, "other-model", page)
+        other_key = await registry.get_or_create(client, OTHER_API_KEY, "model", page)
+        return first, second, other_model, other_key
+
+    first, second, other_model, other_key = asyncio.run(scenario())
+    assert first == second
+    assert len({first, other_model, other_key}) == 3
+    assert registry.stats()["hits"] == 1
+    assert registry.stats()["misses"] == 3
+
+def test_concurrent_requests_share_one_create():
+    """Test that concurrent misses for one page create a single upstream cache."""
+    registry = ContextCacheRegistry(min_tokens=1000)
+    client = FakeGeminiClient(FakeModels())
+    page = make_page(5000)
+
+    async def scenario():
+        return await asyncio.gather(*(registry.get_or_create(client, VALID_API_KEY, "model", page) for _ in range(5)))
+
+    names = asyncio.run(scenario())
+    assert len(set(names)) == 1
+    assert client.aio.caches.created == 1
+
+def test_handles_expire_before_upstream_ttl():
+    """Test that handles are recreated once their TTL has run out."""
+    clock = FakeClock()
+    registry = ContextCacheRegistry(ttl=600, min_tokens=1000, clock=clock)
+    client = FakeGeminiClient(FakeModels())
+    page = make_page(5000)
+
+    first = asyncio.run(registry.get_or_create(client, VALID_API_KEY, "model", page))
+    clock.now = 590.0  # inside the safety margin before the upstream TTL
+    second = asyncio.run(registry.get_or_create(client, VALID_API_KEY, "model", page))
+    assert first != second
+    assert registry.stats()["expirations"] == 1
+
+def test_gemini_response_uses_cache_and_falls_back_when_expired(monkeypatch):
+    """Test the service sends only the question with a cache and resends the page after expiry."""
+    models = install_fake_gemini(monkeypatch)
+    monkeypatch.setattr(gemini_service, "context_cache", ContextCacheRegistry(min_tokens=1000))
+    page = make_page(5000)
+
+    text = asyncio.run(gemini_service.get_gemini_response(VALID_API_KEY, "model", ["USER QUERY: hi"], page))
+    assert text == "Fake Gemini answer"
+    assert models.last_config.cached_content is not None
+    assert len(models.last_contents[0].parts) == 1
+
+    # Upstream cache expired without us knowing: fall back to sending the page inline
+    models.caches.expire_all()
+    text = asyncio.run(gemini_service.get_gemini_response(VALID_API_KEY, "model", ["USER QUERY: hi"], page))
+    assert text == "Fake Gemini answer"
+    assert models.last_config.cached_content is None
+    assert models.last_contents[0].parts[1].text == page.content
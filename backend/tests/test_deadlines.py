@@ -0,0 +1,102 @@
+import asyncio
+import json
+from types import SimpleNamespace
+from fastapi.testclient import TestClient
+from main import app
+from app.core.deadline import deadline_stats, set_deadline
+from app.services.gemini_service import stop_before_deadline
+from tests.fake_gemini import install_fake_gemini
+
+client = TestClient(app)
+
+VALID_API_KEY = "AIzaSyFakeKeyForTests_0123456789"
+
+def test_chat_deadline_cancels_upstream_call(monkeypatch):
+    """Test that a chat exceeding its X-Request-Timeout gets a 504 and the call is cancelled."""
+    models = install_fake_gemini(monkeypatch, latency=2.0)
+    timeouts = deadline_stats.timeouts
+
+    response = client.post(
+        "/api/chat",
+        json={"api_key": VALID_API_KEY, "webpage_content": "Slow page", "query": "Too slow?"},
+        headers={"X-Request-Timeout": "0.1"},
+    )
+    assert response.status_code == 504
+    assert models.cancelled == 1
+    assert models.in_flight == 0
+    assert deadline_stats.timeouts == timeouts + 1
+
+def test_invalid_timeout_header_is_rejected():
+    """Test that the timeout header must be a positive number."""
+    for value in ("soon", "0", "-1", "nan"):
+        response = client.post(
+            "/api/chat",
+            json={"api_key": VALID_API_KEY, "webpage_content": "Page", "query": "When?"},
+            headers={"X-Request-Timeout": value},
+        )
+        assert response.status_code == 400
+
+def test_stream_deadline_before_first_event_returns_504(monkeypatch):
+    """Test that a stream that can't start within the deadline is answered with 504."""
+    install_fake_gemini(monkeypatch, latency=2.0)
+    response = client.post(
+        "/api/chat/stream",
+        json={"api_key": VALID_API_KEY, "webpage_content": "Slow page", "query": "Stream?"},
+        headers={"X-Request-Timeout": "0.1"},
+    )
+    assert response.status_code == 504
+
+def test_client_disconnect_cancels_upstream_call(monkeypatch):
+    """Test that a client going away mid-request cancels the Gemini call."""
+    models = install_fake_gemini(monkeypatch, latency=2.0)
+    cancellations = deadline_stats.cancellations
+    body = json.dumps({"api_key": VALID_API_KEY, "webpage_content": "Page", "query": "Gone?"}).encode()
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+
+    async def receive():
+        if messages:
+            return messages.pop()
+        # The client disconnects while the upstream call is in flight
+        await asyncio.sleep(0.1)
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        pass
+
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": "/api/chat",
+        "raw_path": b"/api/chat",
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        "client": ("127.0.0.1", 1234),
+        "server": ("test", 80),
+    }
+
+    async def run():
+        start = asyncio.get_running_loop().time()
+        await app(scope, receive, send)
+        return asyncio.get_running_loop().time() - start
+
+    elapsed = asyncio.run(run())
+    assert elapsed < 1.0
+    assert models.cancelled == 1
+    assert deadline_stats.cancellations == cancellations + 1
+
+def test_retries_stop_before_the_deadline():
+    """Test that no backoff is started that would end after the deadline."""
+    stop = stop_before_deadline()
+
+    async def check(remaining: float, upcoming_sleep: float) -> bool:
+        set_deadline(remaining)
+        return stop(SimpleNamespace(upcoming_sleep=upcoming_sleep))
+
+    assert asyncio.run(check(0.5, 1.0))
+    assert not asyncio.run(check(5.0, 1.0))
+    # Outside a request there is no deadline
+    assert not stop(SimpleNamespace(upcoming_sleep=1.0))
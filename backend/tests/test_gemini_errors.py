@@ -0,0 +1,122 @@
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from google.genai import errors
+from main import app
+from app.core.config import settings
+from app.services.gemini_errors import classify_error, is_retryable
+from app.services.model_router import model_router
+from tests.fake_gemini import install_fake_gemini
+
+client = TestClient(app)
+
+VALID_API_KEY = "AIzaSyFakeKeyForTests_0123456789"
+
+def api_error(code: int, status: str, message: str = "Upstream message", details=None) -> errors.APIError:
+    error_class = errors.ClientError if code < 500 else errors.ServerError
+    body = {"code": code, "message": message, "status": status}
+    if details is not None:
+        body["details"] = details
+    return error_class(code, {"error": body})
+
+@pytest.mark.parametrize(
+    "error, kind, retryable",
+    [
+        (api_error(429, "RESOURCE_EXHAUSTED"), "quota", False),
+        (api_error(401, "UNAUTHENTICATED"), "auth", False),
+        (api_error(403, "PERMISSION_DENIED"), "auth", False),
+        (
+            api_error(400, "INVALID_ARGUMENT", "API key not valid.", [{"reason": "API_KEY_INVALID"}]),
+            "auth",
+            False,
+        ),
+        (api_error(400, "INVALID_ARGUMENT"), "invalid_request", False),
+        (api_error(404, "NOT_FOUND"), "invalid_request", False),
+        (api_error(500, "INTERNAL"), "unavailable", True),
+        (api_error(503, "UNAVAILABLE"), "unavailable", True),
+        (api_error(504, "DEADLINE_EXCEEDED"), "timeout", True),
+        (httpx.ReadTimeout("timed out"), "timeout", True),
+        (httpx.ConnectError("connection refused"), "network", True),
+        (ValueError("Expecting value"), "bad_response", False),
+        # Words in the message don't decide the kind
+        (RuntimeError("rate limit key service timeout"), "upstream", False),
+    ],
+)
+def test_errors_are_classified_by_type_and_status(error, kind, retryable):
+    """Test the mapping from SDK exceptions to error kinds."""
+    assert classify_error(error).kind == kind
+    assert is_retryable(error) == retryable
+
+def test_quota_error_carries_retry_delay():
+    """Test that the RetryInfo delay becomes the Retry-After of the error."""
+    error = api_error(
+        429, "RESOURCE_EXHAUSTED", details=[{"@type": "type.googleapis.com/google.rpc.RetryInfo", "retryDelay": "39s"}]
+    )
+    assert classify_error(error).retry_after == 39.0
+
+def use_fast_retries(monkeypatch):
+    monkeypatch.setattr(settings, "GEMINI_RETRY_MAX_WAIT", 0)
+    monkeypatch.setattr(model_router, "health", {})
+
+def test_bad_request_is_not_retried_and_returns_400(monkeypatch):
+    """Test that a request Gemini rejected fails at once with a 400."""
+    use_fast_retries(monkeypatch)
+    models = install_fake_gemini(monkeypatch)
+    models.error = api_error(400, "INVALID_ARGUMENT", "Unsupported MIME type")
+
+    response = client.post("/api/chat", json={"api_key": VALID_API_KEY, "webpage_content": "Page", "query": "Bad?"})
+    assert response.status_code == 400
+    assert response.json() == {
+        "detail": "The request was rejected by the Gemini API: Unsupported MIME type",
+        "kind": "invalid_request",
+    }
+    assert models.calls == 1
+
+def test_unavailable_is_retried_then_returns_503(monkeypatch):
+    """Test that 5xx responses are retried up to the attempt limit."""
+    use_fast_retries(monkeypatch)
+    models = install_fake_gemini(monkeypatch)
+    models.error = api_error(503, "UNAVAILABLE")
+
+    response = client.post("/api/chat", json={"api_key": VALID_API_KEY, "webpage_content": "Page", "query": "Down?"})
+    assert response.status_code == 503
+    assert response.json()["kind"] == "unavailable"
+    assert models.calls == settings.GEMINI_MAX_ATTEMPTS
+
+def test_quota_error_without_fallback_returns_429(monkeypatch):
+    """Test that exhausting every model's quota answers 429 with the upstream delay."""
+    use_fast_retries(monkeypatch)
+    models = install_fake_gemini(monkeypatch)
+    models.error = api_error(
+        429, "RESOURCE_EXHAUSTED", details=[{"@type": "type.googleapis.com/google.rpc.RetryInfo", "retryDelay": "12.5s"}]
+    )
+
+    response = client.post("/api/chat", json={"api_key": VALID_API_KEY, "webpage_content": "Page", "query": "Quota?"})
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "13"
+    # Each model was tried once, without retries
+    assert models.calls == 2
+
+def test_stream_failure_before_output_returns_status(monkeypatch):
+    """Test that the stream endpoint reports an auth failure as a 401, not an SSE error."""
+    use_fast_retries(monkeypatch)
+    models = install_fake_gemini(monkeypatch)
+    models.error = api_error(403, "PERMISSION_DENIED")
+
+    response = client.post(
+        "/api/chat/stream", json={"api_key": VALID_API_KEY, "webpage_content": "Page", "query": "Stream?"}
+    )
+    assert response.status_code == 401
+    assert response.json()["kind"] == "auth"
+    assert models.calls == 1
+
+def test_suggestions_report_auth_errors(monkeypatch):
+    """Test that suggestions raise errors the caller must fix instead of returning defaults."""
+    use_fast_retries(monkeypatch)
+    models = install_fake_gemini(monkeypatch)
+    models.error = api_error(401, "UNAUTHENTICATED")
+
+    response = client.post(
+        "/api/suggest-questions", json={"api_key": VALID_API_KEY, "webpage_content": "Auth page", "count": 3}
+    )
+    assert response.status_code == 401
@@ -0,0 +1,109 @@
+from collections import OrderedDict
+from fastapi.testclient import TestClient
+from google.genai import errors
+from prometheus_client.parser import text_string_to_metric_families
+from main import app
+from app.core.config import settings
+from app.services.model_router import model_router
+from tests.fake_gemini import install_fake_gemini
+
+client = TestClient(app)
+
+VALID_API_KEY = "AIzaSyFakeKeyForTests_0123456789"
+
+def scrape() -> dict:
+    """Get the current samples as {(name, sorted labels): value}."""
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert VALID_API_KEY not in response.text
+    return {
+        (sample.name, tuple(sorted(sample.labels.items()))): sample.value
+        for family in text_string_to_metric_families(response.text)
+        for sample in family.samples
+    }
+
+def sample_delta(before: dict, after: dict, name: str, **labels) -> float:
+    key = (name, tuple(sorted(labels.items())))
+    return after.get(key, 0.0) - before.get(key, 0.0)
+
+def test_chat_records_request_upstream_and_estimation_metrics(monkeypatch):
+    """Test the request, upstream call and token estimation histograms."""
+    install_fake_gemini(monkeypatch)
+    before = scrape()
+    client.post("/api/chat", json={"api_key": VALID_API_KEY, "webpage_content": "Metrics page", "query": "Timed?"})
+    client.get("/no-such-path")
+    after = scrape()
+
+    assert sample_delta(
+        before, after, "http_request_duration_seconds_count", method="POST", handler="chat", status="200"
+    ) == 1
+    assert sample_delta(
+        before, after, "http_request_duration_seconds_count", method="GET", handler="unmatched", status="404"
+    ) == 1
+    assert sample_delta(
+        before, after, "gemini_request_duration_seconds_count", model=settings.PRIMARY_MODEL, outcome="ok"
+    ) == 1
+    assert sum(
+        sample_delta(before, after, "token_estimation_duration_seconds_count", method=method)
+        for method in ("bounded", "encode", "approximate")
+    ) >= 2
+
+def test_stream_records_first_token_and_usage(monkeypatch):
+    """Test the time-to-first-token and token count histograms."""
+    install_fake_gemini(monkeypatch, text="Streamed metrics answer")
+    before = scrape()
+    client.post("/api/chat/stream", json={"api_key": VALID_API_KEY, "webpage_content": "Page", "query": "Stream?"})
+    after = scrape()
+
+    model = settings.PRIMARY_MODEL
+    assert sample_delta(before, after, "gemini_time_to_first_token_seconds_count", model=model) == 1
+    assert sample_delta(before, after, "gemini_prompt_tokens_sum", model=model) == 10
+    assert sample_delta(before, after, "gemini_response_tokens_sum", model=model) == 3
+
+def test_retries_errors_and_cache_hits_are_counted(monkeypatch):
+    """Test the retry and error counters and the cache counters from component stats."""
+    monkeypatch.setattr(settings, "GEMINI_RETRY_MAX_WAIT", 0)
+    monkeypatch.setattr(model_router, "health", {})
+    models = install_fake_gemini(monkeypatch)
+    models.error = errors.ServerError(503, {"error": {"code": 503, "message": "Overloaded", "status": "UNAVAILABLE"}})
+    page_id = client.post("/api/pages", json={"api_key": VALID_API_KEY, "webpage_content": "Cached page"}).json()["page_id"]
+
+    before = scrape()
+    client.post("/api/chat", json={"api_key": VALID_API_KEY, "page_id": page_id, "query": "Retried?"})
+    after = scrape()
+
+    assert sample_delta(before, after, "gemini_retries_total") == settings.GEMINI_MAX_ATTEMPTS - 1
+    assert sample_delta(
+        before, after, "gemini_errors_total", model=settings.PRIMARY_MODEL, kind="unavailable"
+    ) == settings.GEMINI_MAX_ATTEMPTS
+    assert sample_delta(before, after, "cache_hits_total", cache="page_store") == 1
+
+def test_routing_decisions_and_failovers_are_counted(monkeypatch):
+    """Test the routing decision and failover counters from the model router's stats."""
+    monkeypatch.setattr(settings, "GEMINI_RETRY_MAX_WAIT", 0)
+    monkeypatch.setattr(model_router, "health", {})
+    monkeypatch.setattr(model_router, "_cooldowns", OrderedDict())
+    models = install_fake_gemini(monkeypatch)
+    models.model_errors[settings.PRIMARY_MODEL] = errors.ClientError(
+        429, {"error": {"code": 429, "message": "Resource has been exhausted", "status": "RESOURCE_EXHAUSTED"}}
+    )
+
+    before = scrape()
+    client.post("/api/chat", json={"api_key": VALID_API_KEY, "webpage_content": "Routed page", "query": "Routed?"})
+    after = scrape()
+
+    decisions = {
+        labels: after[(name, labels)] - before.get((name, labels), 0.0)
+        for name, labels in after
+        if name == "router_decisions_total"
+    }
+    assert sum(decisions.values()) == 1
+    (labels,) = [labels for labels, delta in decisions.items() if delta == 1]
+    assert dict(labels)["task"] == "chat"
+    assert dict(labels)["model"] == settings.PRIMARY_MODEL
+    # The token count the decision was made on
+    assert sample_delta(before, after, "router_decision_tokens_count", **dict(labels)) == 1
+    assert sample_delta(before, after, "router_decision_tokens_bucket", le="100.0", **dict(labels)) == 1
+    assert sample_delta(
+        before, after, "router_failovers_total", **{"from": settings.PRIMARY_MODEL, "to": settings.FALLBACK_MODEL}
+    ) == 1
@@ -0,0 +1,185 @@
+from collections import Counter, OrderedDict
+import pytest
+from fastapi.testclient import TestClient
+from google.genai import errors
+from main import app
+from app.core.config import settings
+from app.services import gemini_service
+from app.services.gemini_service import gemini_retry_decorator
+from app.services.model_router import (
+    TASK_CHAT,
+    TASK_SUGGESTIONS,
+    LatencyPolicy,
+    ModelRouter,
+    RoutingPolicy,
+    model_router,
+)
+from tests.fake_gemini import install_fake_gemini
+from tests.test_streaming import parse_sse
+
+client = TestClient(app)
+
+VALID_API_KEY = "AIzaSyFakeKeyForTests_0123456789"
+OTHER_API_KEY = "AIzaSyFakeKeyForTests_9876543210"
+
+QUOTA_ERROR = errors.ClientError(
+    429, {"error": {"code": 429, "message": "Resource has been exhausted", "status": "RESOURCE_EXHAUSTED"}}
+)
+AUTH_ERROR = errors.ClientError(
+    403, {"error": {"code": 403, "message": "Permission denied", "status": "PERMISSION_DENIED"}}
+)
+UNAVAILABLE_ERROR = errors.ServerError(
+    503, {"error": {"code": 503, "message": "The model is overloaded", "status": "UNAVAILABLE"}}
+)
+
+def make_router(**kwargs) -> ModelRouter:
+    return ModelRouter("primary", "fallback", token_limits={"primary": 1000}, **kwargs)
+
+def test_route_applies_token_limit_and_task_models():
+    """Test the token limit rule and a task-specific model."""
+    router = make_router(task_models={TASK_SUGGESTIONS: "lite"})
+
+    decision = router.route(TASK_CHAT, 500)
+    assert (decision.models, decision.reason) == (["primary", "fallback"], "default")
+
+    decision = router.route(TASK_CHAT, 5000)
+    assert (decision.models, decision.reason) == (["fallback"], "token_limit")
+
+    decision = router.route(TASK_SUGGESTIONS, 500)
+    assert (decision.model, decision.fallbacks, decision.reason) == ("lite", ["primary", "fallback"], "task")
+
+    assert router.stats()["decisions"][0] == {"task": "chat", "model": "fallback", "reason": "token_limit", "count": 1}
+
+def test_quota_error_cools_model_down_for_the_key():
+    """Test that a 429 moves a model to the end for that key until its cooldown ends."""
+    now = [0.0]
+    router = make_router(quota_cooldown=60, clock=lambda: now[0])
+    router.record("primary", 1.0, QUOTA_ERROR, VALID_API_KEY)
+
+    decision = router.route(TASK_CHAT, 500, VALID_API_KEY)
+    assert (decision.models, decision.reason) == (["fallback", "primary"], "quota_cooldown")
+    assert router.stats()["keys_cooling_down"] == 1
+
+    now[0] = 61.0
+    assert router.route(TASK_CHAT, 500, VALID_API_KEY).model == "primary"
+    assert router.stats()["keys_cooling_down"] == 0
+
+def test_quota_error_of_one_key_does_not_reroute_others():
+    """Test that key A running out of quota leaves key B on the primary model."""
+    router = make_router()
+    router.record("primary", 1.0, QUOTA_ERROR, VALID_API_KEY)
+    assert router.route(TASK_CHAT, 500, VALID_API_KEY).model == "fallback"
+
+    decision = router.route(TASK_CHAT, 500, OTHER_API_KEY)
+    assert (decision.model, decision.reason) == ("primary", "default")
+    assert router.stats()["models"]["primary"]["error_rate_ewma"] == 0.0
+
+def test_key_errors_do_not_mark_model_unhealthy():
+    """Test that auth errors of one key don't move the shared error rate, but server errors do."""
+    router = make_router(policy=LatencyPolicy(max_error_rate=0.5), ewma_alpha=0.5)
+    router.record("primary", 0.5)
+    router.record("fallback", 2.0)
+    for _ in range(3):
+        router.record("primary", 0.1, AUTH_ERROR, VALID_API_KEY)
+    assert router.stats()["models"]["primary"]["key_errors"] == 3
+    assert router.route(TASK_CHAT, 500, OTHER_API_KEY).model == "primary"
+
+    for _ in range(3):
+        router.record("primary", 0.1, UNAVAILABLE_ERROR, VALID_API_KEY)
+    assert router.route(TASK_CHAT, 500, OTHER_API_KEY).model == "fallback"
+
+def test_policies_must_implement_order():
+    """Test that a policy without an order method can't be created."""
+    class UnfinishedPolicy(RoutingPolicy):
+        name = "unfinished"
+
+    with pytest.raises(TypeError):
+        UnfinishedPolicy()
+
+def test_latency_policy_prefers_fast_healthy_models():
+    """Test that the latency policy ranks by EWMA latency and skips failing models."""
+    router = make_router(policy=LatencyPolicy(max_error_rate=0.5), ewma_alpha=0.5)
+    router.record("primary", 2.0)
+    router.record("fallback", 0.5)
+    decision = router.route(TASK_CHAT, 500)
+    assert (decision.model, decision.reason) == ("fallback", "latency")
+
+    for _ in range(3):
+        router.record("fallback", 0.5, RuntimeError("boom"))
+    assert router.stats()["models"]["fallback"]["error_rate_ewma"] > 0.5
+    assert router.route(TASK_CHAT, 500).model == "primary"
+
+def reset_router(monkeypatch):
+    monkeypatch.setattr(model_router, "health", {})
+    monkeypatch.setattr(model_router, "_cooldowns", OrderedDict())
+    monkeypatch.setattr(model_router, "decisions", Counter())
+    monkeypatch.setattr(model_router, "failovers", Counter())
+    # Fail over straight away instead of retrying with backoff first
+    monkeypatch.setattr(gemini_service, "gemini_retry_decorator", lambda: (lambda func: func))
+
+def test_chat_fails_over_on_quota_error(monkeypatch):
+    """Test that a 429 from the primary model is answered by the fallback model."""
+    reset_router(monkeypatch)
+    models = install_fake_gemini(monkeypatch)
+    models.model_errors[settings.PRIMARY_MODEL] = QUOTA_ERROR
+
+    response = client.post(
+        "/api/chat",
+        json={"api_key": VALID_API_KEY, "webpage_content": "Quota page", "query": "Failover?"}
+    )
+    assert response.json() == {"text": "Fake Gemini answer"}
+    assert models.last_model == settings.FALLBACK_MODEL
+
+    stats = client.get("/api/stats").json()["model_router"]
+    assert stats["failovers"] == [{"from": settings.PRIMARY_MODEL, "to": settings.FALLBACK_MODEL, "count": 1}]
+    assert stats["models"][settings.PRIMARY_MODEL]["quota_errors"] == 1
+
+    # The next request goes to the fallback model straight away
+    models.calls = 0
+    client.post("/api/chat", json={"api_key": VALID_API_KEY, "webpage_content": "Quota page", "query": "Again?"})
+    assert models.calls == 1
+    assert model_router.decisions[(TASK_CHAT, settings.FALLBACK_MODEL, "quota_cooldown")] == 1
+
+    # Other keys keep using the primary model
+    del models.model_errors[settings.PRIMARY_MODEL]
+    client.post("/api/chat", json={"api_key": OTHER_API_KEY, "webpage_content": "Quota page", "query": "Mine?"})
+    assert models.last_model == settings.PRIMARY_MODEL
+
+def test_retries_stay_on_the_fallback_model(monkeypatch):
+    """Test that a transient error on the fallback model is retried there, not from the primary model again."""
+    reset_router(monkeypatch)
+    monkeypatch.setattr(gemini_service, "gemini_retry_decorator", gemini_retry_decorator)
+    monkeypatch.setattr(settings, "GEMINI_RETRY_MAX_WAIT", 0)
+    models = install_fake_gemini(monkeypatch)
+    models.model_errors[settings.PRIMARY_MODEL] = QUOTA_ERROR
+    models.model_errors[settings.FALLBACK_MODEL] = UNAVAILABLE_ERROR
+    called = []
+    generate_content = models.generate_content
+
+    async def generate_content_once_unavailable(*, model, contents, config=None):
+        called.append(model)
+        if model == settings.FALLBACK_MODEL and called.count(model) > 1:
+            models.model_errors.pop(model, None)
+        return await generate_content(model=model, contents=contents, config=config)
+
+    monkeypatch.setattr(models, "generate_content", generate_content_once_unavailable)
+    response = client.post(
+        "/api/chat", json={"api_key": VALID_API_KEY, "webpage_content": "Retried page", "query": "Retried?"}
+    )
+    assert response.json() == {"text": "Fake Gemini answer"}
+    assert called == [settings.PRIMARY_MODEL, settings.FALLBACK_MODEL, settings.FALLBACK_MODEL]
+    assert model_router.health[settings.PRIMARY_MODEL].quota_errors == 1
+
+def test_stream_fails_over_before_output(monkeypatch):
+    """Test that the stream fails over and reports the model that answered."""
+    reset_router(monkeypatch)
+    models = install_fake_gemini(monkeypatch)
+    models.model_errors[settings.PRIMARY_MODEL] = QUOTA_ERROR
+
+    response = client.post(
+        "/api/chat/stream",
+        json={"api_key": VALID_API_KEY, "webpage_content": "Quota page", "query": "Stream failover?"}
+    )
+    events = parse_sse(response.text)
+    assert events[-1] == ("done", {"model": settings.FALLBACK_MODEL})
+    assert model_router.stats()["models"][settings.FALLBACK_MODEL]["calls"] == 1
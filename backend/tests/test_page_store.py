@@ -0,0 +1,103 @@
+import asyncio
+import hashlib
+from fastapi.testclient import TestClient
+from main import app
+from app.api import routes
+from app.models.request_models import PageContentRequest
+from app.services import token_estimator
+from app.services.page_store import PageStore
+from tests.fake_gemini import install_fake_gemini
+
+client = TestClient(app)
+
+VALID_API_KEY = "AIzaSyFakeKeyForTests_0123456789"
+
+def test_register_page_returns_content_digest():
+    """Test that registering a page returns the SHA-256 of its content."""
+    content = "Registered page content"
+    response = client.post("/api/pages", json={"api_key": VALID_API_KEY, "webpage_content": content})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["page_id"] == hashlib.sha256(content.encode("utf-8")).hexdigest()
+    assert body["token_count"] > 0
+    assert body["size"] == len(content)
+
+class OneTokenPerCharacter:
+    def encode_ordinary(self, text):
+        return list(text)
+
+def test_inline_pages_are_counted_like_registered_pages(monkeypatch):
+    """Test that an inline non-ASCII page gets the same full token count as its registered copy."""
+    monkeypatch.setattr(token_estimator, "get_encoding", lambda: OneTokenPerCharacter())
+    content = "缓存的页面内容" * 1000
+    registered = client.post("/api/pages", json={"api_key": VALID_API_KEY, "webpage_content": content}).json()
+    inline = asyncio.run(routes._resolve_page(PageContentRequest(webpage_content=content)))
+    assert inline.token_count == registered["token_count"] == len(content)
+
+def test_chat_with_page_id(monkeypatch):
+    """Test that chat accepts a registered page digest instead of the content."""
+    install_fake_gemini(monkeypatch)
+    page_id = client.post(
+        "/api/pages", json={"api_key": VALID_API_KEY, "webpage_content": "Some content"}
+    ).json()["page_id"]
+    response = client.post("/api/chat", json={"api_key": VALID_API_KEY, "page_id": page_id, "query": "Summarize"})
+    assert response.status_code == 200
+    assert response.json() == {"text": "Fake Gemini answer"}
+
+def test_chat_with_unknown_page_id():
+    """Test that an unknown page digest is reported as not found."""
+    response = client.post("/api/chat", json={"api_key": VALID_API_KEY, "page_id": "0" * 64, "query": "Summarize"})
+    assert response.status_code == 404
+
+def test_chat_requires_content_or_page_id():
+    """Test that a request with neither content nor page_id is rejected."""
+    response = client.post("/api/chat", json={"api_key": VALID_API_KEY, "query": "Summarize"})
+    assert response.status_code == 422
+
+def test_store_evicts_least_recently_used():
+    """Test that the store stays within its size bound, evicting LRU pages."""
+    store = PageStore(max_bytes=25)
+
+    async def scenario():
+        first = await store.register("a" * 10)
+        second = await store.register("b" * 10)
+        await store.get(first.page_id)
+        await store.register("c" * 10)  # evicts the second page
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert asyncio.run(store.get(first.page_id)) is not None
+    assert asyncio.run(store.get(second.page_id)) is None
+    assert store.stats()["evictions"] == 1
+
+def test_store_bounds_utf8_bytes_not_characters():
+    """Test that non-ASCII pages count their encoded size against the bound."""
+    store = PageStore(max_bytes=50)
+
+    async def scenario():
+        first = await store.register("é" * 20)  # 40 bytes
+        second = await store.register("ü" * 20)  # evicts the first page
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert second.size == 40
+    assert asyncio.run(store.get(first.page_id)) is None
+    assert store.stats()["size"] == 40
+
+    body = client.post("/api/pages", json={"api_key": VALID_API_KEY, "webpage_content": "缓存" * 10}).json()
+    assert body["size"] == 60
+
+def test_store_spills_evicted_pages_to_disk(tmp_path):
+    """Test that evicted pages are reloaded from the spill directory."""
+    store = PageStore(max_bytes=15, spill_dir=str(tmp_path))
+
+    async def scenario():
+        first = await store.register("a" * 10)
+        await store.register("b" * 10)  # evicts and spills the first page
+        return first, await store.get(first.page_id)
+
+    first, reloaded = asyncio.run(scenario())
+    assert reloaded is not None
+    assert reloaded.content == "a" * 10
+    assert reloaded.token_count == first.token_count
+    assert store.stats()["spill_hits"] == 1
@@ -0,0 +1,140 @@
+import time
+from fastapi.testclient import TestClient
+from main import app
+from app.api import routes
+from app.core.config import settings
+from app.services import gemini_service, prefetch
+from app.services.prefetch import Prefetcher, normalize_query
+from app.services.response_cache import ResponseCache
+from tests.fake_gemini import install_fake_gemini
+
+VALID_API_KEY = "AIzaSyFakeKeyForTests_0123456789"
+QUESTIONS = '["Question one?", "Question two?", "Question three?"]'
+
+def use_prefetcher(monkeypatch, **kwargs) -> Prefetcher:
+    prefetcher = Prefetcher(enabled=True, **kwargs)
+    monkeypatch.setattr(routes, "prefetcher", prefetcher)
+    monkeypatch.setattr(
+        gemini_service, "suggestion_cache", ResponseCache(cacheable=gemini_service._is_real_suggestions)
+    )
+    return prefetcher
+
+def wait_for(prefetcher: Prefetcher, timeout: float = 5.0) -> None:
+    # The prefetch tasks run on the test client's event loop thread
+    deadline = time.monotonic() + timeout
+    while prefetcher.stats()["in_flight"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+def register(client: TestClient, content: str) -> str:
+    response = client.post("/api/pages", json={"api_key": VALID_API_KEY, "webpage_content": content})
+    assert response.status_code == 200
+    return response.json()["page_id"]
+
+def test_prefetch_is_off_by_default(monkeypatch):
+    """Test that registering a page calls Gemini only when prefetch is enabled."""
+    models = install_fake_gemini(monkeypatch)
+    assert settings.PREFETCH_ENABLED is False
+    assert prefetch.prefetcher.enabled is False
+    with TestClient(app) as client:
+        register(client, "Page that is not prefetched")
+    assert models.calls == 0
+
+def test_registered_page_summary_and_suggestions_are_prefetched(monkeypatch):
+    """Test that the first summary and suggestion requests after registration are served without Gemini calls."""
+    models = install_fake_gemini(monkeypatch, text=QUESTIONS)
+    prefetcher = use_prefetcher(monkeypatch)
+    with TestClient(app) as client:
+        page_id = register(client, "Page whose summary is prefetched")
+        wait_for(prefetcher)
+        assert models.calls == 2
+
+        # Case, whitespace and trailing punctuation don't matter
+        response = client.post(
+            "/api/chat", json={"api_key": VALID_API_KEY, "page_id": page_id, "query": "  summarize this page. "}
+        )
+        assert response.status_code == 200
+        assert response.json() == {"text": QUESTIONS}
+
+        response = client.post("/api/suggest-questions", json={"api_key": VALID_API_KEY, "page_id": page_id, "count": 3})
+        assert response.json()["questions"] == ["Question one?", "Question two?", "Question three?"]
+
+        # Other questions still go to Gemini
+        client.post("/api/chat", json={"api_key": VALID_API_KEY, "page_id": page_id, "query": "Who wrote it?"})
+    assert models.calls == 3
+    assert prefetcher.stats()["served"] == 1
+
+def test_prefetched_summary_is_only_served_to_its_key(monkeypatch):
+    """Test that another key asking for the summary of the same page makes its own Gemini call."""
+    models = install_fake_gemini(monkeypatch)
+    prefetcher = use_prefetcher(monkeypatch, suggestion_count=0)
+    with TestClient(app) as client:
+        page_id = register(client, "Page prefetched with someone else's key")
+        wait_for(prefetcher)
+        response = client.post(
+            "/api/chat",
+            json={"api_key": VALID_API_KEY[:-1] + "X", "page_id": page_id, "query": "Summarize this page"},
+        )
+    assert response.status_code == 200
+    assert models.calls == 2
+    assert prefetcher.stats()["served"] == 0
+
+def test_summary_joins_the_prefetch_in_flight(monkeypatch):
+    """Test that a summary request arriving during the prefetch waits for it instead of calling Gemini again."""
+    models = install_fake_gemini(monkeypatch, latency=0.2)
+    prefetcher = use_prefetcher(monkeypatch, suggestion_count=0)
+    with TestClient(app) as client:
+        page_id = register(client, "Page summarized while the user clicks")
+        response = client.post(
+            "/api/chat", json={"api_key": VALID_API_KEY, "page_id": page_id, "query": "Summarize this page"}
+        )
+    assert response.json() == {"text": "Fake Gemini answer"}
+    assert models.calls == 1
+    assert prefetcher.stats()["served"] == 1
+
+def test_suggest_questions_prefetches_the_summary(monkeypatch):
+    """Test that a suggestions request for inline content prefetches the summary of that content."""
+    models = install_fake_gemini(monkeypatch, text=QUESTIONS)
+    prefetcher = use_prefetcher(monkeypatch)
+    content = "Inline page sent for suggestions"
+    with TestClient(app) as client:
+        client.post("/api/suggest-questions", json={"api_key": VALID_API_KEY, "webpage_content": content, "count": 3})
+        wait_for(prefetcher)
+        response = client.post(
+            "/api/chat", json={"api_key": VALID_API_KEY, "webpage_content": content, "query": "Summarize this page"}
+        )
+    assert response.status_code == 200
+    assert models.calls == 2
+
+def test_prefetch_budget_is_per_key(monkeypatch):
+    """Test that prefetching stops once a key has spent its budget, without touching other keys."""
+    models = install_fake_gemini(monkeypatch, text=QUESTIONS)
+    prefetcher = use_prefetcher(monkeypatch, budget=2, budget_window=3600)
+    other_key = VALID_API_KEY[:-1] + "X"
+    with TestClient(app) as client:
+        register(client, "First page within the budget")
+        wait_for(prefetcher)
+        register(client, "Second page over the budget")
+        wait_for(prefetcher)
+        client.post("/api/pages", json={"api_key": other_key, "webpage_content": "Page of another key"})
+        wait_for(prefetcher)
+    assert models.calls == 4
+    assert prefetcher.stats()["skipped"]["budget"] == 2
+
+def test_prefetch_never_queues_for_the_rate_limit(monkeypatch):
+    """Test that a prefetch is skipped when the key has no rate limit token free right away."""
+    models = install_fake_gemini(monkeypatch)
+    prefetcher = use_prefetcher(monkeypatch, suggestion_count=0)
+    monkeypatch.setattr(routes.rate_limiter, "enabled", True)
+    monkeypatch.setattr(routes.rate_limiter, "burst", 1.0)
+    monkeypatch.setattr(routes.rate_limiter, "rate", 0.001)
+    with TestClient(app) as client:
+        client.post("/api/chat", json={"api_key": VALID_API_KEY, "webpage_content": "Used up", "query": "Why?"})
+        register(client, "Page registered without rate limit room")
+        wait_for(prefetcher)
+    assert models.calls == 1
+    assert prefetcher.stats()["skipped"]["rate"] == 1
+
+def test_normalize_query():
+    """Test that queries differing only in case, spacing and final punctuation match."""
+    assert normalize_query("  Summarize   THIS page?! ") == normalize_query("summarize this page")
+    assert normalize_query("Summarize this section") != normalize_query("Summarize this page")
@@ -0,0 +1,138 @@
+import asyncio
+import pytest
+from fastapi.testclient import TestClient
+from main import app
+from app.services.rate_limiter import RateLimiter, RateLimitExceeded, rate_limiter
+from tests.fake_gemini import install_fake_gemini
+
+client = TestClient(app)
+
+VALID_API_KEY = "AIzaSyFakeKeyForTests_0123456789"
+OTHER_API_KEY = "AIzaSyFakeKeyForTests_9876543210"
+
+class FakeClock:
+    """A clock that only moves when the test advances it; sleeps are recorded."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    async def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+
+def make_limiter(clock: FakeClock, **kwargs) -> RateLimiter:
+    options = {"rate": 2.0, "burst": 2.0, "max_wait": 1.0, "clock": clock, "sleep": clock.sleep}
+    options.update(kwargs)
+    return RateLimiter(**options)
+
+def test_bucket_queues_then_rejects_with_retry_after():
+    """Test that requests beyond the burst wait their turn, then fail fast."""
+    clock = FakeClock()
+    limiter = make_limiter(clock)
+
+    async def run():
+        for _ in range(4):
+            (await limiter.acquire(VALID_API_KEY)).release()
+        # Requests beyond the burst are spaced out at the refill rate of 2 per second
+        assert clock.sleeps == [0.5, 1.0]
+
+        # The next token is 1.5 s away, beyond the 1 s the limiter may wait
+        with pytest.raises(RateLimitExceeded) as excinfo:
+            await limiter.acquire(VALID_API_KEY)
+        assert excinfo.value.reason == "rate"
+        assert excinfo.value.retry_after == 1.5
+
+        clock.now += 1.5
+        (await limiter.acquire(VALID_API_KEY)).release()
+
+        # Other keys have their own bucket
+        (await limiter.acquire(OTHER_API_KEY)).release()
+
+    asyncio.run(run())
+    assert limiter.stats()["rejected"]["rate"] == 1
+    assert limiter.stats()["queued"] == 2
+
+def test_quota_error_halves_concurrency_and_successes_raise_it():
+    """Test the AIMD adjustment of a key's concurrency limit."""
+    clock = FakeClock()
+    limiter = make_limiter(clock, rate=1000.0, burst=1000.0, initial_concurrency=8.0, decrease_interval=1.0)
+
+    async def run():
+        limiter.record_quota_error(VALID_API_KEY)
+        # Errors of calls that were in flight together only count once
+        limiter.record_quota_error(VALID_API_KEY)
+        assert limiter._state(VALID_API_KEY).concurrency.limit == 4.0
+
+        clock.now += 10.0
+        for _ in range(8):
+            (await limiter.acquire(VALID_API_KEY)).release()
+
+    asyncio.run(run())
+    assert 5.0 < limiter._state(VALID_API_KEY).concurrency.limit < 6.0
+    assert limiter.stats()["decreases"] == 1
+
+def test_permits_held_during_a_quota_error_do_not_increase_the_limit():
+    """Test that requests overlapping a quota error don't undo the decrease."""
+    clock = FakeClock()
+    limiter = make_limiter(clock, initial_concurrency=4.0)
+
+    async def run():
+        permit = await limiter.acquire(VALID_API_KEY)
+        limiter.record_quota_error(VALID_API_KEY)
+        permit.release()
+        permit.release()
+
+    asyncio.run(run())
+    assert limiter._state(VALID_API_KEY).concurrency.limit == 2.0
+    assert limiter.stats()["global_in_flight"] == 0
+
+def test_concurrency_limits_queue_and_time_out():
+    """Test the per-key and global concurrency limits."""
+    limiter = RateLimiter(
+        rate=1000.0, burst=1000.0, max_wait=0.05, initial_concurrency=1.0, max_concurrency=1.0, global_concurrency=2
+    )
+
+    async def run():
+        first = await limiter.acquire(VALID_API_KEY)
+        # A waiter gets the slot as soon as it is released
+        waiter = asyncio.create_task(limiter.acquire(VALID_API_KEY))
+        await asyncio.sleep(0)
+        first.release()
+        second = await waiter
+
+        with pytest.raises(RateLimitExceeded) as excinfo:
+            await limiter.acquire(VALID_API_KEY)
+        assert excinfo.value.reason == "key_concurrency"
+
+        other = await limiter.acquire(OTHER_API_KEY)
+        with pytest.raises(RateLimitExceeded) as excinfo:
+            await limiter.acquire("AIzaSyFakeKeyForTests_5555555555")
+        assert excinfo.value.reason == "global_concurrency"
+        second.release()
+        other.release()
+
+    asyncio.run(run())
+    assert limiter.stats()["global_in_flight"] == 0
+
+def test_api_returns_429_with_retry_after(monkeypatch):
+    """Test that a key over its rate limit gets a fast 429 instead of an upstream call."""
+    models = install_fake_gemini(monkeypatch)
+    monkeypatch.setattr(rate_limiter, "enabled", True)
+    monkeypatch.setattr(rate_limiter, "burst", 1.0)
+    monkeypatch.setattr(rate_limiter, "rate", 0.1)
+    monkeypatch.setattr(rate_limiter, "max_wait", 0.0)
+
+    payload = {"api_key": VALID_API_KEY, "webpage_content": "Limited page", "query": "First?"}
+    assert client.post("/api/chat", json=payload).status_code == 200
+
+    response = client.post("/api/chat", json={**payload, "query": "Second?"})
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) == 10
+    assert models.calls == 1
+
+    response = client.post("/api/chat/stream", json={**payload, "query": "Third?"})
+    assert response.status_code == 429
+    assert client.get("/api/stats").json()["rate_limiter"]["rejected"]["rate"] >= 2
@@ -0,0 +1,90 @@
+import gzip
+import json
+import zlib
+import brotli
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from main import app
+from app.core.request_body import DECOMPRESS_STEP_BYTES, RequestBodyMiddleware, _BrotliDecoder
+from tests.fake_gemini import install_fake_gemini
+
+client = TestClient(app)
+
+VALID_API_KEY = "AIzaSyFakeKeyForTests_0123456789"
+
+def make_echo_client(max_body_bytes: int) -> TestClient:
+    echo_app = FastAPI()
+    echo_app.add_middleware(RequestBodyMiddleware, max_body_bytes=max_body_bytes)
+
+    @echo_app.post("/echo")
+    async def echo(request: Request):
+        body = await request.body()
+        return {"size": len(body), "encoding": request.headers.get("content-encoding")}
+
+    return TestClient(echo_app)
+
+def test_rejects_declared_oversized_body():
+    """Test that a Content-Length over the limit is rejected with 413."""
+    response = make_echo_client(100).post("/echo", content=b"x" * 101)
+    assert response.status_code == 413
+    assert make_echo_client(100).post("/echo", content=b"x" * 100).json()["size"] == 100
+
+def test_rejects_streamed_oversized_body():
+    """Test that chunked bodies without Content-Length are counted as they arrive."""
+    chunks = (b"x" * 40 for _ in range(3))
+    response = make_echo_client(100).post("/echo", content=chunks)
+    assert response.status_code == 413
+
+def test_decodes_gzip_and_deflate_bodies():
+    """Test that compressed bodies reach the app decoded, without the encoding header."""
+    body = b"webpage text " * 50_000
+    echo = make_echo_client(len(body))
+    for encoding, compressed in (("gzip", gzip.compress(body)), ("deflate", zlib.compress(body))):
+        response = echo.post("/echo", content=compressed, headers={"Content-Encoding": encoding})
+        assert response.json() == {"size": len(body), "encoding": None}
+
+def test_rejects_compressed_body_expanding_over_limit():
+    """Test that the decompressed size is held to the limit (zip bombs)."""
+    bomb = gzip.compress(b"\0" * 10_000_000)
+    response = make_echo_client(1_000_000).post("/echo", content=bomb, headers={"Content-Encoding": "gzip"})
+    assert response.status_code == 413
+
+def test_decodes_brotli_bodies_in_bounded_steps():
+    """Test that brotli bodies are decoded, and no decode step grows far past the step size."""
+    body = b"webpage text " * 500_000
+    compressed = brotli.compress(body)
+    response = make_echo_client(len(body)).post("/echo", content=compressed, headers={"Content-Encoding": "br"})
+    assert response.json() == {"size": len(body), "encoding": None}
+
+    decoder = _BrotliDecoder()
+    steps = [decoder.decode(compressed, DECOMPRESS_STEP_BYTES)]
+    while decoder.has_output:
+        steps.append(decoder.decode(b"", DECOMPRESS_STEP_BYTES))
+    assert b"".join(steps) == body
+    # The bindings may fill up to one buffer block past the limit
+    assert max(len(step) for step in steps) <= 2 * DECOMPRESS_STEP_BYTES
+
+def test_rejects_brotli_body_expanding_over_limit():
+    """Test that a brotli bomb is stopped at the limit."""
+    bomb = brotli.compress(b"\0" * 20_000_000, quality=5)
+    assert len(bomb) < 1000
+    response = make_echo_client(1_000_000).post("/echo", content=bomb, headers={"Content-Encoding": "br"})
+    assert response.status_code == 413
+
+def test_rejects_invalid_and_unknown_encodings():
+    """Test that corrupt and unsupported compressed bodies are client errors."""
+    echo = make_echo_client(1000)
+    assert echo.post("/echo", content=b"not gzip", headers={"Content-Encoding": "gzip"}).status_code == 400
+    assert echo.post("/echo", content=b"data", headers={"Content-Encoding": "zstd-x"}).status_code == 415
+
+def test_chat_accepts_gzip_body(monkeypatch):
+    """Test a gzip-compressed chat request end to end."""
+    install_fake_gemini(monkeypatch)
+    payload = {"api_key": VALID_API_KEY, "webpage_content": "Compressed page " * 1000, "query": "Compressed?"}
+    response = client.post(
+        "/api/chat",
+        content=gzip.compress(json.dumps(payload).encode()),
+        headers={"Content-Type": "application/json", "Content-Encoding": "gzip"}
+    )
+    assert response.status_code == 200
+    assert response.json() == {"text": "Fake Gemini answer"}
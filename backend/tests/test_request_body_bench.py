@@ -0,0 +1,93 @@
+# Memory benchmark for chat requests carrying 1, 10 and 50 MB pages.
+# The 1 MB run is part of the default suite; opt in to the larger ones and see the peaks with
+# `RUN_BENCHMARKS=true pytest --log-cli-level=INFO tests/test_request_body_bench.py`.
+import asyncio
+import json
+import logging
+import tracemalloc
+import pytest
+from main import app
+from tests.fake_gemini import install_fake_gemini
+
+VALID_API_KEY = "AIzaSyFakeKeyForTests_0123456789"
+
+SIZES = {
+    "1MB": 1_000_000,
+    "10MB": 10_000_000,
+    "50MB": 50_000_000,
+}
+
+# Too slow and memory hungry for every test run
+BENCH_SIZES = {"10MB", "50MB"}
+
+logger = logging.getLogger(__name__)
+
+# Size of the body chunks handed to the app, as a server would
+CHUNK_BYTES = 64 * 1024
+
+SAMPLE = "The quick brown fox jumps over the lazy dog. Lorem ipsum dolor sit amet, 42! "
+
+def make_body(size: int) -> bytes:
+    page = (SAMPLE * (size // len(SAMPLE) + 1))[:size]
+    return json.dumps({"api_key": VALID_API_KEY, "webpage_content": page, "query": "Peak memory?"}).encode()
+
+async def post_chat(body: bytes) -> int:
+    view = memoryview(body)
+    offsets = iter(range(0, len(body), CHUNK_BYTES))
+    status = []
+    response_complete = asyncio.Event()
+
+    async def receive():
+        offset = next(offsets, None)
+        if offset is None:
+            # Like a server, report the disconnect only once the response has been sent
+            await response_complete.wait()
+            return {"type": "http.disconnect"}
+        end = offset + CHUNK_BYTES
+        return {"type": "http.request", "body": bytes(view[offset:end]), "more_body": end < len(body)}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status.append(message["status"])
+        elif message["type"] == "http.response.body" and not message.get("more_body", False):
+            response_complete.set()
+
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": "/api/chat",
+        "raw_path": b"/api/chat",
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        "client": ("127.0.0.1", 1234),
+        "server": ("test", 80),
+    }
+    await app(scope, receive, send)
+    return status[0]
+
+@pytest.mark.parametrize(
+    "label", [pytest.param(label, marks=pytest.mark.bench) if label in BENCH_SIZES else label for label in SIZES]
+)
+def test_bench_chat_request_peak_memory(monkeypatch, label):
+    """Measure the peak memory allocated while serving one chat request."""
+    install_fake_gemini(monkeypatch)
+    body = make_body(SIZES[label])
+    # Warm up imports and lazily built middleware outside the measurement
+    asyncio.run(post_chat(make_body(1000)))
+
+    tracemalloc.start()
+    try:
+        status = asyncio.run(post_chat(body))
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    logger.info(f"chat request {label}: peak {peak / 1e6:.1f} MB ({peak / len(body):.2f}x body)")
+    assert status == 200
+    # Raw body, JSON document text, the page field and its compacted copy:
+    # the prompt parts must not add another
+    assert peak < len(body) * 4.5
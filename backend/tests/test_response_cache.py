@@ -0,0 +1,149 @@
+import asyncio
+from fastapi.testclient import TestClient
+from main import app
+from app.services import gemini_service
+from app.services.rate_limiter import rate_limiter
+from app.services.response_cache import ResponseCache
+from tests.fake_gemini import install_fake_gemini
+
+VALID_API_KEY = "AIzaSyFakeKeyForTests_0123456789"
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def test_entries_expire_after_ttl():
+    """Test that entries are fresh within the TTL and gone after it."""
+    clock = FakeClock()
+    cache = ResponseCache(ttl=10, clock=clock)
+    cache.set("key", ["question"])
+    assert cache.get("key") == (["question"], False)
+    clock.now = 11
+    assert cache.get("key") is None
+
+def test_lru_eviction():
+    """Test that the least recently used entry is evicted at capacity."""
+    cache = ResponseCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == (1, False)
+
+def test_rejected_values_never_overwrite_real_results():
+    """Test that values failing the cacheable check are not stored."""
+    cache = ResponseCache(cacheable=lambda value: value != "default")
+    cache.set("key", "real")
+    assert cache.set("key", "default") is False
+    assert cache.get("key") == ("real", False)
+
+def test_stale_while_revalidate_refreshes_once():
+    """Test that stale entries are served while one background refresh runs."""
+    clock = FakeClock()
+    cache = ResponseCache(ttl=10, stale_ttl=60, clock=clock)
+    cache.set("key", "old")
+    clock.now = 20
+    refreshes = []
+
+    async def refresh():
+        refreshes.append(True)
+        return "new"
+
+    async def scenario():
+        assert cache.get("key") == ("old", True)
+        assert cache.refresh_in_background("key", refresh) is True
+        assert cache.refresh_in_background("key", refresh) is False
+        await asyncio.sleep(0.01)
+        return cache.get("key")
+
+    assert asyncio.run(scenario()) == ("new", False)
+    assert refreshes == [True]
+
+def test_suggestions_are_served_from_cache(monkeypatch):
+    """Test that repeated suggestion requests for a page make one Gemini call."""
+    models = install_fake_gemini(monkeypatch, text='["Question one?", "Question two?"]')
+    monkeypatch.setattr(gemini_service, "suggestion_cache", ResponseCache(cacheable=gemini_service._is_real_suggestions))
+
+    async def scenario():
+        first = await gemini_service.generate_question_suggestions(VALID_API_KEY, "model", "Page text", 2)
+        second = await gemini_service.generate_question_suggestions(VALID_API_KEY, "model", "Page text", 2)
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert first == second == ["Question one?", "Question two?"]
+    assert models.calls == 1
+
+def test_cached_suggestions_are_only_served_to_their_key(monkeypatch):
+    """Test that another key asking for suggestions about the same page makes its own Gemini call."""
+    models = install_fake_gemini(monkeypatch, text='["Question one?", "Question two?"]')
+    monkeypatch.setattr(gemini_service, "suggestion_cache", ResponseCache(cacheable=gemini_service._is_real_suggestions))
+
+    async def scenario():
+        await gemini_service.generate_question_suggestions(VALID_API_KEY, "model", "Page text", 2)
+        await gemini_service.generate_question_suggestions(VALID_API_KEY[:-1] + "X", "model", "Page text", 2)
+
+    asyncio.run(scenario())
+    assert models.calls == 2
+    page_id = gemini_service.compute_page_id("Page text")
+    assert gemini_service.cached_question_suggestions(VALID_API_KEY, "model", page_id, 2) is not None
+    assert gemini_service.cached_question_suggestions(VALID_API_KEY[:-2] + "YY", "model", page_id, 2) is None
+
+def test_stale_suggestion_refresh_takes_a_rate_limit_permit(monkeypatch):
+    """Test that the background refresh of stale suggestions goes through the rate limiter."""
+    models = install_fake_gemini(monkeypatch, text='["Question one?", "Question two?"]')
+    clock = FakeClock()
+    cache = ResponseCache(ttl=10.0, stale_ttl=100.0, cacheable=gemini_service._is_real_suggestions, clock=clock)
+    monkeypatch.setattr(gemini_service, "suggestion_cache", cache)
+    monkeypatch.setattr(rate_limiter, "burst", 1.0)
+    monkeypatch.setattr(rate_limiter, "rate", 0.001)
+    rejected = rate_limiter.stats()["rejected"]["rate"]
+
+    async def scenario():
+        first = await gemini_service.generate_question_suggestions(VALID_API_KEY, "model", "Stale page", 2)
+        clock.now = 50.0
+        stale = await gemini_service.generate_question_suggestions(VALID_API_KEY, "model", "Stale page", 2)
+        # Let the refresh run: the key's only token went to the first call
+        await asyncio.sleep(0.01)
+        return first, stale
+
+    first, stale = asyncio.run(scenario())
+    assert first == stale
+    assert models.calls == 1
+    assert rate_limiter.stats()["rejected"]["rate"] == rejected + 1
+
+def test_default_suggestions_are_not_cached(monkeypatch):
+    """Test that defaults returned on errors are not cached."""
+    models = install_fake_gemini(monkeypatch, text='["Question one?"]')
+    models.error = RuntimeError("upstream failure")
+    monkeypatch.setattr(gemini_service, "suggestion_cache", ResponseCache(cacheable=gemini_service._is_real_suggestions))
+    monkeypatch.setattr(gemini_service, "gemini_retry_decorator", lambda: (lambda func: func))
+
+    async def scenario():
+        failed = await gemini_service.generate_question_suggestions(VALID_API_KEY, "model", "Page text", 5)
+        models.error = None
+        recovered = await gemini_service.generate_question_suggestions(VALID_API_KEY, "model", "Page text", 5)
+        return failed, recovered
+
+    failed, recovered = asyncio.run(scenario())
+    assert failed == gemini_service.DEFAULT_QUESTIONS
+    assert recovered == ["Question one?"]
+
+def test_cached_suggestions_skip_the_rate_limit(monkeypatch):
+    """Test that suggestions served from the cache neither take nor wait for a rate limit token."""
+    models = install_fake_gemini(monkeypatch, text='["Question one?", "Question two?"]')
+    monkeypatch.setattr(gemini_service, "suggestion_cache", ResponseCache(cacheable=gemini_service._is_real_suggestions))
+    monkeypatch.setattr(rate_limiter, "burst", 1.0)
+    monkeypatch.setattr(rate_limiter, "rate", 0.001)
+    monkeypatch.setattr(rate_limiter, "max_wait", 0.0)
+    client = TestClient(app)
+    body = {"api_key": VALID_API_KEY, "webpage_content": "Page with cached suggestions", "count": 2}
+    rejected = rate_limiter.stats()["rejected"]["rate"]
+
+    responses = [client.post("/api/suggest-questions", json=body) for _ in range(3)]
+    assert [response.status_code for response in responses] == [200, 200, 200]
+    assert models.calls == 1
+    assert rate_limiter.stats()["rejected"]["rate"] == rejected
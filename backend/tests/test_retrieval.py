@@ -0,0 +1,121 @@
+import asyncio
+import numpy as np
+from fastapi.testclient import TestClient
+from main import app
+from app.core.config import settings
+from app.services import token_estimator
+from app.services.page_store import PageEntry
+from app.services.retrieval import BM25Index, RetrievalIndexCache, chunk_text, retrieve_relevant_content
+from tests.fake_gemini import install_fake_gemini
+
+client = TestClient(app)
+
+VALID_API_KEY = "AIzaSyFakeKeyForTests_0123456789"
+
+FILLER = "General filler text about nothing in particular. " * 40
+
+def make_docs_page() -> str:
+    sections = [
+        "Installation guide: run pip install to set up the package. ",
+        "Configuration covers environment variables and settings files. ",
+        "Troubleshooting: if the kangaroo daemon crashes, restart the kangaroo service. ",
+        "Changelog lists every release with dates. ",
+    ]
+    return "".join(FILLER + section for section in sections) + FILLER
+
+def test_chunks_cover_text_with_overlap():
+    """Test that chunks cover the whole text and consecutive chunks overlap."""
+    text = make_docs_page()
+    chunks = chunk_text(text, chunk_chars=500, overlap_chars=50)
+    assert chunks[0][0] == 0
+    assert chunks[-1][1] == len(text)
+    for (_, previous_end), (start, _) in zip(chunks, chunks[1:]):
+        assert start < previous_end
+
+def test_bm25_ranks_matching_chunk_first():
+    """Test that the chunk containing the rare query terms scores highest."""
+    text = make_docs_page()
+    index = BM25Index(text, chunk_chars=500, overlap_chars=50)
+    scores = index.score("Why does the kangaroo daemon crash?")
+    best = int(np.argmax(scores))
+    start, end = index.chunks[best]
+    assert "kangaroo" in text[start:end]
+
+def test_select_respects_token_budget():
+    """Test that the selected context stays within the token budget."""
+    text = make_docs_page()
+    index = BM25Index(text, chunk_chars=500, overlap_chars=50)
+    content, tokens = index.select("kangaroo daemon", token_budget=300, top_k=10)
+    assert "kangaroo" in content
+    assert tokens <= 300
+    assert len(content) < len(text)
+
+def test_index_is_cached_per_page():
+    """Test that follow-up questions about the same page reuse the index."""
+    cache = RetrievalIndexCache()
+    text = make_docs_page()
+
+    async def scenario():
+        first = await cache.get_index(PageEntry(None, text, 10000, len(text)))
+        second = await cache.get_index(PageEntry(None, text, 10000, len(text)))
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert first is second
+    assert cache.stats() == {"indexes": 1, "hits": 1, "misses": 1}
+
+def test_small_pages_are_sent_whole():
+    """Test that pages within the budget skip retrieval."""
+    page = PageEntry(None, "short page", 3, 10)
+    assert asyncio.run(retrieve_relevant_content(page, "query", token_budget=100)) is page
+
+class OneTokenPerCharacter:
+    def encode_ordinary(self, text):
+        return list(text)
+
+def test_underestimated_counts_are_checked_before_skipping_retrieval(monkeypatch):
+    """Test that a page whose carried count is a length-based guess is recounted against the budget."""
+    monkeypatch.setattr(token_estimator, "get_encoding", lambda: OneTokenPerCharacter())
+    content = "Données générales sur la mise en cache. " * 20
+    page = PageEntry(None, content, len(content) // 4, len(content))
+    assert asyncio.run(retrieve_relevant_content(page, "cache", token_budget=400)) is not page
+    assert page.token_count == len(content)
+
+def test_inline_non_ascii_page_over_the_budget_uses_retrieval(monkeypatch):
+    """Test that an inline non-ASCII page over the budget is cut down like a registered one."""
+    models = install_fake_gemini(monkeypatch)
+    monkeypatch.setattr(token_estimator, "get_encoding", lambda: OneTokenPerCharacter())
+    monkeypatch.setattr(settings, "RETRIEVAL_TOKEN_BUDGET", 400)
+    monkeypatch.setattr(settings, "RETRIEVAL_CHUNK_CHARS", 300)
+    monkeypatch.setattr(settings, "RETRIEVAL_CHUNK_OVERLAP", 30)
+    filler = "Texte général sans intérêt particulier, répété à l'envi. " * 20
+    text = filler + "Dépannage : si le démon kangourou plante, redémarrez le service kangourou. " + filler
+    response = client.post(
+        "/api/chat",
+        json={"api_key": VALID_API_KEY, "webpage_content": text, "query": "Le démon kangourou ?", "use_retrieval": True}
+    )
+    assert response.status_code == 200
+    sent_page = models.last_contents[0].parts[1].text
+    assert "kangourou" in sent_page
+    assert len(sent_page) < len(text)
+
+def test_chat_with_retrieval_sends_relevant_sections(monkeypatch):
+    """Test that retrieval mode sends only the relevant excerpts upstream."""
+    models = install_fake_gemini(monkeypatch)
+    monkeypatch.setattr(settings, "RETRIEVAL_TOKEN_BUDGET", 400)
+    monkeypatch.setattr(settings, "RETRIEVAL_CHUNK_CHARS", 500)
+    monkeypatch.setattr(settings, "RETRIEVAL_CHUNK_OVERLAP", 50)
+    text = make_docs_page()
+    response = client.post(
+        "/api/chat",
+        json={
+            "api_key": VALID_API_KEY,
+            "webpage_content": text,
+            "query": "How do I fix the kangaroo daemon?",
+            "use_retrieval": True
+        }
+    )
+    assert response.status_code == 200
+    sent_page = models.last_contents[0].parts[1].text
+    assert "kangaroo" in sent_page
+    assert len(sent_page) < len(text)
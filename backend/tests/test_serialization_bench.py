@@ -0,0 +1,79 @@
+# Micro-benchmarks for request parsing and response rendering on 1 KB to 5 MB payloads,
+# comparing the stdlib json + lax validation the endpoints used before with orjson + strict models.
+# Opt in and see the timings with
+# `RUN_BENCHMARKS=true pytest --log-cli-level=INFO tests/test_serialization_bench.py`.
+import json
+import logging
+import time
+import pytest
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+from main import app
+from app.core.fast_json import FastJSONResponse, loads
+from app.models.request_models import ChatRequest
+from tests.fake_gemini import install_fake_gemini
+
+VALID_API_KEY = "AIzaSyFakeKeyForTests_0123456789"
+
+SIZES = {
+    "1KB": 1_000,
+    "10KB": 10_000,
+    "100KB": 100_000,
+    "1MB": 1_000_000,
+    "5MB": 5_000_000,
+}
+
+pytestmark = pytest.mark.bench
+
+logger = logging.getLogger(__name__)
+
+# Non-ASCII text, which stdlib json escapes character by character
+SAMPLE = "The quick brown fox jumps over the lazy dog. Grüße, 42! — «quoted» "
+
+def make_text(size: int) -> str:
+    return (SAMPLE * (size // len(SAMPLE) + 1))[:size]
+
+def best_of(func, repeat: int = 5) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+def report(name: str, label: str, size: int, before: float, after: float) -> None:
+    logger.info(
+        f"{name} {label}: before {before * 1000:.3f} ms ({size / before / 1e6:.0f} MB/s), "
+        f"after {after * 1000:.3f} ms ({size / after / 1e6:.0f} MB/s), {before / after:.1f}x"
+    )
+
+@pytest.mark.parametrize("label", list(SIZES))
+def test_bench_parse_chat_request(label):
+    """Benchmark parsing and validating a chat request body."""
+    body = json.dumps({"api_key": VALID_API_KEY, "webpage_content": make_text(SIZES[label]), "query": "Why?"}).encode()
+    before = best_of(lambda: ChatRequest.model_validate(json.loads(body), strict=False))
+    after = best_of(lambda: ChatRequest.model_validate(loads(body)))
+    report("parse chat request", label, len(body), before, after)
+    assert ChatRequest.model_validate(loads(body)) == ChatRequest.model_validate(json.loads(body), strict=False)
+
+@pytest.mark.parametrize("label", list(SIZES))
+def test_bench_render_chat_response(label):
+    """Benchmark rendering a chat answer with suggestions."""
+    content = {"text": make_text(SIZES[label]), "suggestions": ["What else?", "Why so?", "Who wrote it?"]}
+    before = best_of(lambda: JSONResponse(content).body)
+    after = best_of(lambda: FastJSONResponse(content).body)
+    report("render chat response", label, len(FastJSONResponse(content).body), before, after)
+    assert json.loads(FastJSONResponse(content).body) == content
+    # orjson is several times faster on anything but tiny payloads
+    if SIZES[label] >= 100_000:
+        assert after < before
+
+@pytest.mark.parametrize("label", list(SIZES))
+def test_bench_chat_round_trip(monkeypatch, label):
+    """Benchmark a whole chat request through the app with a large page and answer."""
+    install_fake_gemini(monkeypatch, text=make_text(SIZES[label]))
+    client = TestClient(app)
+    body = {"api_key": VALID_API_KEY, "webpage_content": make_text(SIZES[label]), "query": "Round trip?"}
+    elapsed = best_of(lambda: client.post("/api/chat", json=body), repeat=3)
+    logger.info(f"chat round trip {label}: {elapsed * 1000:.2f} ms ({1 / elapsed:.0f} req/s)")
+    assert client.post("/api/chat", json=body).status_code == 200
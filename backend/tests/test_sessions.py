@@ -0,0 +1,93 @@
+from fastapi.testclient import TestClient
+from main import app
+from app.services.session_store import Session, SessionStore
+from tests.fake_gemini import install_fake_gemini
+from tests.test_streaming import parse_sse
+
+client = TestClient(app)
+
+VALID_API_KEY = "AIzaSyFakeKeyForTests_0123456789"
+OTHER_API_KEY = "AIzaSyOtherKeyForTests_987654321"
+
+def test_session_trims_old_exchanges_into_summary():
+    """Test that exchanges over the token budget are dropped and summarized."""
+    session = Session("s", "hash", None, token_budget=50, summary_max_chars=300)
+    for index in range(10):
+        session.add_exchange(f"Question {index} " + "word " * 10, f"Answer {index} " + "word " * 10)
+
+    assert session.token_count <= 50
+    assert session.turns[0].role == "user"
+    assert len(session.turns) % 2 == 0
+    assert "User: Question" in session.summary
+    assert len(session.summary) <= 300
+    assert session.token_count == sum(turn.tokens for turn in session.turns)
+
+def test_session_contents_alternate_roles_with_summary_first():
+    """Test that the history becomes alternating user/model contents."""
+    session = Session("s", "hash", None, token_budget=20, summary_max_chars=500)
+    session.add_exchange("First question " + "x " * 30, "First answer")
+    session.add_exchange("Second question", "Second answer")
+
+    contents = session.to_contents()
+    assert [content.role for content in contents] == ["user", "model"]
+    assert contents[0].parts[0].text.startswith("SUMMARY OF EARLIER CONVERSATION:")
+    assert contents[0].parts[1].text == "Second question"
+    assert [message["role"] for message in session.to_messages()] == ["user", "user", "assistant"]
+
+def test_session_store_checks_owner_and_idle_ttl():
+    """Test that sessions are private to their API key and expire when idle."""
+    now = [0.0]
+    store = SessionStore(max_sessions=2, idle_ttl=10, clock=lambda: now[0])
+    session = store.create(VALID_API_KEY)
+
+    assert store.get(session.session_id, OTHER_API_KEY) is None
+    assert not store.delete(session.session_id, OTHER_API_KEY)
+    assert store.get(session.session_id, VALID_API_KEY) is session
+
+    now[0] = 11.0
+    assert store.get(session.session_id, VALID_API_KEY) is None
+    assert store.stats()["evictions"] == 1
+
+def test_chat_with_session_sends_history(monkeypatch):
+    """Test that follow-up chats in a session carry the earlier turns."""
+    models = install_fake_gemini(monkeypatch)
+    page_id = client.post(
+        "/api/pages", json={"api_key": VALID_API_KEY, "webpage_content": "Session page"}
+    ).json()["page_id"]
+    session_id = client.post(
+        "/api/sessions", json={"api_key": VALID_API_KEY, "page_id": page_id}
+    ).json()["session_id"]
+
+    payload = {"api_key": VALID_API_KEY, "session_id": session_id, "query": "What is this page?"}
+    assert client.post("/api/chat", json=payload).json() == {"text": "Fake Gemini answer"}
+    assert len(models.last_contents) == 1
+
+    payload["query"] = "Tell me more, in a stream."
+    events = parse_sse(client.post("/api/chat/stream", json=payload).text)
+    assert events[-1][0] == "done"
+    # Two earlier turns plus the new question
+    assert len(models.last_contents) == 3
+    assert models.last_contents[1].role == "model"
+
+    payload["query"] = "And one more?"
+    client.post("/api/chat", json=payload)
+    assert len(models.last_contents) == 5
+
+def test_session_is_private_and_deletable(monkeypatch):
+    """Test that other keys can't use a session and that deletion works."""
+    install_fake_gemini(monkeypatch)
+    session_id = client.post("/api/sessions", json={"api_key": VALID_API_KEY}).json()["session_id"]
+
+    response = client.post(
+        "/api/chat", json={"api_key": OTHER_API_KEY, "session_id": session_id, "query": "Hi?"}
+    )
+    assert response.status_code == 404
+
+    # The session has no page yet
+    response = client.post(
+        "/api/chat", json={"api_key": VALID_API_KEY, "session_id": session_id, "query": "Hi?"}
+    )
+    assert response.status_code == 400
+
+    assert client.delete(f"/api/sessions/{session_id}", headers={"X-API-Key": OTHER_API_KEY}).status_code == 404
+    assert client.delete(f"/api/sessions/{session_id}", headers={"X-API-Key": VALID_API_KEY}).json() == {"deleted": True}
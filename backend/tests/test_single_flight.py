@@ -0,0 +1,110 @@
+import asyncio
+import pytest
+from app.services import gemini_service
+from app.services.rate_limiter import rate_limiter
+from app.services.single_flight import SingleFlight
+from tests.fake_gemini import install_fake_gemini
+
+VALID_API_KEY = "AIzaSyFakeKeyForTests_0123456789"
+OTHER_API_KEY = "AIzaSyFakeKeyForTests_9876543210"
+
+def test_identical_chats_share_one_upstream_call(monkeypatch):
+    """Test that identical concurrent chats make a single Gemini call."""
+    models = install_fake_gemini(monkeypatch, latency=0.1)
+    monkeypatch.setattr(gemini_service, "gemini_single_flight", SingleFlight())
+
+    async def scenario():
+        return await asyncio.gather(*(
+            gemini_service.get_gemini_response(VALID_API_KEY, "model", ["USER QUERY: summarize"])
+            for _ in range(10)
+        ))
+
+    results = asyncio.run(scenario())
+    assert results == ["Fake Gemini answer"] * 10
+    assert models.calls == 1
+    assert gemini_service.gemini_single_flight.stats()["shared"] == 9
+
+def test_coalesced_chats_share_one_rate_limit_permit(monkeypatch):
+    """Test that only the call that goes upstream takes a rate limit token, not every caller joining it."""
+    models = install_fake_gemini(monkeypatch, latency=0.1)
+    monkeypatch.setattr(gemini_service, "gemini_single_flight", SingleFlight())
+    monkeypatch.setattr(rate_limiter, "burst", 1.0)
+    monkeypatch.setattr(rate_limiter, "rate", 0.001)
+    monkeypatch.setattr(rate_limiter, "max_wait", 0.0)
+    rejected = rate_limiter.stats()["rejected"]["rate"]
+
+    async def scenario():
+        return await asyncio.gather(*(
+            gemini_service.get_gemini_response(VALID_API_KEY, "model", ["USER QUERY: coalesced"])
+            for _ in range(5)
+        ))
+
+    assert asyncio.run(scenario()) == ["Fake Gemini answer"] * 5
+    assert models.calls == 1
+    assert rate_limiter.stats()["rejected"]["rate"] == rejected
+
+def test_different_keys_are_not_coalesced(monkeypatch):
+    """Test that requests from different API keys never share a call."""
+    models = install_fake_gemini(monkeypatch, latency=0.05)
+    monkeypatch.setattr(gemini_service, "gemini_single_flight", SingleFlight())
+
+    async def scenario():
+        await asyncio.gather(
+            gemini_service.get_gemini_response(VALID_API_KEY, "model", ["USER QUERY: summarize"]),
+            gemini_service.get_gemini_response(OTHER_API_KEY, "model", ["USER QUERY: summarize"]),
+        )
+
+    asyncio.run(scenario())
+    assert models.calls == 2
+
+def test_cancelled_waiter_does_not_cancel_shared_call():
+    """Test that one waiter disconnecting leaves the call running for the others."""
+    group = SingleFlight()
+    started = []
+
+    async def upstream():
+        started.append(True)
+        await asyncio.sleep(0.05)
+        return "result"
+
+    async def scenario():
+        first = asyncio.ensure_future(group.do("key", upstream))
+        second = asyncio.ensure_future(group.do("key", upstream))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(scenario()) == "result"
+    assert len(started) == 1
+    assert group.stats()["cancelled"] == 0
+
+def test_last_waiter_cancelling_cancels_upstream():
+    """Test that the upstream call is cancelled once nobody is waiting."""
+    group = SingleFlight()
+    upstream_cancelled = []
+
+    async def upstream():
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            upstream_cancelled.append(True)
+            raise
+
+    async def scenario():
+        waiters = [asyncio.ensure_future(group.do("key", upstream)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        for waiter in waiters:
+            waiter.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+        await asyncio.sleep(0)
+        # A new request after cancellation starts a fresh call
+        return await group.do("key", _answer)
+
+    async def _answer():
+        return "fresh"
+
+    assert asyncio.run(scenario()) == "fresh"
+    assert upstream_cancelled == [True]
+    assert group.stats()["cancelled"] == 1
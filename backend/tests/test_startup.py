@@ -0,0 +1,84 @@
+import asyncio
+import subprocess
+import sys
+from pathlib import Path
+from app.core import lazy_import
+from app.core.config import settings
+from app.core.lazy_import import lazy_module
+from app.services import token_estimator
+from app.services.warmup import StartupWarmup
+
+def test_importing_the_app_defers_heavy_modules():
+    """Test that importing the app loads neither the Gemini SDK nor tenacity, numpy or tiktoken."""
+    script = (
+        "import sys, main; "
+        "print(','.join(name for name in ('google.genai', 'tenacity', 'numpy', 'tiktoken') if name in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-W", "ignore", "-c", script],
+        cwd=Path(__file__).parent.parent,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert result.stdout.strip() == ""
+
+def test_lazy_module_imports_on_first_use(monkeypatch):
+    """Test that the stand-in imports the module on attribute access and is shared."""
+    monkeypatch.delitem(sys.modules, "colorsys", raising=False)
+    monkeypatch.setattr(lazy_import, "_lazy_modules", {})
+    colorsys = lazy_module("colorsys")
+    assert "colorsys" not in sys.modules
+    assert lazy_module("colorsys") is colorsys
+
+    assert colorsys.rgb_to_hsv(1.0, 0.0, 0.0) == (0.0, 1.0, 1.0)
+    assert "colorsys" in sys.modules
+    assert lazy_import.lazy_module_stats()["colorsys"] is not None
+    assert lazy_import.load_lazy_modules() == {}
+
+def test_warmup_runs_every_step_and_survives_failures():
+    """Test the blocking, background and off modes."""
+    ran = []
+
+    def failing():
+        raise OSError("no network")
+
+    blocking = StartupWarmup(steps=[("first", lambda: ran.append("first")), ("broken", failing), ("last", lambda: ran.append("last"))])
+    asyncio.run(blocking.start("blocking"))
+    assert ran == ["first", "last"]
+    assert blocking.stats()["state"] == "done"
+    assert blocking.stats()["failed"] == ["broken"]
+    assert set(blocking.stats()["durations"]) == {"first", "broken", "last"}
+
+    async def start_in_background():
+        warmup = StartupWarmup(steps=[("slow", lambda: ran.append("slow"))])
+        await warmup.start("background")
+        state = warmup.state
+        await warmup._task
+        return state, warmup.state
+
+    assert asyncio.run(start_in_background()) == ("running", "done")
+
+    off = StartupWarmup(steps=[("never", lambda: ran.append("never"))])
+    asyncio.run(off.start("off"))
+    assert "never" not in ran
+    assert off.stats()["state"] == "off"
+
+def test_tokenizer_loads_from_the_cache_dir(monkeypatch, tmp_path):
+    """Test that TOKENIZER_CACHE_DIR is where tiktoken looks for the BPE file."""
+    seen = []
+
+    class FakeTiktoken:
+        @staticmethod
+        def get_encoding(name):
+            import os
+            seen.append(os.environ.get("TIKTOKEN_CACHE_DIR"))
+            return "encoding"
+
+    monkeypatch.setattr(settings, "TOKENIZER_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(token_estimator, "tiktoken", FakeTiktoken)
+    monkeypatch.setattr(token_estimator, "_encoding", None)
+    monkeypatch.setattr(token_estimator, "_encoding_failed_at", None)
+    monkeypatch.setenv("TIKTOKEN_CACHE_DIR", "")
+    assert token_estimator.get_encoding() == "encoding"
+    assert seen == [str(tmp_path)]
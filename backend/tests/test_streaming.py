@@ -0,0 +1,60 @@
+import asyncio
+import json
+from fastapi.testclient import TestClient
+from main import app
+from app.services.gemini_service import get_gemini_response_stream
+from tests.fake_gemini import install_fake_gemini
+
+client = TestClient(app)
+
+VALID_API_KEY = "AIzaSyFakeKeyForTests_0123456789"
+
+def parse_sse(body: str):
+    """Parse an SSE body into (event, data) pairs."""
+    events = []
+    for frame in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in frame.split("\n"))
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+def test_chat_stream_emits_typed_events(monkeypatch):
+    """Test that the stream endpoint emits delta, usage and done events."""
+    install_fake_gemini(monkeypatch, text="Hello streaming world")
+    response = client.post(
+        "/api/chat/stream",
+        json={
+            "api_key": VALID_API_KEY,
+            "webpage_content": "Test content",
+            "query": "Test query"
+        }
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+
+    events = parse_sse(response.text)
+    names = [name for name, _ in events]
+    assert names == ["delta", "delta", "delta", "usage", "done"]
+    assert "".join(data["text"] for name, data in events if name == "delta") == "Hello streaming world "
+    assert events[3][1]["total_tokens"] == 13
+
+def test_chat_stream_invalid_api_key():
+    """Test the stream endpoint rejects an invalid API key before streaming."""
+    response = client.post(
+        "/api/chat/stream",
+        json={"api_key": "", "webpage_content": "Test content", "query": "Test query"}
+    )
+    assert response.status_code == 401
+
+def test_closing_stream_closes_upstream(monkeypatch):
+    """Test that closing the event stream early closes the upstream stream."""
+    models = install_fake_gemini(monkeypatch, text="one two three four")
+
+    async def consume_first_event():
+        events = get_gemini_response_stream(VALID_API_KEY, "fake-model", ["prompt"])
+        first = await events.__anext__()
+        await events.aclose()
+        return first
+
+    first = asyncio.run(consume_first_event())
+    assert first == {"event": "delta", "data": {"text": "one "}}
+    assert models.streams_closed == 1
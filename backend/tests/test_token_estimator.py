@@ -26,3 +26,30 @@ def test_estimate_tokens_special_characters():
     # The exact token count may vary, but it should be proportional to text length
     assert estimate_tokens(text) > 0
     assert estimate_tokens(text) <= len(text)
+
+def _fail_if_encoded():
+    raise AssertionError("text should not have been encoded")
+
+def test_estimate_tokens_clearly_below_limit_skips_encoding(monkeypatch):
+    """Test that short texts are not encoded when a limit is given."""
+    from app.services import token_estimator
+    monkeypatch.setattr(token_estimator, "get_encoding", _fail_if_encoded)
+    assert estimate_tokens("word " * 100, limit=1000) <= 500
+
+def test_estimate_tokens_clearly_above_limit_skips_encoding(monkeypatch):
+    """Test that very long texts are reported over the limit without encoding."""
+    from app.services import token_estimator
+    monkeypatch.setattr(token_estimator, "get_encoding", _fail_if_encoded)
+    assert estimate_tokens("word " * 10000, limit=1000) > 1000
+
+def test_get_encoding_is_cached():
+    """Test that the encoder is loaded once and reused."""
+    from app.services.token_estimator import get_encoding
+    assert get_encoding() is get_encoding()
+
+def test_estimate_tokens_async_matches_sync():
+    """Test that the off-loop estimate matches the inline one for large texts."""
+    import asyncio
+    from app.services.token_estimator import estimate_tokens_async
+    text = "This is a test. " * 10000
+    assert asyncio.run(estimate_tokens_async(text)) == estimate_tokens(text)
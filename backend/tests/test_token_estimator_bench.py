@@ -0,0 +1,54 @@
+# Micro-benchmarks for token estimation on 1 KB to 10 MB pages.
+# Opt in and see the timings with
+# `RUN_BENCHMARKS=true pytest --log-cli-level=INFO tests/test_token_estimator_bench.py`.
+import logging
+import time
+import pytest
+from app.core.config import settings
+from app.services.token_estimator import estimate_tokens, warm_up
+
+SIZES = {
+    "1KB": 1_000,
+    "100KB": 100_000,
+    "1MB": 1_000_000,
+    "5MB": 5_000_000,
+    "10MB": 10_000_000,
+}
+
+pytestmark = pytest.mark.bench
+
+logger = logging.getLogger(__name__)
+
+SAMPLE = "The quick brown fox jumps over the lazy dog. Lorem ipsum dolor sit amet, 42! "
+
+def make_page(size: int) -> str:
+    return (SAMPLE * (size // len(SAMPLE) + 1))[:size]
+
+def best_of(func, repeat: int = 3) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+@pytest.mark.parametrize("label", list(SIZES))
+def test_bench_estimate_tokens_with_limit(label):
+    """Benchmark the routing estimate (with the configured token limit)."""
+    warm_up()
+    page = make_page(SIZES[label])
+    elapsed = best_of(lambda: estimate_tokens(page, limit=settings.TOKEN_LIMIT))
+    logger.info(f"estimate_tokens(limit) {label}: {elapsed * 1000:.2f} ms")
+
+    # Pages far beyond the limit must take the length-based early exit
+    if len(page) > settings.TOKEN_LIMIT * settings.TOKEN_ESTIMATE_MAX_CHARS_PER_TOKEN:
+        assert elapsed < 0.005
+
+@pytest.mark.parametrize("label", ["1KB", "100KB", "1MB"])
+def test_bench_estimate_tokens_full_encode(label):
+    """Benchmark a full encode without a limit."""
+    warm_up()
+    page = make_page(SIZES[label])
+    elapsed = best_of(lambda: estimate_tokens(page))
+    logger.info(f"estimate_tokens(full) {label}: {elapsed * 1000:.2f} ms")
+    assert estimate_tokens(page) > 0
@@ -0,0 +1,73 @@
+import pytest
+from fastapi.testclient import TestClient
+from google.genai import errors
+from main import app
+from app.core import tracing
+from app.core.config import settings
+from app.services.model_router import model_router
+from app.services.token_estimator import estimate_tokens
+from tests.fake_gemini import install_fake_gemini
+
+pytest.importorskip("opentelemetry.sdk")
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+client = TestClient(app)
+
+VALID_API_KEY = "AIzaSyFakeKeyForTests_0123456789"
+
+@pytest.fixture
+def spans():
+    """Record spans in memory for the duration of a test."""
+    exporter = InMemorySpanExporter()
+    assert tracing.setup_tracing(exporter)
+    yield exporter
+    tracing.shutdown_tracing()
+
+def by_name(exporter: InMemorySpanExporter, name: str) -> list:
+    return [span for span in exporter.get_finished_spans() if span.name == name]
+
+def test_chat_spans_nest_under_the_route(monkeypatch, spans):
+    """Test the route, token estimation and Gemini call spans of a chat request."""
+    install_fake_gemini(monkeypatch)
+    response = client.post("/api/chat", json={"api_key": VALID_API_KEY, "webpage_content": "Traced page", "query": "Traced?"})
+    assert response.status_code == 200
+
+    (route,) = by_name(spans, "routes.chat")
+    assert route.attributes["model"] == settings.PRIMARY_MODEL
+    assert route.attributes["token_count"] > 0
+    (call,) = by_name(spans, "gemini.call")
+    assert call.parent.span_id == route.context.span_id
+    assert call.attributes["attempt"] == 1
+    estimates = by_name(spans, "tokens.estimate")
+    assert estimates and all(span.context.trace_id == route.context.trace_id for span in estimates)
+    assert all("token_count" in span.attributes for span in estimates)
+
+def test_retries_get_one_span_per_attempt(monkeypatch, spans):
+    """Test that each retried Gemini call is its own span with its attempt number."""
+    monkeypatch.setattr(settings, "GEMINI_RETRY_MAX_WAIT", 0)
+    monkeypatch.setattr(model_router, "health", {})
+    models = install_fake_gemini(monkeypatch)
+    models.error = errors.ServerError(503, {"error": {"code": 503, "message": "Overloaded", "status": "UNAVAILABLE"}})
+    client.post("/api/chat", json={"api_key": VALID_API_KEY, "webpage_content": "Page", "query": "Retried?"})
+
+    calls = by_name(spans, "gemini.call")
+    assert [span.attributes["attempt"] for span in calls] == list(range(1, settings.GEMINI_MAX_ATTEMPTS + 1))
+    assert all(not span.status.is_ok for span in calls)
+
+def test_stream_span_has_an_event_per_chunk(monkeypatch, spans):
+    """Test the streaming span, its chunk events and token counts."""
+    install_fake_gemini(monkeypatch, text="Streamed traced answer")
+    client.post("/api/chat/stream", json={"api_key": VALID_API_KEY, "webpage_content": "Page", "query": "Stream?"})
+
+    (stream,) = by_name(spans, "gemini.stream")
+    assert stream.attributes["model"] == settings.PRIMARY_MODEL
+    assert stream.attributes["prompt_tokens"] == 10
+    assert [event.name for event in stream.events] == ["chunk"] * 3
+
+def test_disabled_tracing_records_nothing():
+    """Test that the helpers are no-ops while tracing is off."""
+    assert not tracing.is_enabled()
+    assert tracing.span("unused") is tracing.NO_SPAN
+    assert tracing.start_span("unused") is tracing.NO_SPAN
+    tracing.set_attributes(model="unused")
+    assert estimate_tokens("Plain text") > 0